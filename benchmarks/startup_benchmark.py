@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for castar-tools
+
+Runs the CLI in fresh interpreters and fails if the median wall time goes
+over the budget, or if `--help` starts importing subcommand modules.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+CLI = ROOT / "castar-tools"
+
+# (args, budget in milliseconds)
+SCENARIOS = [
+    (["--help"], 100),
+    (["api", "--help"], 200),
+    (["history", "--help"], 200),
+]
+
+# None of these may be imported just to print the top-level help
+LAZY_MODULES = [
+    "debug_app",
+    "debug_headers",
+    "check_sdk_api",
+    "integrate_framework",
+    "add_framework_to_project",
+    "fix_framework_swift",
+    "castar_tools.report_history",
+    "sqlite3",
+    "subprocess",
+]
+
+def time_command(args, runs):
+    """Return wall times in milliseconds for `runs` cold starts"""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, str(CLI), *args], cwd=ROOT,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+def check_lazy_imports():
+    """Return the subcommand modules that `--help` imported eagerly"""
+    probe = (
+        "import sys, io, contextlib\n"
+        f"sys.path.insert(0, {str(ROOT)!r})\n"
+        "from castar_tools import cli\n"
+        "with contextlib.redirect_stdout(io.StringIO()):\n"
+        "    cli.main(['--help'])\n"
+        "print('\\n'.join(sys.modules))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True)
+    loaded = set(result.stdout.split())
+    return [name for name in LAZY_MODULES if name in loaded]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="castar-tools cold-start benchmark")
+    parser.add_argument("--runs", type=int, default=15, help="Cold starts per scenario")
+    parser.add_argument("--scale", type=float, default=float(os.environ.get("STARTUP_BUDGET_SCALE", 1.0)),
+                        help="Multiply every budget, e.g. 2 on slow CI hosts")
+    args = parser.parse_args(argv)
+
+    print("🚀 castar-tools startup benchmark")
+    print("=" * 50)
+
+    ok = True
+    eager = check_lazy_imports()
+    if eager:
+        print(f"❌ --help imported subcommand modules: {', '.join(eager)}")
+        ok = False
+    else:
+        print("✅ --help imports no subcommand modules")
+
+    for command_args, budget in SCENARIOS:
+        budget *= args.scale
+        timings = time_command(command_args, args.runs)
+        median = statistics.median(timings)
+        status = "✅" if median <= budget else "❌"
+        ok = ok and median <= budget
+        print(f"{status} castar-tools {' '.join(command_args):<16} "
+              f"median {median:6.1f} ms  min {min(timings):6.1f} ms  budget {budget:.0f} ms")
+
+    return ok
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
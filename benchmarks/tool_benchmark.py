@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+Offline regression benchmark for the header, crash-log, device-log and doctor checks
+
+Generates a synthetic project (a framework with thousands of headers, a
+corpus of crash reports, a captured device log and a fake `flutter` with
+configurable latency) in a temporary directory, runs each tool
+in-process, and reports throughput, latency percentiles and peak memory.
+Peak memory is the traced Python allocations of one call, except for
+tools that work in a process pool (log_scan), where it is the peak RSS
+of the workers; the baseline records which kind each number is, and
+the two are never compared with each other.
+
+Each scenario is measured in several rounds and the median round is
+kept, both when recording the baseline and when comparing against it.
+A scenario that looks slower than the tolerance allows is measured
+again before the run fails, so one noisy round doesn't fail CI. Nothing
+outside the temporary directory is read or written.
+"""
+
+import argparse
+import contextlib
+import json
+import math
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT), str(ROOT / "ios")]
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "tool_baseline.json"
+
+# Differences below these are timer / allocator noise, whatever the relative change
+NOISE_FLOOR_MS = 5.0
+NOISE_FLOOR_KB = 256.0
+# Worker RSS includes the interpreter and the mmap pages a chunk touches
+NOISE_FLOOR_RSS_KB = 4096.0
+
+TYPES = ["void", "BOOL", "NSInteger", "NSString *", "NSDictionary *", "int"]
+
+# Generators
+
+def make_framework(project, headers, methods):
+    """A Flutter project whose CastarSDK.framework has `headers` headers of `methods` methods"""
+    (project / "pubspec.yaml").write_text("name: castar_benchmark\n")
+    framework = project / "ios" / "Frameworks" / "CastarSDK.framework"
+    (framework / "Headers").mkdir(parents=True)
+    (framework / "Modules").mkdir()
+    (framework / "Modules" / "module.modulemap").write_text(
+        'framework module CastarSDK {\n  umbrella header "CastarSDK.h"\n  export *\n}\n')
+    rng = random.Random(headers * 7919 + methods)
+    names = [f"CSDKComponent{i:05d}" for i in range(headers - 1)]
+    umbrella = ["#import <Foundation/Foundation.h>"] + [f'#import "{name}.h"' for name in names]
+    umbrella += ["", "@interface Castar : NSObject", "+ (instancetype)shared;",
+                 "- (void)startWithKey:(NSString *)key;", "- (void)stop;", "@end", ""]
+    (framework / "Headers" / "CastarSDK.h").write_text("\n".join(umbrella))
+    for name in names:
+        lines = ["// Generated for benchmarking", "#import <Foundation/Foundation.h>", "",
+                 "NS_ASSUME_NONNULL_BEGIN", "", f"@class {name}Delegate;", "",
+                 f"@interface {name} : NSObject"]
+        for index in range(methods):
+            kind = rng.choice("+-")
+            returns = rng.choice(TYPES)
+            argument = rng.choice(TYPES[1:])
+            lines.append(f"/// Method {index} of {name}")
+            lines.append(f"{kind} ({returns})method{index}With:({argument})value{index} "
+                         f"options:(NSDictionary *)options;")
+        lines += ["@end", "", "NS_ASSUME_NONNULL_END", ""]
+        (framework / "Headers" / f"{name}.h").write_text("\n".join(lines))
+    return framework
+
+def make_crash_corpus(home, files, lines):
+    """`files` Runner crash reports of `lines` lines each in ~/Library/Logs/DiagnosticReports"""
+    reports = home / "Library" / "Logs" / "DiagnosticReports"
+    reports.mkdir(parents=True)
+    (home / "Library" / "Developer" / "Xcode" / "DerivedData").mkdir(parents=True)
+    header = ["Process:               Runner [4242]", "Identifier:            com.castar.benchmark",
+              "Exception Type:        EXC_CRASH (SIGABRT)", "Crashed Thread:        0",
+              "Termination Reason:    Namespace SIGNAL, Code 6 Abort trap: 6", ""]
+    frame = "{0:<4}CastarSDK                     0x{1:016x} -[Castar startWithKey:] + {2}"
+    started = time.time() - files
+    for index in range(files):
+        body = [frame.format(i % 64, 0x100000000 + i * 16, i % 4096) for i in range(lines - len(header))]
+        path = reports / f"Runner-2026-01-01-{index:06d}.crash"
+        path.write_text("\n".join(header + body) + "\n")
+        os.utime(path, (started + index, started + index))
+    return reports
+
+def make_device_log(path, megabytes):
+    """A captured device log of about `megabytes` MB with a few CastarSDK / Flutter errors"""
+    rng = random.Random(megabytes)
+    noise = [f"2026-01-01 10:00:{i % 60:02d} Runner[4242] <Notice>: [Network] request {i} finished in {i % 97} ms"
+             for i in range(997)]
+    events = [
+        "Runner[4242] dyld: Library not loaded: @rpath/CastarSDK.framework/CastarSDK",
+        "flutter: MissingPluginException(No implementation found for method startCastarSdk on channel "
+        "com.castarsdk.flutter/castar)",
+        "flutter: Unhandled Exception: PlatformException(error, getCastarStatus failed)",
+        "Runner[4242] <Error>: Terminating app due to uncaught exception, SIGABRT",
+    ]
+    lines = [rng.choice(events) if rng.random() < 0.001 else rng.choice(noise) for _ in range(4096)]
+    block = ("\n".join(lines) + "\n").encode("utf-8")
+    with open(path, "wb") as f:
+        for _ in range(max(1, megabytes * 1024 * 1024 // len(block))):
+            f.write(block)
+    return path
+
+def make_fake_flutter(sdk, latency):
+    """A `flutter` that answers --version and doctor -v after `latency` seconds"""
+    (sdk / "bin").mkdir(parents=True)
+    (sdk / "version").write_text("3.19.0-benchmark\n")
+    script = sdk / "bin" / "flutter"
+    script.write_text(f"""#!/bin/sh
+sleep {latency}
+case "$1" in
+  --version)
+    echo "Flutter 3.19.0 • channel stable • https://github.com/flutter/flutter.git"
+    echo "Tools • Dart 3.3.0 • DevTools 2.31.1"
+    ;;
+  doctor)
+    echo "[✓] Flutter (Channel stable, 3.19.0, on macOS 14.3 23D56 darwin-arm64, locale en-US)"
+    echo "    • Flutter version 3.19.0 on channel stable"
+    echo "[✓] Xcode - develop for iOS and macOS (Xcode 15.2)"
+    echo "    • Xcode at /Applications/Xcode.app/Contents/Developer"
+    echo "[!] Android toolchain - develop for Android devices (Android SDK version 34.0.0)"
+    echo "    ✗ Android license status unknown."
+    echo ""
+    echo "! Doctor found issues in 1 category."
+    ;;
+esac
+""")
+    script.chmod(0o755)
+    return script.parent
+
+# Measurement
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+class Scenario:
+    """pool: the tool does its work in worker processes, which tracemalloc can't see"""
+    __slots__ = ("name", "run", "setup", "items", "unit", "pool")
+
+    def __init__(self, name, run, setup=None, items=1, unit="runs", pool=False):
+        self.name = name
+        self.run = run
+        self.setup = setup
+        self.items = items
+        self.unit = unit
+        self.pool = pool
+
+def worker_peak_kb(run):
+    """
+    Peak RSS of the worker processes started by one call of run, or None
+    where it can't be sampled.
+
+    run is called in a forked child whose pools spawn fresh interpreters,
+    so the workers neither inherit nor count this process's memory, and
+    RUSAGE_CHILDREN there covers only those workers.
+    """
+    if resource is None or not hasattr(os, "fork"):
+        return None
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        status = 1
+        try:
+            os.close(read_fd)
+            multiprocessing.set_start_method("spawn", force=True)
+            run()
+            os.write(write_fd, str(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss).encode())
+            status = 0
+        finally:
+            os._exit(status)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        peak = f.read()
+    os.waitpid(pid, 0)
+    # No output: the run failed; zero: it never started a worker
+    if not peak or not int(peak):
+        return None
+    # ru_maxrss is in bytes on macOS, KB elsewhere
+    return int(peak) / 1024 if sys.platform == "darwin" else float(peak)
+
+def measure(scenario, runs):
+    """
+    One round: time `runs` calls (after one warm-up) and take peak memory
+    from one more call: traced Python allocations, or the workers' peak
+    RSS for pool-based tools.
+    """
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        if scenario.setup:
+            scenario.setup()
+        scenario.run()
+        timings = []
+        for _ in range(runs):
+            if scenario.setup:
+                scenario.setup()
+            started = time.perf_counter()
+            scenario.run()
+            timings.append((time.perf_counter() - started) * 1000)
+        if scenario.setup:
+            scenario.setup()
+        if scenario.pool:
+            peak_kb = worker_peak_kb(scenario.run)
+        else:
+            tracemalloc.start()
+            try:
+                scenario.run()
+                peak_kb = tracemalloc.get_traced_memory()[1] / 1024
+            finally:
+                tracemalloc.stop()
+    p50 = statistics.median(timings)
+    return {
+        "p50_ms": round(p50, 2),
+        "p90_ms": round(percentile(timings, 90), 2),
+        "p99_ms": round(percentile(timings, 99), 2),
+        "max_ms": round(max(timings), 2),
+        "throughput": round(scenario.items / (p50 / 1000), 1) if p50 else 0.0,
+        "unit": f"{scenario.unit}/s",
+        "peak_kb": round(peak_kb, 1) if peak_kb is not None else None,
+        "memory": "worker_rss" if scenario.pool else "traced",
+    }
+
+def median_round(rounds):
+    """Per-metric median of several rounds of measure()"""
+    merged = {key: round(statistics.median(result[key] for result in rounds), 2)
+              for key in ("p50_ms", "p90_ms", "p99_ms", "max_ms", "throughput")}
+    peaks = [result["peak_kb"] for result in rounds if result["peak_kb"] is not None]
+    merged["peak_kb"] = round(statistics.median(peaks), 1) if peaks else None
+    merged["unit"] = rounds[0]["unit"]
+    merged["memory"] = rounds[0]["memory"]
+    merged["rounds"] = len(rounds)
+    return merged
+
+def build_scenarios(workdir, args):
+    """Generate the fixtures and return the scenarios run against them"""
+    project = workdir / "project"
+    project.mkdir()
+    make_framework(project, args.headers, args.methods)
+    make_crash_corpus(workdir / "home", args.crash_files, args.crash_lines)
+    device_log = make_device_log(workdir / "device.log", args.log_mb)
+    log_mb = device_log.stat().st_size / (1024 * 1024)
+    flutter_bin = make_fake_flutter(workdir / "flutter", args.flutter_latency)
+
+    # Everything the tools resolve from the environment points into workdir
+    os.environ["HOME"] = str(workdir / "home")
+    os.environ["XDG_CACHE_HOME"] = str(workdir / "cache")
+    os.environ["PATH"] = f"{flutter_bin}{os.pathsep}{os.environ.get('PATH', '')}"
+    os.environ.pop("DEVELOPER_DIR", None)
+
+    from castar_tools import framework_snapshot, log_scan, paths
+    paths.set_project_root(project)
+    import check_sdk_api
+    import debug_app
+    import debug_headers
+
+    return [
+        Scenario("debug_headers", debug_headers.debug_headers, framework_snapshot.invalidate,
+                 args.headers, "headers"),
+        Scenario("check_sdk_api", check_sdk_api.check_sdk_api, framework_snapshot.invalidate,
+                 args.headers, "headers"),
+        # Lists every report but only reads the newest three
+        Scenario("analyze_crash_logs", debug_app.analyze_crash_logs,
+                 items=min(3, args.crash_files), unit="reports"),
+        Scenario("log_scan", lambda: log_scan.analyze(str(device_log), workers=args.log_workers),
+                 items=log_mb, unit="MB", pool=True),
+        Scenario("doctor (cold)", lambda: debug_app.check_flutter_environment({"refresh_doctor": True})),
+        Scenario("doctor (cached)", lambda: debug_app.check_flutter_environment({})),
+    ]
+
+# Baseline comparison
+
+def fixture_params(args):
+    return {name: getattr(args, name) for name in
+            ("headers", "methods", "crash_files", "crash_lines", "log_mb", "log_workers",
+             "flutter_latency")}
+
+def load_baseline(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def format_peak(result):
+    if result["peak_kb"] is None:
+        return f"{'-':>10}"
+    suffix = " RSS" if result["memory"] == "worker_rss" else ""
+    return f"{result['peak_kb']:>7.0f} KB{suffix}"
+
+def compare(name, result, baseline, args):
+    """Return a list of regression messages for one scenario"""
+    expected = baseline.get(name)
+    if expected is None:
+        return []
+    problems = []
+    allowed_ms = expected["p50_ms"] * args.scale * (1 + args.tolerance)
+    if result["p50_ms"] > max(allowed_ms, expected["p50_ms"] * args.scale + NOISE_FLOOR_MS):
+        problems.append(f"p50 {result['p50_ms']:.1f} ms vs baseline {expected['p50_ms']:.1f} ms")
+    # Traced allocations and worker RSS aren't comparable; neither is a missing sample
+    if result["peak_kb"] is None or expected.get("peak_kb") is None or \
+            result["memory"] != expected.get("memory", "traced"):
+        return problems
+    noise_kb = NOISE_FLOOR_RSS_KB if result["memory"] == "worker_rss" else NOISE_FLOOR_KB
+    allowed_kb = expected["peak_kb"] * (1 + args.tolerance)
+    if result["peak_kb"] > max(allowed_kb, expected["peak_kb"] + noise_kb):
+        problems.append(f"peak {result['peak_kb']:.0f} KB vs baseline {expected['peak_kb']:.0f} KB "
+                        f"({result['memory']})")
+    return problems
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Header / crash-log / doctor regression benchmark")
+    parser.add_argument("--runs", type=int, default=10, help="Timed runs per tool and round")
+    parser.add_argument("--rounds", type=int, default=3,
+                        help="Rounds per tool; the median round is reported and recorded")
+    parser.add_argument("--retries", type=int, default=2,
+                        help="Extra rounds for a tool that looks slower than the baseline")
+    parser.add_argument("--headers", type=int, default=2000, help="Headers in the synthetic framework")
+    parser.add_argument("--methods", type=int, default=30, help="Methods per synthetic header")
+    parser.add_argument("--crash-files", type=int, default=500, help="Crash reports in the corpus")
+    parser.add_argument("--crash-lines", type=int, default=2000, help="Lines per crash report")
+    parser.add_argument("--log-mb", type=int, default=32, help="Size of the synthetic device log in MB")
+    parser.add_argument("--log-workers", type=int, default=4, help="log_scan worker processes")
+    parser.add_argument("--flutter-latency", type=float, default=0.05,
+                        help="Seconds the fake flutter sleeps per invocation")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="Baseline JSON to compare against")
+    parser.add_argument("--update-baseline", action="store_true", help="Write this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="Allowed slowdown / memory growth over the baseline (0.5 = 50%%)")
+    parser.add_argument("--scale", type=float, default=float(os.environ.get("TOOL_BUDGET_SCALE", 1.0)),
+                        help="Multiply every baseline time, e.g. 2 on slow CI hosts")
+    parser.add_argument("--json", metavar="PATH", help="Also write the results as JSON")
+    args = parser.parse_args(argv)
+
+    print("🚀 castar-tools regression benchmark")
+    print("=" * 50)
+    print(f"📦 {args.headers} headers × {args.methods} methods, {args.crash_files} crash reports × "
+          f"{args.crash_lines} lines, {args.log_mb} MB device log, "
+          f"flutter latency {args.flutter_latency * 1000:.0f} ms")
+
+    baseline = None if args.update_baseline else load_baseline(args.baseline)
+    if baseline is not None and baseline.get("params") != fixture_params(args):
+        print("⚠️ Baseline was recorded with different fixture sizes; not comparing")
+        baseline = None
+    elif baseline is None and not args.update_baseline:
+        print(f"⚠️ No baseline at {args.baseline}; run with --update-baseline to record one")
+
+    results = {}
+    ok = True
+    with tempfile.TemporaryDirectory(prefix="castar-bench-") as workdir:
+        saved_environ = dict(os.environ)
+        try:
+            scenarios = build_scenarios(Path(workdir), args)
+            print(f"\n{'TOOL':<20} {'P50':>9} {'P90':>9} {'P99':>9} {'THROUGHPUT':>20} {'PEAK':>10}")
+            # Rounds go round-robin over the tools, so a slow spell on the
+            # host is spread across them instead of landing on one
+            rounds = {scenario.name: [] for scenario in scenarios}
+            for _ in range(max(1, args.rounds)):
+                for scenario in scenarios:
+                    rounds[scenario.name].append(measure(scenario, args.runs))
+            for scenario in scenarios:
+                result = median_round(rounds[scenario.name])
+                problems = compare(scenario.name, result, baseline, args) if baseline else []
+                # Confirm a regression with more rounds before failing on it
+                for _ in range(args.retries if problems else 0):
+                    rounds[scenario.name].append(measure(scenario, args.runs))
+                    result = median_round(rounds[scenario.name])
+                    problems = compare(scenario.name, result, baseline, args)
+                    if not problems:
+                        break
+                results[scenario.name] = result
+                status = "❌" if problems else "✅"
+                ok = ok and not problems
+                print(f"{status} {scenario.name:<18} {result['p50_ms']:>6.1f} ms {result['p90_ms']:>6.1f} ms "
+                      f"{result['p99_ms']:>6.1f} ms {result['throughput']:>10.1f} {result['unit']:<9} "
+                      f"{format_peak(result)}")
+                if result["rounds"] > args.rounds:
+                    print(f"   ↻ re-measured: median of {result['rounds']} rounds")
+                for problem in problems:
+                    print(f"   - {problem}")
+        finally:
+            os.environ.clear()
+            os.environ.update(saved_environ)
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "machine": platform.node(),
+        "python": platform.python_version(),
+        "params": fixture_params(args),
+        "results": results,
+    }
+    if args.update_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({"params": report["params"], "python": report["python"], **results}, f, indent=2)
+            f.write("\n")
+        print(f"\n📄 Baseline written to: {args.baseline}")
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"📄 Results saved to: {args.json}")
+
+    print("\n✅ No regressions" if ok else "\n❌ Slower or larger than the baseline")
+    return ok
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
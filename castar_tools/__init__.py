@@ -0,0 +1,3 @@
+"""
+Shared helpers for the CastarSDK Flutter app tooling scripts
+"""
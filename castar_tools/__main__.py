@@ -0,0 +1,5 @@
+from castar_tools.cli import run
+
+# Spawned pool workers re-import this module as __mp_main__
+if __name__ == "__main__":
+    run()
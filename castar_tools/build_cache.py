@@ -0,0 +1,300 @@
+"""
+Build cache analyzer and LRU pruner
+
+    castar-tools build-cache report
+    castar-tools build-cache prune --budget 20G [--dry-run]
+
+Walks Xcode DerivedData plus the project's build/ and .dart_tool/ with a
+pool of os.scandir workers sharing one directory queue, so a single huge
+subtree (e.g. Build/Intermediates.noindex) is still scanned in parallel.
+Sizes are rolled up per cache unit, a (project, kind) pair such as
+("Runner", "Build/Products"). Pruning deletes whole units, least recently
+used first, until the total fits the budget.
+"""
+
+import argparse
+import json
+import os
+import queue
+import shutil
+import stat
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from castar_tools import paths, profiling
+
+DEFAULT_DERIVED_DATA = Path.home() / "Library" / "Developer" / "Xcode" / "DerivedData"
+
+# DerivedData/<Project-hash>/Build is split one level further
+SPLIT_KINDS = {"Build"}
+# Never pruned: .dart_tool/castar_tools is this tooling's own state (framework
+# snapshot, plist/channel caches, profiles), and build/debug-info holds the
+# split debug info `castar-tools symbolize` needs to read release crash stacks
+KEEP_KINDS = {".dart_tool/castar_tools", "build/debug-info"}
+SIZE_UNITS = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+class CacheUnit:
+    """One prunable directory and its rolled-up totals"""
+    __slots__ = ("project", "kind", "path", "size", "files", "last_used")
+
+    def __init__(self, project, kind, path):
+        self.project = project
+        self.kind = kind
+        self.path = path
+        self.size = 0
+        self.files = 0
+        self.last_used = 0.0
+
+    def to_dict(self):
+        return {
+            "project": self.project,
+            "kind": self.kind,
+            "path": self.path,
+            "size": self.size,
+            "files": self.files,
+            "last_used": self.last_used,
+        }
+
+def _list_dirs(path):
+    try:
+        with os.scandir(path) as entries:
+            return sorted(entry.name for entry in entries if entry.is_dir(follow_symlinks=False))
+    except OSError:
+        return []
+
+def derived_data_units(derived_data):
+    """DerivedData/<Project>-<hash>/<kind> units (Build split into Products, Intermediates...)"""
+    units = []
+    for project_dir in _list_dirs(derived_data):
+        project_path = os.path.join(derived_data, project_dir)
+        if project_dir == "ModuleCache.noindex":
+            units.append(CacheUnit("(shared)", project_dir, project_path))
+            continue
+        project = project_dir.rsplit("-", 1)[0] if "-" in project_dir else project_dir
+        for kind in _list_dirs(project_path):
+            kind_path = os.path.join(project_path, kind)
+            if kind in SPLIT_KINDS:
+                for sub_kind in _list_dirs(kind_path):
+                    units.append(CacheUnit(project, f"{kind}/{sub_kind}", os.path.join(kind_path, sub_kind)))
+            else:
+                units.append(CacheUnit(project, kind, kind_path))
+    return units
+
+def project_units(project_root):
+    """build/<kind> and .dart_tool/<kind> units for a Flutter project"""
+    units = []
+    project = Path(project_root).name
+    for top in ("build", ".dart_tool"):
+        top_path = os.path.join(project_root, top)
+        for kind in _list_dirs(top_path):
+            if f"{top}/{kind}" in KEEP_KINDS:
+                continue
+            units.append(CacheUnit(project, f"{top}/{kind}", os.path.join(top_path, kind)))
+    return units
+
+def _disk_usage(info):
+    # Allocated blocks are what fills disks; Windows has no st_blocks
+    blocks = getattr(info, "st_blocks", None)
+    return blocks * 512 if blocks is not None else info.st_size
+
+@profiling.traced("io", "scan build caches")
+def scan_units(units, workers=None):
+    """Fill in size, file count and last use for every unit, in parallel"""
+    workers = workers or min(32, (os.cpu_count() or 1) * 4)
+    pending = queue.Queue()
+    for index, unit in enumerate(units):
+        pending.put((index, unit.path))
+
+    def worker():
+        # Per-worker totals, merged once at the end to avoid lock traffic
+        sizes = [0] * len(units)
+        counts = [0] * len(units)
+        last_used = [0.0] * len(units)
+        while True:
+            item = pending.get()
+            if item is None:
+                pending.task_done()
+                return sizes, counts, last_used
+            index, path = item
+            try:
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                pending.put((index, entry.path))
+                                continue
+                            info = entry.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        sizes[index] += _disk_usage(info)
+                        counts[index] += 1
+                        used = max(info.st_atime, info.st_mtime)
+                        if used > last_used[index]:
+                            last_used[index] = used
+            except OSError:
+                pass
+            finally:
+                pending.task_done()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(worker) for _ in range(workers)]
+        pending.join()
+        for _ in range(workers):
+            pending.put(None)
+        for future in futures:
+            sizes, counts, last_used = future.result()
+            for index, unit in enumerate(units):
+                unit.size += sizes[index]
+                unit.files += counts[index]
+                unit.last_used = max(unit.last_used, last_used[index])
+    return units
+
+def collect_units(derived_data=None, project_roots=(), workers=None):
+    derived_data = Path(derived_data) if derived_data else DEFAULT_DERIVED_DATA
+    units = []
+    if derived_data.is_dir():
+        units.extend(derived_data_units(str(derived_data)))
+    for root in project_roots:
+        units.extend(project_units(str(root)))
+    return scan_units(units, workers)
+
+def plan_prune(units, budget):
+    """Least recently used units to delete so the rest fits in budget bytes"""
+    total = sum(unit.size for unit in units)
+    victims = []
+    for unit in sorted(units, key=lambda unit: unit.last_used):
+        if total <= budget:
+            break
+        if not unit.size:
+            continue
+        victims.append(unit)
+        total -= unit.size
+    return victims, total
+
+@profiling.traced("io", "delete build caches")
+def _add_user_rwx(path):
+    os.chmod(path, stat.S_IMODE(os.lstat(path).st_mode) | stat.S_IRWXU)
+
+def _rmtree(path):
+    """shutil.rmtree that also removes read-only entries, as Xcode leaves in products"""
+    def make_writable(func, failed, _):
+        # Removing an entry needs write access to the directory holding it
+        _add_user_rwx(os.path.dirname(failed))
+        if os.path.isdir(failed) and not os.path.islink(failed):
+            _add_user_rwx(failed)
+            if func is not os.rmdir:
+                # It couldn't be listed, so nothing inside was removed yet
+                _rmtree(failed)
+                return
+        func(failed)
+    if sys.version_info >= (3, 12):
+        shutil.rmtree(path, onexc=make_writable)
+    else:
+        shutil.rmtree(path, onerror=make_writable)
+
+def delete_units(units, workers=None):
+    """Remove unit directories in parallel; returns the ones that failed"""
+    def remove(unit):
+        try:
+            _rmtree(unit.path)
+            return None
+        except OSError as e:
+            return unit, e
+
+    with ThreadPoolExecutor(max_workers=workers or min(8, len(units) or 1)) as pool:
+        return [failure for failure in pool.map(remove, units) if failure]
+
+def parse_size(text):
+    """'20G', '512M', '1.5T' or plain bytes"""
+    text = text.strip().upper().rstrip("B")
+    if text and text[-1] in SIZE_UNITS:
+        return int(float(text[:-1]) * SIZE_UNITS[text[-1]])
+    return int(text)
+
+def format_size(size):
+    for unit in ("B", "K", "M", "G"):
+        if size < 1024:
+            return f"{size:.0f}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}T"
+
+def _format_age(timestamp, now):
+    if not timestamp:
+        return "-"
+    days = (now - timestamp) / 86400
+    return f"{days:.0f}d ago" if days >= 1 else f"{days * 24:.0f}h ago"
+
+def print_report(units):
+    now = time.time()
+    units = sorted(units, key=lambda unit: unit.size, reverse=True)
+    print(f"{'SIZE':>9}  {'FILES':>9}  {'LAST USED':>10}  {'PROJECT':<24} KIND")
+    for unit in units:
+        print(f"{format_size(unit.size):>9}  {unit.files:>9}  {_format_age(unit.last_used, now):>10}  "
+              f"{unit.project:<24} {unit.kind}")
+
+    for label, key in (("project", lambda unit: unit.project), ("kind", lambda unit: unit.kind.split("/")[0])):
+        totals = {}
+        for unit in units:
+            totals[key(unit)] = totals.get(key(unit), 0) + unit.size
+        print(f"\n📊 By {label}:")
+        for name, size in sorted(totals.items(), key=lambda item: item[1], reverse=True):
+            print(f"   {format_size(size):>9}  {name}")
+    print(f"\n📦 Total: {format_size(sum(unit.size for unit in units))} "
+          f"in {sum(unit.files for unit in units)} files")
+
+def main(argv=None):
+    """Entry point for `castar-tools build-cache`"""
+    parser = argparse.ArgumentParser(prog="castar-tools build-cache",
+                                     description="Report and prune DerivedData / build caches")
+    parser.add_argument("action", choices=["report", "prune"])
+    parser.add_argument("--derived-data", help=f"DerivedData directory (default: {DEFAULT_DERIVED_DATA})")
+    parser.add_argument("--project", action="append",
+                        help="Flutter project root whose build/ and .dart_tool/ to include "
+                             "(repeatable; default: this project)")
+    parser.add_argument("--budget", help="prune: total size to keep, e.g. 20G")
+    parser.add_argument("--dry-run", action="store_true", help="prune: only show what would be deleted")
+    parser.add_argument("--workers", type=int, help="Parallel scandir workers")
+    parser.add_argument("--json", action="store_true", help="report: print units as JSON")
+    profiling.add_profile_argument(parser)
+    args = parser.parse_args(argv)
+
+    if args.action == "prune" and not args.budget:
+        parser.error("prune needs --budget")
+
+    with profiling.profile_session(args.profile, "build-cache"):
+        started = time.perf_counter()
+        units = collect_units(args.derived_data, args.project or [paths.project_root()], args.workers)
+        elapsed = time.perf_counter() - started
+
+        if args.action == "report":
+            if args.json:
+                print(json.dumps([unit.to_dict() for unit in units], indent=2))
+            else:
+                print_report(units)
+                print(f"⏱️ Scanned in {elapsed:.2f}s")
+            return True
+
+        budget = parse_size(args.budget)
+        victims, remaining = plan_prune(units, budget)
+        total = sum(unit.size for unit in units)
+        if not victims:
+            print(f"✅ {format_size(total)} is within the {format_size(budget)} budget")
+            return True
+
+        now = time.time()
+        print(f"🧹 Pruning {len(victims)} units to fit {format_size(budget)} "
+              f"({format_size(total)} → {format_size(remaining)})")
+        for unit in victims:
+            print(f"   - {format_size(unit.size):>9}  {_format_age(unit.last_used, now):>10}  {unit.path}")
+        if args.dry_run:
+            print("ℹ️ Dry run, nothing deleted")
+            return True
+
+        failures = delete_units(victims, args.workers)
+        for unit, error in failures:
+            print(f"❌ Could not delete {unit.path}: {error}")
+        if remaining > budget:
+            print(f"⚠️ Still over budget: {format_size(remaining)}")
+        return not failures
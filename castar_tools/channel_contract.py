@@ -0,0 +1,402 @@
+"""
+MethodChannel contract checker for the Dart and Swift sides
+
+    castar-tools channels [--rescan] [--json]
+
+Builds an index of MethodChannel names, invoked methods and argument map
+keys in lib/**/*.dart, and of channel names, handled `call.method` cases
+and argument keys read in ios/**/*.swift, then reports mismatches:
+
+- a method invoked from Dart that no Swift case handles (error)
+- a Dart channel name with no Swift channel of the same name (error)
+- an argument key a Swift handler requires in a `guard` that Dart does
+  not send (error); other unmatched keys and unused cases are warnings
+
+Per-file extraction results are cached in .dart_tool/castar_tools keyed
+by content hash; a file is only re-hashed when its size or mtime change
+and only re-parsed when its hash does, so the check is cheap enough to
+gate every debug_app.py build.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+from pathlib import Path
+
+from castar_tools import fileutil, paths, profiling
+
+INDEX_NAME = "channel_index.json"
+# Bump when extraction changes so cached per-file results are rebuilt
+INDEX_VERSION = 1
+SKIP_DIRS = {"Pods", ".symlinks", "Frameworks", "build", "DerivedData"}
+UNRESOLVED = "(unresolved)"
+
+DART_CHANNEL = re.compile(r"\b(\w+)\s*=\s*(?:const\s+)?(?:Optional)?MethodChannel\s*\(\s*(['\"])(.+?)\2")
+DART_INVOKE = re.compile(
+    r"\b(\w+)\s*\.\s*invoke(?:List|Map)?Method\s*(?:<[^>(]*>)?\s*\(\s*(['\"])(\w+)\2\s*(,)?")
+DART_MAP_START = re.compile(r"\s*(?:const\s+)?(?:<[^>]*>\s*)?\{")
+DART_KEY = re.compile(r"(['\"])(\w+)\1\s*:")
+
+SWIFT_CHANNEL = re.compile(r"\b(\w+)\s*=\s*FlutterMethodChannel\s*\(\s*name:\s*\"([^\"]+)\"")
+SWIFT_SWITCH = re.compile(r"\bswitch\s+(\w+)\s*\.\s*method\s*\{")
+SWIFT_CASE = re.compile(r"\b(case|default)\b")
+SWIFT_CASE_LABELS = re.compile(r"\s*((?:\"[^\"]*\"\s*,\s*)*\"[^\"]*\")\s*:")
+SWIFT_STRING = re.compile(r"\"([^\"]*)\"")
+SWIFT_IF_METHOD = re.compile(r"\b(\w+)\s*\.\s*method\s*==\s*\"([^\"]+)\"")
+SWIFT_FUNC = re.compile(r"\bfunc\s+(\w+)\s*(?:<[^>]*>)?\s*\(")
+SWIFT_CALL = re.compile(r"\b(\w+)\s*\(")
+SWIFT_SUBSCRIPT = re.compile(r"\[\s*\"(\w+)\"\s*\]")
+
+def mask_source(text):
+    """
+    Return (code, masked), both the same length as text. code has comments
+    blanked; masked additionally blanks string literal contents, so brace
+    matching on masked can't be fooled while regexes still read literals
+    from code at the same offsets.
+    """
+    code = list(text)
+    masked = list(text)
+    i = 0
+    length = len(text)
+
+    def blank(start, end, targets):
+        for index in range(start, end):
+            if text[index] != "\n":
+                for target in targets:
+                    target[index] = " "
+
+    while i < length:
+        char = text[i]
+        if text.startswith("//", i):
+            end = text.find("\n", i)
+            end = length if end < 0 else end
+            blank(i, end, (code, masked))
+            i = end
+        elif text.startswith("/*", i):
+            # Dart and Swift both nest block comments
+            depth, j = 1, i + 2
+            while j < length and depth:
+                if text.startswith("/*", j):
+                    depth, j = depth + 1, j + 2
+                elif text.startswith("*/", j):
+                    depth, j = depth - 1, j + 2
+                else:
+                    j += 1
+            blank(i, j, (code, masked))
+            i = j
+        elif char in "'\"":
+            quote = text[i:i + 3] if text[i:i + 3] in ("'''", '"""') else char
+            j = i + len(quote)
+            while j < length and not text.startswith(quote, j):
+                if text[j] == "\\":
+                    j += 1
+                elif len(quote) == 1 and text[j] == "\n":
+                    break
+                j += 1
+            blank(i + len(quote), min(j, length), (masked,))
+            i = j + len(quote)
+        else:
+            i += 1
+    return "".join(code), "".join(masked)
+
+def _block_end(masked, open_index):
+    """Index just past the brace matching masked[open_index] == '{'"""
+    depth = 0
+    for index in range(open_index, len(masked)):
+        char = masked[index]
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if not depth:
+                return index + 1
+    return len(masked)
+
+def _line_of(text, offset):
+    return text.count("\n", 0, offset) + 1
+
+def index_dart(text):
+    code, masked = mask_source(text)
+    channels = [{"var": match.group(1), "name": match.group(3), "line": _line_of(code, match.start())}
+                for match in DART_CHANNEL.finditer(code)]
+    calls = []
+    for match in DART_INVOKE.finditer(code):
+        keys = []
+        if match.group(4):
+            map_start = DART_MAP_START.match(code, match.end())
+            if map_start:
+                open_index = map_start.end() - 1
+                close_index = _block_end(masked, open_index)
+                keys = []
+                for key in DART_KEY.finditer(code, open_index, close_index):
+                    # Only top-level keys of the arguments map
+                    segment = masked[open_index:key.start()]
+                    if segment.count("{") - segment.count("}") == 1:
+                        keys.append(key.group(2))
+            else:
+                keys = None  # arguments built elsewhere; can't check keys
+        calls.append({"var": match.group(1), "method": match.group(3), "keys": keys,
+                      "line": _line_of(code, match.start())})
+    return {"channels": channels, "calls": calls}
+
+def _swift_keys(code, masked, start, end):
+    """Argument keys subscripted in [start, end) -> {key: required}"""
+    keys = {}
+    for match in SWIFT_SUBSCRIPT.finditer(code, start, end):
+        guard = masked.rfind("guard", start, match.start())
+        between = masked[guard:match.start()] if guard >= 0 else ""
+        required = guard >= 0 and "{" not in between and "}" not in between and " else" not in between
+        keys[match.group(1)] = keys.get(match.group(1), False) or required
+    return keys
+
+def index_swift(text):
+    code, masked = mask_source(text)
+    channels = [{"var": match.group(1), "name": match.group(2), "line": _line_of(code, match.start())}
+                for match in SWIFT_CHANNEL.finditer(code)]
+
+    functions = {}
+    for match in SWIFT_FUNC.finditer(masked):
+        open_index = masked.find("{", match.end())
+        if open_index >= 0:
+            functions[match.group(1)] = (open_index, _block_end(masked, open_index))
+
+    def body_keys(start, end):
+        keys = _swift_keys(code, masked, start, end)
+        # Follow one level of calls into handlers defined in the same file
+        for call in SWIFT_CALL.finditer(masked, start, end):
+            span = functions.get(call.group(1))
+            if span:
+                for key, required in _swift_keys(code, masked, *span).items():
+                    keys[key] = keys.get(key, False) or required
+        return keys
+
+    cases = []
+    for switch in SWIFT_SWITCH.finditer(masked):
+        open_index = switch.end() - 1
+        close_index = _block_end(masked, open_index)
+        labels = []
+        for label in SWIFT_CASE.finditer(masked, open_index, close_index):
+            segment = masked[open_index:label.start()]
+            if segment.count("{") - segment.count("}") == 1:
+                labels.append(label)
+        for position, label in enumerate(labels):
+            body_end = labels[position + 1].start() if position + 1 < len(labels) else close_index - 1
+            if label.group(1) != "case":
+                continue
+            values = SWIFT_CASE_LABELS.match(code, label.end())
+            if not values:
+                continue
+            keys = body_keys(values.end(), body_end)
+            for method in SWIFT_STRING.findall(values.group(1)):
+                cases.append({"method": method, "keys": keys, "line": _line_of(code, label.start())})
+
+    for match in SWIFT_IF_METHOD.finditer(code):
+        open_index = masked.find("{", match.end())
+        if open_index >= 0:
+            keys = body_keys(open_index, _block_end(masked, open_index))
+            cases.append({"method": match.group(2), "keys": keys, "line": _line_of(code, match.start())})
+    return {"channels": channels, "cases": cases}
+
+INDEXERS = {".dart": index_dart, ".swift": index_swift}
+
+def source_files(root):
+    """lib/**/*.dart and ios/**/*.swift, skipping Pods and vendored frameworks"""
+    files = []
+    for top, suffix in (("lib", ".dart"), ("ios", ".swift")):
+        for directory, subdirs, names in os.walk(root / top):
+            subdirs[:] = sorted(name for name in subdirs if name not in SKIP_DIRS and not name.startswith("."))
+            files.extend(Path(directory) / name for name in sorted(names) if name.endswith(suffix))
+    return files
+
+def default_index_path():
+    return paths.state_dir() / INDEX_NAME
+
+def _load_index(index_path):
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get("version") != INDEX_VERSION:
+        return {}
+    return data.get("files", {})
+
+@profiling.traced("io", "index channel sources")
+def build_index(root=None, index_path=None, rescan=False):
+    """
+    Index every source file, reusing cached entries whose hash is unchanged.
+
+    Returns (files, stats) where files maps a root-relative path to its
+    extraction result and stats counts reused / hashed / parsed files.
+    """
+    root = Path(root) if root else paths.project_root()
+    index_path = Path(index_path) if index_path else default_index_path()
+    cached = {} if rescan else _load_index(index_path)
+    files = {}
+    stats = {"files": 0, "reused": 0, "hashed": 0, "parsed": 0}
+
+    for path in source_files(root):
+        relative = path.relative_to(root).as_posix()
+        info = path.stat()
+        entry = cached.get(relative)
+        stats["files"] += 1
+        if entry and entry["mtime_ns"] == info.st_mtime_ns and entry["size"] == info.st_size:
+            files[relative] = entry
+            stats["reused"] += 1
+            continue
+
+        data = path.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()
+        stats["hashed"] += 1
+        if entry and entry["sha256"] == digest:
+            entry = dict(entry, mtime_ns=info.st_mtime_ns, size=info.st_size)
+        else:
+            stats["parsed"] += 1
+            text = data.decode("utf-8", "replace")
+            entry = {
+                "mtime_ns": info.st_mtime_ns,
+                "size": info.st_size,
+                "sha256": digest,
+                "index": INDEXERS[path.suffix](text),
+            }
+        files[relative] = entry
+
+    if files != cached:
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        fileutil.atomic_write_text(index_path, json.dumps({"version": INDEX_VERSION, "files": files}))
+    return files, stats
+
+def _resolve(channels_by_file, all_names, relative, var=None):
+    """Channel name an invocation / case belongs to"""
+    local = channels_by_file.get(relative, [])
+    if var is not None:
+        for channel in local:
+            if channel["var"] == var:
+                return channel["name"]
+    if len(local) == 1:
+        return local[0]["name"]
+    if len(all_names) == 1:
+        return next(iter(all_names))
+    return UNRESOLVED
+
+def check_contract(files):
+    """Compare the Dart and Swift sides; returns a list of issue dicts"""
+    dart_channels, swift_channels = {}, {}
+    for relative, entry in files.items():
+        target = dart_channels if relative.endswith(".dart") else swift_channels
+        if entry["index"]["channels"]:
+            target[relative] = entry["index"]["channels"]
+    dart_names = {channel["name"] for channels in dart_channels.values() for channel in channels}
+    swift_names = {channel["name"] for channels in swift_channels.values() for channel in channels}
+
+    calls, handled = [], {}
+    for relative, entry in files.items():
+        index = entry["index"]
+        for call in index.get("calls", []):
+            channel = _resolve(dart_channels, dart_names, relative, call["var"])
+            calls.append((channel, relative, call))
+        for case in index.get("cases", []):
+            channel = _resolve(swift_channels, swift_names, relative)
+            handled.setdefault((channel, case["method"]), (relative, case))
+
+    issues = []
+
+    def issue(severity, message, relative, line):
+        issues.append({"severity": severity, "message": message, "file": relative, "line": line})
+
+    for relative, channels in dart_channels.items():
+        for channel in channels:
+            if channel["name"] not in swift_names:
+                issue("error", f"Channel '{channel['name']}' has no FlutterMethodChannel on the iOS side",
+                      relative, channel["line"])
+    for relative, channels in swift_channels.items():
+        for channel in channels:
+            if channel["name"] not in dart_names:
+                issue("warning", f"Channel '{channel['name']}' is never created in Dart", relative, channel["line"])
+
+    invoked = set()
+    for channel, relative, call in calls:
+        method = call["method"]
+        match = handled.get((channel, method)) or handled.get((UNRESOLVED, method))
+        if match is None and channel == UNRESOLVED:
+            match = next((value for (_, name), value in handled.items() if name == method), None)
+        invoked.add(method)
+        if match is None:
+            issue("error", f"'{method}' on {channel} is not handled by any Swift case "
+                           "(FlutterMethodNotImplemented at runtime)", relative, call["line"])
+            continue
+        if call["keys"] is None:
+            continue
+        swift_keys = match[1]["keys"]
+        for key, required in sorted(swift_keys.items()):
+            if key not in call["keys"]:
+                issue("error" if required else "warning",
+                      f"'{method}' handler {'requires' if required else 'reads'} argument '{key}' "
+                      "that Dart does not send", relative, call["line"])
+        for key in call["keys"]:
+            if key not in swift_keys:
+                issue("warning", f"'{method}' sends argument '{key}' that the Swift handler never reads",
+                      relative, call["line"])
+
+    for (channel, method), (relative, case) in sorted(handled.items()):
+        if method not in invoked:
+            issue("warning", f"Swift handles '{method}' on {channel} but Dart never invokes it",
+                  relative, case["line"])
+    return issues
+
+def summarize(files):
+    """Channel -> {'dart': [methods], 'swift': [methods]} for the report"""
+    summary = {}
+    for relative, entry in sorted(files.items()):
+        side = "dart" if relative.endswith(".dart") else "swift"
+        index = entry["index"]
+        for channel in index["channels"]:
+            summary.setdefault(channel["name"], {"dart": [], "swift": []})
+        methods = [call["method"] for call in index.get("calls", [])] + \
+                  [case["method"] for case in index.get("cases", [])]
+        if not methods:
+            continue
+        names = [channel["name"] for channel in index["channels"]] or [UNRESOLVED]
+        for name in names:
+            bucket = summary.setdefault(name, {"dart": [], "swift": []})[side]
+            bucket.extend(method for method in methods if method not in bucket)
+    return summary
+
+def run_check(root=None, rescan=False, verbose=True):
+    """Index, compare and print; returns (ok, issues)"""
+    files, stats = build_index(root, rescan=rescan)
+    issues = check_contract(files)
+    if verbose:
+        for name, sides in summarize(files).items():
+            print(f"📡 {name}")
+            print(f"   Dart invokes: {', '.join(sides['dart']) or '-'}")
+            print(f"   Swift handles: {', '.join(sides['swift']) or '-'}")
+        print(f"   ({stats['files']} files, {stats['parsed']} parsed, "
+              f"{stats['files'] - stats['parsed']} from cache)")
+    for found in issues:
+        marker = "❌" if found["severity"] == "error" else "⚠️"
+        print(f"{marker} {found['file']}:{found['line']}: {found['message']}")
+    errors = [found for found in issues if found["severity"] == "error"]
+    if not errors:
+        print("✅ MethodChannel contract matches")
+    return not errors, issues
+
+def main(argv=None):
+    """Entry point for `castar-tools channels`"""
+    parser = argparse.ArgumentParser(prog="castar-tools channels",
+                                     description="Check that Dart MethodChannel calls match the Swift handlers")
+    parser.add_argument("--rescan", action="store_true", help="Ignore the cached per-file index")
+    parser.add_argument("--json", action="store_true", help="Print the index summary and issues as JSON")
+    profiling.add_profile_argument(parser)
+    args = parser.parse_args(argv)
+
+    with profiling.profile_session(args.profile, "channels"):
+        if args.json:
+            files, _ = build_index(rescan=args.rescan)
+            issues = check_contract(files)
+            print(json.dumps({"channels": summarize(files), "issues": issues}, indent=2))
+            return not any(found["severity"] == "error" for found in issues)
+        ok, _ = run_check(rescan=args.rescan)
+    return ok
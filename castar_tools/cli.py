@@ -0,0 +1,125 @@
+"""
+Unified entry point for the CastarSDK tooling scripts
+
+    castar-tools [--root DIR] <command> [args...]
+
+Subcommand modules are only imported once their command is dispatched,
+so `--help` and quick checks don't pay for unused imports. Keep the
+imports at the top of this module to the standard library minimum.
+"""
+
+import sys
+from pathlib import Path
+
+# The scripts ship with the tools, not with the project --root points at
+TOOLS_ROOT = Path(__file__).resolve().parent.parent
+
+# command -> (module, function, help). ios/ modules are resolved lazily.
+COMMANDS = {
+    "doctor": ("debug_app", "main", "Run the full app diagnostics (debug_app.py)"),
+    "flutter-doctor": ("castar_tools.flutter_doctor", "main", "Show parsed, cached flutter doctor -v results"),
+    "fleet": ("debug_app", "fleet_main", "Run the non-build checks across many project checkouts"),
+    "history": ("castar_tools.report_history", "main", "Query the debug report history"),
+    "headers": ("debug_headers", "main", "Examine CastarSDK header files"),
+    "api": ("check_sdk_api", "main", "List methods declared in the CastarSDK headers"),
+    "integrate": ("integrate_framework", "main", "Verify the framework is wired into the Xcode project"),
+    "add-framework": ("add_framework_to_project", "main", "Add CastarSDK.framework to project.pbxproj"),
+    "fetch-sdk": ("castar_tools.sdk_fetch", "main", "Download CastarSDK.framework through the verified cache"),
+    "symbolize": ("castar_tools.symbolize", "main", "Symbolize Dart stack traces using split debug info"),
+    "build-cache": ("castar_tools.build_cache", "main", "Report and LRU-prune DerivedData / build caches"),
+    "ipa-size": ("castar_tools.ipa_size", "main", "Break down IPA size by bundle component, or diff two IPAs"),
+    "logs": ("castar_tools.log_scan", "main", "Scan captured device logs for SDK, channel and Flutter errors"),
+    "channels": ("castar_tools.channel_contract", "main", "Check Dart MethodChannel calls against the Swift handlers"),
+    "plist": ("castar_tools.plist_rules", "main", "Check the Runner and CastarSDK Info.plist files against rules"),
+    "fix-swift": ("fix_framework_swift", "main", "Check and fix the framework for Swift compatibility"),
+}
+
+# Modules that live under ios/ rather than on the default import path
+IOS_MODULES = {
+    "debug_headers",
+    "check_sdk_api",
+    "integrate_framework",
+    "add_framework_to_project",
+    "fix_framework_swift",
+}
+
+def format_help():
+    """Build the top-level help text without importing any subcommand"""
+    width = max(len(name) for name in COMMANDS)
+    lines = [
+        "usage: castar-tools [--root DIR] <command> [args...]",
+        "",
+        "CastarSDK Flutter app tooling",
+        "",
+        "commands:",
+    ]
+    for name, (_, _, help_text) in COMMANDS.items():
+        lines.append(f"  {name.ljust(width)}  {help_text}")
+    lines += [
+        "",
+        "options:",
+        "  -h, --help  show this help message and exit",
+        "  --root DIR  project root (default: nearest directory with pubspec.yaml)",
+        "",
+        "Run 'castar-tools <command> --help' for command options.",
+    ]
+    return "\n".join(lines)
+
+def load_command(name):
+    """Import the module for a command and return its entry function"""
+    import importlib
+
+    module_name, function_name, _ = COMMANDS[name]
+    if module_name in IOS_MODULES:
+        search_path = str(TOOLS_ROOT / "ios")
+    else:
+        search_path = str(TOOLS_ROOT)
+    if search_path not in sys.path:
+        sys.path.insert(0, search_path)
+    module = importlib.import_module(module_name)
+    return getattr(module, function_name)
+
+def main(argv=None):
+    """Dispatch to a subcommand"""
+    argv = list(sys.argv[1:] if argv is None else argv)
+
+    root = None
+    while argv and argv[0].startswith("-"):
+        option = argv.pop(0)
+        if option in ("-h", "--help"):
+            print(format_help())
+            return True
+        if option == "--root" and argv:
+            root = argv.pop(0)
+        elif option.startswith("--root="):
+            root = option.split("=", 1)[1]
+        else:
+            print(f"❌ Unknown option: {option}\n")
+            print(format_help())
+            return False
+
+    if not argv:
+        print(format_help())
+        return False
+
+    command = argv.pop(0)
+    if command not in COMMANDS:
+        print(f"❌ Unknown command: {command}\n")
+        print(format_help())
+        return False
+
+    from castar_tools import paths
+    if root:
+        paths.set_project_root(root)
+    else:
+        paths.project_root()
+
+    return load_command(command)(argv)
+
+def run():
+    """Console entry point"""
+    success = main()
+    sys.exit(0 if success else 1)
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,154 @@
+"""
+Small file helpers shared by the tools that edit project files
+
+Edits to files other jobs may be editing at the same time (project.pbxproj,
+framework headers, generated scripts) go through edit_file(): the edit is
+computed from an unlocked read, then committed under an advisory lock only
+if the file's hash is still the one the edit was computed from. Otherwise
+the edit is re-applied to the new content, so concurrent writers compose
+instead of overwriting each other.
+"""
+
+import contextlib
+import hashlib
+import os
+import tempfile
+import time
+from pathlib import Path
+
+DEFAULT_LOCK_TIMEOUT = float(os.environ.get("CASTAR_TOOLS_LOCK_TIMEOUT", "60"))
+LOCK_POLL_SECONDS = 0.05
+EDIT_ATTEMPTS = 5
+LOCK_SUFFIX = ".castar-lock"
+# Directories Xcode treats as a single item; no lock files inside these
+BUNDLE_SUFFIXES = {".framework", ".xcframework", ".xcodeproj", ".xcworkspace", ".app", ".bundle"}
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+class LockTimeout(Exception):
+    pass
+
+def atomic_write_text(path, text, encoding='utf-8', mode=None):
+    """
+    Replace path with text via a temp file + rename.
+
+    Readers never see a half-written file, and a hardlinked file (e.g. a
+    framework materialized from the SDK cache) gets a new inode instead of
+    the shared cached copy being modified in place. mode applies to a new
+    file; an existing file keeps its permissions.
+    """
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{path.name}.", dir=path.parent)
+    try:
+        with os.fdopen(fd, 'w', encoding=encoding) as f:
+            f.write(text)
+        if path.exists():
+            os.chmod(tmp_path, path.stat().st_mode & 0o7777)
+        elif mode is not None:
+            os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+def lock_path_for(path):
+    """
+    Sidecar lock file for path: .<name>.castar-lock in the same directory.
+
+    It has to outlive every job that may edit the file, so it can't sit
+    under .dart_tool (`flutter clean` would let two jobs lock different
+    inodes). Files inside a bundle (CastarSDK.framework, Runner.xcodeproj)
+    lock next to the outermost bundle instead, so nothing gets embedded in
+    the app or shows up in Xcode. Lock files are never deleted: removing
+    one another job holds is racy.
+    """
+    path = Path(path).resolve()
+    anchor = path
+    for parent in path.parents:
+        if parent.suffix in BUNDLE_SUFFIXES:
+            anchor = parent
+    name = path.relative_to(anchor.parent).as_posix().replace("/", "_")
+    return anchor.parent / f".{name.lstrip('.')}{LOCK_SUFFIX}"
+
+def _try_lock(fd):
+    try:
+        if fcntl:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+def _unlock(fd):
+    if fcntl:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+@contextlib.contextmanager
+def file_lock(path, timeout=None):
+    """Hold an exclusive advisory lock for path, waiting up to timeout seconds"""
+    timeout = DEFAULT_LOCK_TIMEOUT if timeout is None else timeout
+    lock_path = lock_path_for(path)
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        deadline = time.monotonic() + timeout
+        while not _try_lock(fd):
+            if time.monotonic() >= deadline:
+                raise LockTimeout(f"Timed out after {timeout:.0f}s waiting for the lock on {path} "
+                                  f"({lock_path})")
+            time.sleep(LOCK_POLL_SECONDS)
+        try:
+            yield
+        finally:
+            _unlock(fd)
+    finally:
+        os.close(fd)
+
+def _read(path, encoding):
+    """(text, sha256) of path, or (None, None) if it doesn't exist"""
+    try:
+        data = Path(path).read_bytes()
+    except FileNotFoundError:
+        return None, None
+    return data.decode(encoding), hashlib.sha256(data).hexdigest()
+
+def edit_file(path, edit, encoding='utf-8', mode=None, timeout=None, attempts=EDIT_ATTEMPTS):
+    """
+    Apply edit(text) -> new text (or None for "no change") to path.
+
+    text is None when path doesn't exist yet. edit must be safe to call
+    more than once: when another writer commits between our read and our
+    commit (the hash changed), it is re-applied to the new content. The
+    last of the attempts reads, edits and commits entirely under the lock.
+
+    Returns True if the file was written.
+    """
+    for _ in range(attempts - 1):
+        text, digest = _read(path, encoding)
+        new_text = edit(text)
+        if new_text is None or new_text == text:
+            return False
+        with file_lock(path, timeout):
+            if _read(path, encoding)[1] == digest:
+                atomic_write_text(path, new_text, encoding, mode)
+                return True
+        # Another writer committed in between; re-apply the edit to its result
+
+    # Still contended: read, edit and commit all under the lock
+    with file_lock(path, timeout):
+        text, _ = _read(path, encoding)
+        new_text = edit(text)
+        if new_text is None or new_text == text:
+            return False
+        atomic_write_text(path, new_text, encoding, mode)
+        return True
@@ -0,0 +1,274 @@
+"""
+Structured parsing and caching of `flutter doctor -v` output
+
+Doctor output is turned into one record per section:
+
+    {"name": "Xcode", "status": "ok", "summary": "...", "version": "15.2",
+     "details": [...], "issues": [...]}
+
+`flutter doctor -v` is slow, so the parsed result is cached keyed by the
+Flutter SDK revision and the selected Xcode. Repeated diagnostics reuse
+it until one of those changes.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess
+import time
+from pathlib import Path
+
+from castar_tools import paths, profiling
+
+CACHE_NAME = "flutter_doctor.json"
+
+# Section header marks, including the ASCII variants used on Windows
+STATUS_MARKS = {
+    "✓": "ok",
+    "√": "ok",
+    "!": "partial",
+    "✗": "missing",
+    "X": "missing",
+    "☠": "crash",
+}
+
+SECTION_RE = re.compile(r"^\[(?P<mark>.)\]\s+(?P<summary>.+?)\s*$")
+ITEM_RE = re.compile(r"^\s+(?P<mark>[•!✗X])\s+(?P<text>.+?)\s*$")
+VERSION_RE = re.compile(r"\b(\d+\.\d+(?:\.\d+)*)\b")
+FLUTTER_VERSION_RE = re.compile(r"Flutter version (\S+)")
+
+def _section_name(summary):
+    """'Xcode - develop for iOS and macOS (Xcode 15.2)' -> 'Xcode'"""
+    name = summary.split(" - ", 1)[0]
+    return re.sub(r"\s*\(.*\)\s*$", "", name).strip()
+
+def _summary_version(summary):
+    """Version from the header's parenthetical, e.g. '(Xcode 15.2)'"""
+    match = re.search(r"\(([^()]*)\)\s*$", summary)
+    if not match:
+        return ""
+    version = VERSION_RE.search(match.group(1))
+    return version.group(1) if version else ""
+
+def parse_doctor_output(text):
+    """Parse `flutter doctor -v` text into a list of section records"""
+    sections = []
+    current = None
+    last_kind = None
+    for line in text.splitlines():
+        section = SECTION_RE.match(line)
+        if section:
+            summary = section.group("summary")
+            current = {
+                "name": _section_name(summary),
+                "status": STATUS_MARKS.get(section.group("mark"), "unknown"),
+                "summary": summary,
+                "version": _summary_version(summary),
+                "details": [],
+                "issues": [],
+            }
+            sections.append(current)
+            last_kind = None
+            continue
+        if not line.strip():
+            continue
+        if not line[0].isspace():
+            # Footer such as "! Doctor found issues in 2 categories."
+            current = None
+            continue
+        if current is None:
+            continue
+
+        item = ITEM_RE.match(line)
+        if item:
+            message = item.group("text")
+            if item.group("mark") == "•":
+                current["details"].append(message)
+                last_kind = "details"
+                flutter_version = FLUTTER_VERSION_RE.search(message)
+                if flutter_version and current["name"] == "Flutter":
+                    current["version"] = flutter_version.group(1)
+            else:
+                severity = "warning" if item.group("mark") == "!" else "error"
+                current["issues"].append({"severity": severity, "message": message})
+                last_kind = "issues"
+        elif last_kind == "issues":
+            # Indented continuation of the previous issue
+            current["issues"][-1]["message"] += " " + line.strip()
+        elif last_kind == "details":
+            current["details"][-1] += " " + line.strip()
+    return sections
+
+def find_section(sections, *names):
+    """Return the first section whose name starts with any of names"""
+    for section in sections:
+        if any(section["name"].startswith(name) for name in names):
+            return section
+    return None
+
+def ios_toolchain(sections):
+    """The iOS toolchain section ('Xcode' on current Flutter, 'iOS toolchain' on older)"""
+    return find_section(sections, "Xcode", "iOS toolchain")
+
+def _read_git_revision(sdk_root):
+    """Resolve HEAD of the Flutter SDK checkout without spawning git"""
+    git_dir = sdk_root / ".git"
+    try:
+        head = (git_dir / "HEAD").read_text().strip()
+    except OSError:
+        return ""
+    if not head.startswith("ref:"):
+        return head
+    ref = head.split(" ", 1)[1]
+    try:
+        return (git_dir / ref).read_text().strip()
+    except OSError:
+        pass
+    try:
+        for line in (git_dir / "packed-refs").read_text().splitlines():
+            if line.endswith(" " + ref):
+                return line.split(" ", 1)[0]
+    except OSError:
+        pass
+    return ""
+
+def flutter_sdk_revision():
+    """Identify the installed Flutter SDK (revision, falling back to its version files)"""
+    executable = shutil.which("flutter")
+    if not executable:
+        return ""
+    sdk_root = Path(executable).resolve().parent.parent
+    revision = _read_git_revision(sdk_root)
+    if revision:
+        return revision
+    for version_file in (sdk_root / "bin" / "cache" / "flutter.version.json", sdk_root / "version"):
+        try:
+            return hashlib.sha256(version_file.read_bytes()).hexdigest()
+        except OSError:
+            continue
+    return str(sdk_root)
+
+def xcode_identity():
+    """Selected Xcode path plus its Info.plist mtime, so in-place updates count as changes"""
+    developer_dir = os.environ.get("DEVELOPER_DIR", "")
+    if not developer_dir and shutil.which("xcode-select"):
+        try:
+            result = profiling.run(["xcode-select", "-p"], capture_output=True, text=True, timeout=10)
+            developer_dir = result.stdout.strip()
+        except (OSError, subprocess.TimeoutExpired):
+            developer_dir = ""
+    if not developer_dir:
+        return ""
+    info_plist = Path(developer_dir).parent / "Info.plist"
+    try:
+        return f"{developer_dir}@{info_plist.stat().st_mtime_ns}"
+    except OSError:
+        return developer_dir
+
+@profiling.traced()
+def cache_key():
+    """Key that changes whenever the Flutter SDK or Xcode changes"""
+    return {"flutter_revision": flutter_sdk_revision(), "xcode": xcode_identity()}
+
+def default_cache_path():
+    return paths.cache_dir() / CACHE_NAME
+
+def load_cached(key, cache_path=None):
+    """Return cached sections for this key, or None"""
+    cache_path = cache_path or default_cache_path()
+    try:
+        with profiling.span("read doctor cache", "io"):
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cached.get("key") != key:
+        return None
+    return cached
+
+@profiling.traced("io")
+def save_cached(key, sections, cache_path=None):
+    """Persist parsed sections for this key"""
+    cache_path = cache_path or default_cache_path()
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_suffix(".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"key": key, "created_at": time.time(), "sections": sections}, f,
+                  indent=2, ensure_ascii=False)
+    os.replace(tmp_path, cache_path)
+
+def run_doctor(timeout=300):
+    """Run `flutter doctor -v`, returning (returncode, stdout, stderr)"""
+    try:
+        result = profiling.run(
+            ["flutter", "doctor", "-v"],
+            capture_output=True,
+            text=True,
+            encoding='utf-8',
+            errors='replace',
+            timeout=timeout,
+        )
+        return result.returncode, result.stdout, result.stderr
+    except subprocess.TimeoutExpired:
+        return -1, "", "Command timed out"
+    except Exception as e:
+        return -1, "", str(e)
+
+def get_doctor_sections(refresh=False, cache_path=None):
+    """
+    Return (sections, from_cache, error).
+
+    Runs `flutter doctor -v` only when the cache is missing, stale or
+    refresh is requested. sections is None when doctor itself failed.
+    """
+    key = cache_key()
+    # Without a Flutter SDK revision there is nothing to key the cache on
+    if not refresh and key["flutter_revision"]:
+        cached = load_cached(key, cache_path)
+        if cached is not None:
+            return cached["sections"], True, ""
+
+    code, stdout, stderr = run_doctor()
+    with profiling.span("parse doctor output"):
+        sections = parse_doctor_output(stdout)
+    if not sections:
+        return None, False, stderr or f"flutter doctor exited with {code}"
+    # Doctor exits non-zero when any section has issues; the output is still valid
+    try:
+        save_cached(key, sections, cache_path)
+    except OSError as e:
+        print(f"⚠️ Could not cache doctor output: {e}")
+    return sections, False, ""
+
+def print_sections(sections):
+    icons = {"ok": "✅", "partial": "⚠️", "missing": "❌", "crash": "💥"}
+    for section in sections:
+        version = f" {section['version']}" if section["version"] else ""
+        print(f"{icons.get(section['status'], '❔')} {section['name']}{version}")
+        for issue in section["issues"]:
+            print(f"   - {issue['message']}")
+
+def main(argv=None):
+    """Entry point for `castar-tools flutter-doctor`"""
+    parser = argparse.ArgumentParser(prog="castar-tools flutter-doctor",
+                                     description="Parsed, cached flutter doctor -v")
+    parser.add_argument("--refresh", action="store_true", help="Ignore the cache and rerun doctor")
+    parser.add_argument("--json", action="store_true", help="Print the parsed sections as JSON")
+    profiling.add_profile_argument(parser)
+    args = parser.parse_args(argv)
+
+    with profiling.profile_session(args.profile, "flutter-doctor"):
+        sections, from_cache, error = get_doctor_sections(refresh=args.refresh)
+    if sections is None:
+        print(f"❌ Flutter doctor failed: {error}")
+        return False
+    if args.json:
+        print(json.dumps(sections, indent=2, ensure_ascii=False))
+    else:
+        print_sections(sections)
+        if from_cache:
+            print("\n♻️ Reused cached doctor output (use --refresh to rerun)")
+    return True
@@ -0,0 +1,364 @@
+"""
+Single-scan snapshot of CastarSDK.framework shared by all tools
+
+The bundle is walked once into a compact model (file list with sizes and
+hashes, header text, parsed Info.plist, module map and a Mach-O summary
+of the binary). The snapshot is saved under .dart_tool/castar_tools so
+later steps of the same pipeline reuse it instead of re-reading the
+bundle. Its fingerprint covers the path, size and mtime of every file,
+so files added, removed or edited in place are all noticed; tools that
+edit the bundle also call invalidate().
+"""
+
+import datetime
+import hashlib
+import json
+import os
+import plistlib
+import struct
+import time
+from pathlib import Path
+
+from castar_tools import paths, profiling
+
+SNAPSHOT_NAME = "framework_snapshot.json"
+SNAPSHOT_VERSION = 2
+CHUNK_SIZE = 1024 * 1024
+
+# Mach-O constants (mach-o/loader.h, mach-o/fat.h)
+MH_MAGIC = 0xFEEDFACE
+MH_MAGIC_64 = 0xFEEDFACF
+FAT_MAGIC = 0xCAFEBABE
+FAT_MAGIC_64 = 0xCAFEBABF
+AR_MAGIC = b"!<arch>\n"
+LC_VERSION_MIN_IPHONEOS = 0x25
+LC_BUILD_VERSION = 0x32
+FILE_TYPES = {1: "object", 2: "executable", 6: "dylib", 8: "bundle"}
+CPU_TYPES = {7: "i386", 0x01000007: "x86_64", 12: "arm", 0x0100000C: "arm64"}
+
+class FileEntry:
+    """One file inside the bundle"""
+    __slots__ = ("path", "size", "sha256")
+
+    def __init__(self, path, size, sha256):
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+
+    def to_list(self):
+        return [self.path, self.size, self.sha256]
+
+class BinarySummary:
+    """What the tools need to know about the framework binary"""
+    __slots__ = ("exists", "size", "sha256", "kind", "archs", "min_os")
+
+    def __init__(self, exists=False, size=0, sha256="", kind="", archs=(), min_os=""):
+        self.exists = exists
+        self.size = size
+        self.sha256 = sha256
+        self.kind = kind
+        self.archs = list(archs)
+        self.min_os = min_os
+
+    @property
+    def is_dynamic(self):
+        return self.kind == "dylib"
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+class FrameworkSnapshot:
+    """Everything the tools read from CastarSDK.framework, captured in one scan"""
+    __slots__ = ("root", "exists", "fingerprint", "scanned_at", "directories", "files",
+                 "headers", "info_plist", "modulemap", "binary")
+
+    def __init__(self, root, exists=False, fingerprint=None, scanned_at=0.0, directories=(),
+                 files=(), headers=None, info_plist=None, modulemap=None, binary=None):
+        self.root = str(root)
+        self.exists = exists
+        self.fingerprint = fingerprint or ""
+        self.scanned_at = scanned_at
+        self.directories = list(directories)
+        self.files = list(files)
+        self.headers = headers or {}
+        self.info_plist = info_plist
+        self.modulemap = modulemap
+        self.binary = binary or BinarySummary()
+
+    @property
+    def header_names(self):
+        return sorted(self.headers)
+
+    @property
+    def has_headers(self):
+        return "Headers" in self.directories
+
+    @property
+    def has_modules(self):
+        return "Modules" in self.directories
+
+    @property
+    def total_size(self):
+        return sum(entry.size for entry in self.files)
+
+    def has_file(self, relpath):
+        return any(entry.path == relpath for entry in self.files)
+
+    def summary(self):
+        """Compact dict for debug reports"""
+        return {
+            "framework_exists": self.exists,
+            "headers_exist": self.has_headers,
+            "header_files": self.header_names,
+            "file_count": len(self.files),
+            "total_size": self.total_size,
+            "info_plist_exists": self.info_plist is not None,
+            "modulemap_exists": self.modulemap is not None,
+            "binary": self.binary.to_dict(),
+        }
+
+    def to_dict(self):
+        return {
+            "version": SNAPSHOT_VERSION,
+            "root": self.root,
+            "exists": self.exists,
+            "fingerprint": self.fingerprint,
+            "scanned_at": self.scanned_at,
+            "directories": self.directories,
+            "files": [entry.to_list() for entry in self.files],
+            "headers": self.headers,
+            "info_plist": jsonable(self.info_plist),
+            "modulemap": self.modulemap,
+            "binary": self.binary.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            root=data["root"],
+            exists=data["exists"],
+            fingerprint=data["fingerprint"],
+            scanned_at=data["scanned_at"],
+            directories=data["directories"],
+            files=[FileEntry(*entry) for entry in data["files"]],
+            headers=data["headers"],
+            info_plist=data["info_plist"],
+            modulemap=data["modulemap"],
+            binary=BinarySummary(**data["binary"]),
+        )
+
+def jsonable(value):
+    """Make parsed plist values (bytes, dates) JSON-serializable"""
+    if isinstance(value, dict):
+        return {key: jsonable(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [jsonable(item) for item in value]
+    if isinstance(value, bytes):
+        return value.hex()
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    return value
+
+def _hash_file(path):
+    """Return (size, sha256, first chunk) reading the file once"""
+    digest = hashlib.sha256()
+    size = 0
+    head = b""
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            if not size:
+                head = chunk
+            size += len(chunk)
+            digest.update(chunk)
+    return size, digest.hexdigest(), head
+
+def _decode_version(packed):
+    """Mach-O packed version (xxxx.yy.zz) -> '17.0'"""
+    major, minor, patch = packed >> 16, (packed >> 8) & 0xFF, packed & 0xFF
+    return f"{major}.{minor}.{patch}" if patch else f"{major}.{minor}"
+
+def _parse_macho(header, offset=0):
+    """Return (kind, arch, min_os) for a thin Mach-O image starting at offset"""
+    if len(header) < offset + 28:
+        return "", "", ""
+    magic = struct.unpack_from("<I", header, offset)[0]
+    if magic not in (MH_MAGIC, MH_MAGIC_64):
+        return "", "", ""
+    cputype, _, filetype, ncmds, _ = struct.unpack_from("<iiIII", header, offset + 4)
+    cursor = offset + (32 if magic == MH_MAGIC_64 else 28)
+    min_os = ""
+    for _ in range(ncmds):
+        if cursor + 8 > len(header):
+            break
+        cmd, cmdsize = struct.unpack_from("<II", header, cursor)
+        if cmd == LC_BUILD_VERSION and cursor + 16 <= len(header):
+            min_os = _decode_version(struct.unpack_from("<I", header, cursor + 12)[0])
+            break
+        if cmd == LC_VERSION_MIN_IPHONEOS and cursor + 12 <= len(header):
+            min_os = _decode_version(struct.unpack_from("<I", header, cursor + 8)[0])
+            break
+        if cmdsize == 0:
+            break
+        cursor += cmdsize
+    return FILE_TYPES.get(filetype, f"type-{filetype}"), CPU_TYPES.get(cputype, hex(cputype)), min_os
+
+@profiling.traced("io", "hash framework binary")
+def summarize_binary(path):
+    """Classify the framework binary from its Mach-O / fat / ar header"""
+    if not path.is_file():
+        return BinarySummary()
+    size, sha256, header = _hash_file(path)
+
+    if header.startswith(AR_MAGIC):
+        return BinarySummary(True, size, sha256, "static")
+
+    magic = struct.unpack_from(">I", header)[0] if len(header) >= 8 else 0
+    if magic in (FAT_MAGIC, FAT_MAGIC_64):
+        count = struct.unpack_from(">I", header, 4)[0]
+        entry_size = 32 if magic == FAT_MAGIC_64 else 20
+        archs, kind, min_os = [], "", ""
+        for index in range(count):
+            start = 8 + index * entry_size
+            if start + entry_size > len(header):
+                break
+            cputype = struct.unpack_from(">i", header, start)[0]
+            archs.append(CPU_TYPES.get(cputype, hex(cputype)))
+            if index == 0:
+                if magic == FAT_MAGIC_64:
+                    slice_offset = struct.unpack_from(">Q", header, start + 8)[0]
+                else:
+                    slice_offset = struct.unpack_from(">I", header, start + 8)[0]
+                with open(path, 'rb') as f:
+                    f.seek(slice_offset)
+                    slice_header = f.read(64 * 1024)
+                if slice_header.startswith(AR_MAGIC):
+                    kind = "static"
+                else:
+                    kind, _, min_os = _parse_macho(slice_header)
+        return BinarySummary(True, size, sha256, kind, archs, min_os)
+
+    kind, arch, min_os = _parse_macho(header)
+    return BinarySummary(True, size, sha256, kind or "unknown", [arch] if arch else [], min_os)
+
+def fingerprint(framework_dir):
+    """
+    Change detector from stat() alone: digest of (path, size, mtime) for
+    every file in the bundle. Directory mtimes are not enough, since
+    editing a header in place leaves them unchanged.
+    """
+    framework_dir = Path(framework_dir)
+    if not framework_dir.is_dir():
+        return ""
+    digest = hashlib.sha1()
+    for dirpath, dirnames, filenames in os.walk(framework_dir):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            full_path = Path(dirpath) / filename
+            try:
+                stat = full_path.stat()
+            except OSError:
+                continue
+            relpath = full_path.relative_to(framework_dir).as_posix()
+            digest.update(f"{relpath}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+@profiling.traced("io", "scan framework")
+def scan(framework_dir=None):
+    """Walk the bundle once and build a snapshot"""
+    framework_dir = Path(framework_dir or paths.framework_dir())
+    snapshot = FrameworkSnapshot(framework_dir, scanned_at=time.time(),
+                                 fingerprint=fingerprint(framework_dir))
+    if not framework_dir.is_dir():
+        return snapshot
+    snapshot.exists = True
+
+    binary_name = framework_dir.name.rsplit(".", 1)[0]
+    for dirpath, dirnames, filenames in os.walk(framework_dir):
+        dirnames.sort()
+        for dirname in dirnames:
+            snapshot.directories.append((Path(dirpath) / dirname).relative_to(framework_dir).as_posix())
+        for filename in sorted(filenames):
+            full_path = Path(dirpath) / filename
+            relpath = full_path.relative_to(framework_dir).as_posix()
+            if relpath == binary_name:
+                snapshot.binary = summarize_binary(full_path)
+                snapshot.files.append(FileEntry(relpath, snapshot.binary.size, snapshot.binary.sha256))
+                continue
+            data = full_path.read_bytes()
+            snapshot.files.append(FileEntry(relpath, len(data), hashlib.sha256(data).hexdigest()))
+            if relpath.startswith("Headers/") and filename.endswith(".h"):
+                snapshot.headers[filename] = data.decode('utf-8', errors='replace')
+            elif relpath == "Modules/module.modulemap":
+                snapshot.modulemap = data.decode('utf-8', errors='replace')
+            elif relpath == "Info.plist":
+                try:
+                    snapshot.info_plist = jsonable(plistlib.loads(data))
+                except Exception:
+                    snapshot.info_plist = {}
+    return snapshot
+
+def default_snapshot_path():
+    return paths.state_dir() / SNAPSHOT_NAME
+
+@profiling.traced("io", "save framework snapshot")
+def save(snapshot, snapshot_path=None):
+    """Write the snapshot for later pipeline steps"""
+    snapshot_path = Path(snapshot_path or default_snapshot_path())
+    snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = snapshot_path.with_suffix(".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot.to_dict(), f, ensure_ascii=False)
+    os.replace(tmp_path, snapshot_path)
+
+@profiling.traced("io", "load framework snapshot")
+def load(snapshot_path=None):
+    """Read a saved snapshot, or None if missing or from another format version"""
+    snapshot_path = Path(snapshot_path or default_snapshot_path())
+    try:
+        with open(snapshot_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != SNAPSHOT_VERSION:
+        return None
+    return FrameworkSnapshot.from_dict(data)
+
+_current = None
+
+def get_snapshot(refresh=False, framework_dir=None, snapshot_path=None):
+    """
+    Return the shared snapshot for this process.
+
+    Order of preference: the in-memory snapshot, the saved snapshot if
+    its fingerprint still matches, then a fresh scan (which is saved).
+    """
+    global _current
+    framework_dir = Path(framework_dir or paths.framework_dir())
+    if not refresh and _current is not None and _current.root == str(framework_dir):
+        return _current
+
+    if not refresh:
+        saved = load(snapshot_path)
+        if (saved is not None and saved.root == str(framework_dir)
+                and saved.fingerprint == fingerprint(framework_dir)):
+            _current = saved
+            return saved
+
+    _current = scan(framework_dir)
+    try:
+        save(_current, snapshot_path)
+    except OSError as e:
+        print(f"⚠️ Could not save framework snapshot: {e}")
+    return _current
+
+def invalidate(snapshot_path=None):
+    """Drop the shared snapshot after editing the bundle"""
+    global _current
+    _current = None
+    try:
+        Path(snapshot_path or default_snapshot_path()).unlink()
+    except FileNotFoundError:
+        pass
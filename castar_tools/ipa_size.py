@@ -0,0 +1,308 @@
+"""
+IPA / app bundle size breakdown
+
+    castar-tools ipa-size [build/ios/ipa/app.ipa] [--top 20]
+    castar-tools ipa-size new.ipa --base old.ipa
+
+Only the zip end-of-central-directory record and the central directory
+are read, never the member data, so a multi-hundred-MB IPA is summarized
+in one seek and one read. Sizes are grouped by bundle component (the
+CastarSDK framework, Flutter engine, Dart AOT snapshot, flutter_assets,
+fonts...) and two archives can be diffed component by component.
+"""
+
+import argparse
+import json
+import os
+import struct
+from pathlib import Path
+
+from castar_tools import paths, profiling
+
+EOCD_SIG = b"PK\x05\x06"
+ZIP64_LOCATOR_SIG = b"PK\x06\x07"
+ZIP64_EOCD_SIG = 0x06064B50
+CENTRAL_HEADER_SIG = 0x02014B50
+ZIP64_EXTRA_ID = 0x0001
+UTF8_FLAG = 0x800
+
+EOCD = struct.Struct("<4sHHHHIIH")
+ZIP64_LOCATOR = struct.Struct("<4sIQI")
+ZIP64_EOCD = struct.Struct("<IQHHIIQQQQ")
+CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+# EOCD (22 bytes) plus the largest possible archive comment
+EOCD_SEARCH = EOCD.size + 0xFFFF
+
+class ArchiveError(Exception):
+    pass
+
+class Entry:
+    """One central directory record"""
+    __slots__ = ("name", "compressed", "uncompressed")
+
+    def __init__(self, name, compressed, uncompressed):
+        self.name = name
+        self.compressed = compressed
+        self.uncompressed = uncompressed
+
+def _zip64_values(extra, compressed, uncompressed):
+    offset = 0
+    while offset + 4 <= len(extra):
+        header_id, size = struct.unpack_from("<HH", extra, offset)
+        if header_id == ZIP64_EXTRA_ID:
+            values = list(struct.unpack_from(f"<{size // 8}Q", extra, offset + 4))
+            if uncompressed == 0xFFFFFFFF and values:
+                uncompressed = values.pop(0)
+            if compressed == 0xFFFFFFFF and values:
+                compressed = values.pop(0)
+            break
+        offset += 4 + size
+    return compressed, uncompressed
+
+def _locate_central_directory(f, file_size):
+    """Return (offset, size, entry count) of the central directory"""
+    tail_size = min(file_size, EOCD_SEARCH)
+    f.seek(file_size - tail_size)
+    tail = f.read(tail_size)
+    position = tail.rfind(EOCD_SIG)
+    if position < 0:
+        raise ArchiveError("not a zip archive (no end of central directory record)")
+    _, _, _, _, count, cd_size, cd_offset, _ = EOCD.unpack_from(tail, position)
+
+    if count == 0xFFFF or cd_size == 0xFFFFFFFF or cd_offset == 0xFFFFFFFF:
+        locator_position = position - ZIP64_LOCATOR.size
+        if locator_position < 0 or tail[locator_position:locator_position + 4] != ZIP64_LOCATOR_SIG:
+            raise ArchiveError("zip64 archive without a zip64 locator")
+        _, _, zip64_offset, _ = ZIP64_LOCATOR.unpack_from(tail, locator_position)
+        f.seek(zip64_offset)
+        record = f.read(ZIP64_EOCD.size)
+        fields = ZIP64_EOCD.unpack(record)
+        if fields[0] != ZIP64_EOCD_SIG:
+            raise ArchiveError("corrupt zip64 end of central directory record")
+        count, cd_size, cd_offset = fields[7], fields[8], fields[9]
+    return cd_offset, cd_size, count
+
+@profiling.traced("io", "read central directory")
+def read_entries(archive_path):
+    """List every member's name and sizes from the central directory alone"""
+    with open(archive_path, "rb") as f:
+        file_size = os.fstat(f.fileno()).st_size
+        cd_offset, cd_size, count = _locate_central_directory(f, file_size)
+        f.seek(cd_offset)
+        directory = f.read(cd_size)
+    if len(directory) != cd_size:
+        raise ArchiveError("truncated central directory")
+
+    entries = []
+    offset = 0
+    unpack = CENTRAL_HEADER.unpack_from
+    for _ in range(count):
+        (signature, _, _, flags, _, _, _, _, compressed, uncompressed,
+         name_length, extra_length, comment_length, _, _, _, _) = unpack(directory, offset)
+        if signature != CENTRAL_HEADER_SIG:
+            raise ArchiveError(f"bad central directory record at offset {cd_offset + offset}")
+        offset += CENTRAL_HEADER.size
+        raw_name = directory[offset:offset + name_length]
+        name = raw_name.decode("utf-8" if flags & UTF8_FLAG else "cp437")
+        offset += name_length
+        if compressed == 0xFFFFFFFF or uncompressed == 0xFFFFFFFF:
+            compressed, uncompressed = _zip64_values(
+                directory[offset:offset + extra_length], compressed, uncompressed)
+        offset += extra_length + comment_length
+        if not name.endswith("/"):
+            entries.append(Entry(name, compressed, uncompressed))
+    return entries, file_size
+
+def read_bundle(app_path):
+    """Entries for an unpacked .app directory (compressed size = file size)"""
+    app_path = Path(app_path)
+    entries = []
+    for directory, _, files in os.walk(app_path):
+        for name in files:
+            path = Path(directory) / name
+            size = path.lstat().st_size
+            relative = Path("Payload") / app_path.name / path.relative_to(app_path)
+            entries.append(Entry(relative.as_posix(), size, size))
+    return entries, sum(entry.compressed for entry in entries)
+
+def component_of(name):
+    """Map an archive member to the bundle component it belongs to"""
+    parts = name.split("/")
+    if parts[0] != "Payload" or len(parts) < 3 or not parts[1].endswith(".app"):
+        # SwiftSupport/, Symbols/, META-INF/...
+        return parts[0] if len(parts) > 1 else "(archive root)"
+
+    app_name = parts[1][:-len(".app")]
+    inner = parts[2:]
+    top = inner[0]
+    if len(inner) == 1:
+        if top == app_name:
+            return "Runner executable"
+        if top.endswith(".car"):
+            return "Asset catalog"
+        return "Other resources"
+    if top == "Frameworks" and len(inner) > 2:
+        framework = inner[1]
+        if framework == "App.framework":
+            if inner[2] == "flutter_assets":
+                if len(inner) > 4 and inner[3] in ("fonts", "packages") and inner[-1].endswith((".otf", ".ttf")):
+                    return "flutter_assets (fonts)"
+                return "flutter_assets"
+            return "App.framework (Dart AOT)"
+        return f"Frameworks/{framework}"
+    if top == "PlugIns" and len(inner) > 2:
+        return f"PlugIns/{inner[1]}"
+    if top == "_CodeSignature":
+        return "Code signature"
+    if top.endswith(".lproj"):
+        return "Localizations"
+    return f"{top}/"
+
+class Breakdown:
+    """Per-component totals for one archive"""
+    __slots__ = ("path", "archive_size", "components", "entries")
+
+    def __init__(self, path, archive_size, entries):
+        self.path = str(path)
+        self.archive_size = archive_size
+        self.entries = entries
+        self.components = {}
+        for entry in entries:
+            totals = self.components.setdefault(component_of(entry.name), [0, 0, 0])
+            totals[0] += entry.compressed
+            totals[1] += entry.uncompressed
+            totals[2] += 1
+
+    @property
+    def compressed(self):
+        return sum(totals[0] for totals in self.components.values())
+
+    @property
+    def uncompressed(self):
+        return sum(totals[1] for totals in self.components.values())
+
+    def to_dict(self):
+        return {
+            "path": self.path,
+            "archive_size": self.archive_size,
+            "compressed": self.compressed,
+            "uncompressed": self.uncompressed,
+            "components": {
+                name: {"compressed": totals[0], "uncompressed": totals[1], "files": totals[2]}
+                for name, totals in self.components.items()
+            },
+        }
+
+def analyze(path):
+    path = Path(path)
+    if path.is_dir():
+        entries, size = read_bundle(path)
+    else:
+        entries, size = read_entries(path)
+    return Breakdown(path, size, entries)
+
+def default_ipa():
+    """Newest IPA from `flutter build ipa`"""
+    candidates = sorted((paths.project_root() / "build" / "ios" / "ipa").glob("*.ipa"),
+                        key=lambda candidate: candidate.stat().st_mtime)
+    return candidates[-1] if candidates else None
+
+def format_size(size):
+    sign = "-" if size < 0 else ""
+    size = abs(size)
+    for unit in ("B", "K", "M"):
+        if size < 1024:
+            return f"{sign}{size:.0f}{unit}" if unit == "B" else f"{sign}{size:.1f}{unit}"
+        size /= 1024
+    return f"{sign}{size:.1f}G"
+
+def _percent(part, whole):
+    """Share of whole; every breakdown row uses the archive size on disk"""
+    return f"{100 * part / whole:5.1f}%" if whole else "    -"
+
+def print_breakdown(breakdown, top):
+    print(f"📦 {breakdown.path}: {format_size(breakdown.archive_size)} on disk, "
+          f"{format_size(breakdown.uncompressed)} installed, {len(breakdown.entries)} files")
+    print(f"\n{'COMPRESSED':>11} {'SHARE':>6}  {'INSTALLED':>10}  {'FILES':>6}  COMPONENT")
+    rows = sorted(breakdown.components.items(), key=lambda item: item[1][0], reverse=True)
+    for name, (compressed, uncompressed, files) in rows:
+        print(f"{format_size(compressed):>11} {_percent(compressed, breakdown.archive_size)}  "
+              f"{format_size(uncompressed):>10}  {files:>6}  {name}")
+    overhead = breakdown.archive_size - breakdown.compressed
+    if overhead > 0:
+        print(f"{format_size(overhead):>11} {_percent(overhead, breakdown.archive_size)}  "
+              f"{'':>10}  {'':>6}  (zip headers)")
+
+    if top:
+        print(f"\n🔝 Largest {top} files (compressed):")
+        for entry in sorted(breakdown.entries, key=lambda entry: entry.compressed, reverse=True)[:top]:
+            print(f"{format_size(entry.compressed):>11}  {format_size(entry.uncompressed):>10}  {entry.name}")
+
+def diff(base, current):
+    """[(component, base compressed, current compressed, base installed, current installed)]"""
+    rows = []
+    for name in set(base.components) | set(current.components):
+        old = base.components.get(name, [0, 0, 0])
+        new = current.components.get(name, [0, 0, 0])
+        rows.append((name, old[0], new[0], old[1], new[1]))
+    rows.sort(key=lambda row: abs(row[2] - row[1]), reverse=True)
+    return rows
+
+def diff_to_dict(rows):
+    return [
+        {"component": name, "base_compressed": old, "compressed": new,
+         "base_uncompressed": old_installed, "uncompressed": new_installed,
+         "compressed_change": new - old, "uncompressed_change": new_installed - old_installed}
+        for name, old, new, old_installed, new_installed in rows
+    ]
+
+def print_diff(base, current, rows):
+    delta = current.archive_size - base.archive_size
+    print(f"📦 {base.path} → {current.path}")
+    print(f"   archive {format_size(base.archive_size)} → {format_size(current.archive_size)} "
+          f"({'+' if delta >= 0 else ''}{format_size(delta)})")
+    print(f"\n{'BASE':>10}  {'CURRENT':>10}  {'Δ COMPRESSED':>13}  {'Δ INSTALLED':>12}  COMPONENT")
+    for name, old, new, old_installed, new_installed in rows:
+        if old == new and old_installed == new_installed:
+            continue
+        change = new - old
+        installed_change = new_installed - old_installed
+        print(f"{format_size(old):>10}  {format_size(new):>10}  "
+              f"{('+' if change >= 0 else '') + format_size(change):>13}  "
+              f"{('+' if installed_change >= 0 else '') + format_size(installed_change):>12}  {name}")
+
+def main(argv=None):
+    """Entry point for `castar-tools ipa-size`"""
+    parser = argparse.ArgumentParser(prog="castar-tools ipa-size",
+                                     description="Break down IPA size by bundle component")
+    parser.add_argument("ipa", nargs="?", help="IPA or .app to analyze (default: newest build/ios/ipa/*.ipa)")
+    parser.add_argument("--base", help="Earlier IPA or .app to diff against")
+    parser.add_argument("--top", type=int, default=10, help="Show the N largest files (default: 10, 0 to hide)")
+    parser.add_argument("--json", action="store_true", help="Print the breakdown (and diff) as JSON")
+    profiling.add_profile_argument(parser)
+    args = parser.parse_args(argv)
+
+    ipa = args.ipa or default_ipa()
+    if not ipa:
+        print("❌ No IPA given and none found in build/ios/ipa (run 'flutter build ipa' first)")
+        return False
+
+    with profiling.profile_session(args.profile, "ipa-size"):
+        try:
+            current = analyze(ipa)
+            base = analyze(args.base) if args.base else None
+        except (OSError, ArchiveError, struct.error) as e:
+            print(f"❌ Cannot read archive: {e}")
+            return False
+
+        if args.json:
+            result = current.to_dict()
+            if base:
+                result["base"] = base.to_dict()
+                result["diff"] = diff_to_dict(diff(base, current))
+            print(json.dumps(result, indent=2))
+        elif base:
+            print_diff(base, current, diff(base, current))
+        else:
+            print_breakdown(current, args.top)
+    return True
@@ -0,0 +1,334 @@
+"""
+Offline analyzer for captured device / console logs
+
+    castar-tools logs device.log [--context 2] [--samples 3]
+    castar-tools logs device.log --pattern timeout='timed? ?out'
+
+The log is memory-mapped and split into chunks on line boundaries; each
+chunk is scanned by a process pool worker with the pattern sets below
+compiled once per worker. Workers only return counts and byte offsets,
+so a multi-GB log never crosses a process boundary. The parent turns the
+offsets into line numbers and cuts context windows from its own mapping.
+
+Within a set, patterns are alternatives of one regex tried at each
+position in order, so list the more specific pattern first. Different
+sets are scanned independently and may match the same line.
+"""
+
+import argparse
+import functools
+import json
+import mmap
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from castar_tools import profiling
+
+# set -> [(pattern name, regex, anchors)], most specific first. Anchors are
+# literals every match contains; lines are found with a plain substring
+# search for them and only those lines go through the regex. A pattern
+# with no anchors makes its whole set fall back to a full regex scan.
+PATTERN_SETS = {
+    "castarsdk": [
+        ("library-not-loaded", rb"Library not loaded: [^\n]*CastarSDK", (b"Library not loaded",)),
+        ("symbol-not-found", rb"Symbol not found: [^\n]*CastarSDK", (b"Symbol not found",)),
+        ("sdk", rb"CastarSDK", (b"CastarSDK",)),
+    ],
+    "channel": [
+        ("missing-plugin", rb"MissingPluginException\([^\n]*com\.castarsdk\.flutter/castar",
+         (b"MissingPluginException",)),
+        ("channel", rb"com\.castarsdk\.flutter/castar", (b"com.castarsdk.flutter/castar",)),
+        ("method", rb"\b(?:startCastarSdk|stopCastarSdk|getCastarStatus)\b", (b"CastarS",)),
+    ],
+    "flutter": [
+        ("framework-exception", rb"EXCEPTION CAUGHT BY [A-Z ]+", (b"EXCEPTION CAUGHT BY",)),
+        ("unhandled-exception", rb"Unhandled Exception:", (b"Unhandled Exception:",)),
+        ("platform-exception", rb"PlatformException\(", (b"PlatformException(",)),
+        ("missing-plugin", rb"MissingPluginException\(", (b"MissingPluginException(",)),
+        ("failed-assertion", rb"Failed assertion:", (b"Failed assertion:",)),
+        ("native-crash", rb"Terminating app due to uncaught exception|EXC_BAD_ACCESS|SIGABRT|SIGSEGV",
+         (b"Terminating app due to uncaught exception", b"EXC_BAD_ACCESS", b"SIGABRT", b"SIGSEGV")),
+    ],
+}
+
+MIN_CHUNK = 4 * 1024 * 1024
+MAX_CHUNK = 64 * 1024 * 1024
+# Below this, pool start-up costs more than scanning inline
+INLINE_LIMIT = 2 * MIN_CHUNK
+MAX_LINE_SHOWN = 240
+
+@functools.lru_cache(maxsize=None)
+def _compile(pattern_sets):
+    """One alternation regex per set (group i names pattern i) plus its anchors"""
+    compiled = []
+    for set_name, patterns in pattern_sets:
+        alternatives = "|".join(
+            f"(?P<p{index}>{regex.decode('latin-1')})" for index, (_, regex, _) in enumerate(patterns))
+        anchors = None
+        if all(pattern_anchors for _, _, pattern_anchors in patterns):
+            anchors = sorted({anchor for _, _, pattern_anchors in patterns for anchor in pattern_anchors})
+        compiled.append((set_name, [name for name, _, _ in patterns],
+                         re.compile(alternatives.encode("latin-1")), anchors))
+    return compiled
+
+def _freeze(pattern_sets):
+    # Hashable for the per-process compile cache and cheap to pickle
+    return tuple((set_name, tuple(patterns)) for set_name, patterns in pattern_sets.items())
+
+def chunk_bounds(mapping, size, chunk_size):
+    """[(start, end)] covering the file, every end just past a newline"""
+    bounds = []
+    start = 0
+    while start < size:
+        end = min(start + chunk_size, size)
+        if end < size:
+            newline = mapping.find(b"\n", end)
+            end = size if newline < 0 else newline + 1
+        bounds.append((start, end))
+        start = end
+    return bounds
+
+def _candidate_lines(mapping, start, end, anchors):
+    """Sorted (line start, line end) of lines in the chunk containing any anchor"""
+    lines = {}
+    for anchor in anchors:
+        position = mapping.find(anchor, start, end)
+        while position >= 0:
+            line_start = mapping.rfind(b"\n", start, position) + 1 or start
+            line_end = mapping.find(b"\n", position, end)
+            line_end = end if line_end < 0 else line_end
+            lines[line_start] = line_end
+            position = mapping.find(anchor, line_end, end)
+    return sorted(lines.items())
+
+def scan_chunk(path, start, end, frozen_sets, samples):
+    """
+    Scan one chunk; returns its newline count and, per (set, pattern),
+    [count, [(offset, line in chunk)...] first samples, (offset, line) last].
+    """
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+        results = {}
+        for set_name, names, regex, anchors in _compile(frozen_sets):
+            if anchors is None:
+                matches = regex.finditer(mapping, start, end)
+            else:
+                matches = (match for line_start, line_end in _candidate_lines(mapping, start, end, anchors)
+                           for match in regex.finditer(mapping, line_start, line_end))
+            line = 0
+            counted_to = start
+            for match in matches:
+                position = match.start()
+                line += mapping[counted_to:position].count(b"\n")
+                counted_to = position
+                key = (set_name, names[int(match.lastgroup[1:])])
+                result = results.get(key)
+                if result is None:
+                    result = results[key] = [0, [], None]
+                result[0] += 1
+                if len(result[1]) < samples:
+                    result[1].append((position, line))
+                result[2] = (position, line)
+        newlines = mapping[start:end].count(b"\n")
+    return newlines, results
+
+class Occurrence:
+    __slots__ = ("line", "offset")
+
+    def __init__(self, line, offset):
+        self.line = line
+        self.offset = offset
+
+class PatternStats:
+    __slots__ = ("set_name", "name", "count", "samples", "last")
+
+    def __init__(self, set_name, name):
+        self.set_name = set_name
+        self.name = name
+        self.count = 0
+        self.samples = []
+        self.last = None
+
+    @property
+    def first(self):
+        return self.samples[0] if self.samples else None
+
+def _line_bounds(mapping, offset, size):
+    start = mapping.rfind(b"\n", 0, offset) + 1
+    end = mapping.find(b"\n", offset)
+    return start, size if end < 0 else end
+
+def _decode(raw):
+    text = raw.decode("utf-8", "replace").rstrip("\r")
+    return text if len(text) <= MAX_LINE_SHOWN else text[:MAX_LINE_SHOWN] + "…"
+
+def line_text(mapping, offset, size):
+    start, end = _line_bounds(mapping, offset, size)
+    return _decode(mapping[start:end])
+
+def context_window(mapping, offset, size, before, after):
+    """Lines around the one containing offset, as [(relative index, text)]"""
+    start, end = _line_bounds(mapping, offset, size)
+    lines = [(0, _decode(mapping[start:end]))]
+    cursor = start
+    for index in range(1, before + 1):
+        if cursor == 0:
+            break
+        previous = mapping.rfind(b"\n", 0, cursor - 1) + 1
+        lines.insert(0, (-index, _decode(mapping[previous:cursor - 1])))
+        cursor = previous
+    cursor = end
+    for index in range(1, after + 1):
+        if cursor >= size:
+            break
+        following = mapping.find(b"\n", cursor + 1)
+        following = size if following < 0 else following
+        lines.append((index, _decode(mapping[cursor + 1:following])))
+        cursor = following
+    return lines
+
+@profiling.traced("phase", "scan log")
+def analyze(path, pattern_sets=None, samples=3, workers=None, chunk_size=None):
+    """Run every pattern set over the log; returns ([PatternStats], line count, bytes)"""
+    frozen = _freeze(pattern_sets or PATTERN_SETS)
+    size = os.path.getsize(path)
+    stats = {}
+    for set_name, patterns in frozen:
+        for name, _, _ in patterns:
+            stats[(set_name, name)] = PatternStats(set_name, name)
+    if not size:
+        return list(stats.values()), 0, 0
+
+    workers = workers or os.cpu_count() or 1
+    chunk_size = chunk_size or max(MIN_CHUNK, min(MAX_CHUNK, size // (workers * 4) + 1))
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+        bounds = chunk_bounds(mapping, size, chunk_size)
+
+    jobs = [(path, start, end, frozen, samples) for start, end in bounds]
+    if size <= INLINE_LIMIT or workers == 1:
+        chunk_results = [scan_chunk(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunk_results = list(pool.map(scan_chunk, *zip(*jobs)))
+
+    # Chunks come back in file order, so first/last merge by position
+    line_base = 0
+    for newlines, results in chunk_results:
+        for key, (count, chunk_samples, last) in results.items():
+            pattern = stats[key]
+            pattern.count += count
+            for offset, line in chunk_samples:
+                if len(pattern.samples) < samples:
+                    pattern.samples.append(Occurrence(line_base + line + 1, offset))
+            pattern.last = Occurrence(line_base + last[1] + 1, last[0])
+        line_base += newlines
+    lines = line_base + (1 if not _ends_with_newline(path, size) else 0)
+    return list(stats.values()), lines, size
+
+def _ends_with_newline(path, size):
+    with open(path, "rb") as f:
+        f.seek(size - 1)
+        return f.read(1) == b"\n"
+
+def parse_pattern(text):
+    """NAME=REGEX from --pattern"""
+    name, separator, regex = text.partition("=")
+    if not separator or not name or not regex:
+        raise argparse.ArgumentTypeError(f"expected NAME=REGEX, got {text!r}")
+    try:
+        re.compile(regex.encode())
+    except re.error as e:
+        raise argparse.ArgumentTypeError(f"bad regex for {name}: {e}")
+    return name, regex.encode(), ()
+
+def print_report(path, stats, lines, size, elapsed, context):
+    rate = size / elapsed / 1024 ** 2 if elapsed else 0
+    print(f"📄 {path}: {lines} lines, {size / 1024 ** 2:.1f} MB scanned in {elapsed:.2f}s ({rate:.0f} MB/s)")
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+        current_set = None
+        for pattern in stats:
+            if pattern.set_name != current_set:
+                current_set = pattern.set_name
+                print(f"\n🔍 {current_set}")
+            if not pattern.count:
+                print(f"   {pattern.name:<22} 0")
+                continue
+            print(f"   {pattern.name:<22} {pattern.count:<8} first line {pattern.first.line}, "
+                  f"last line {pattern.last.line}")
+            print(f"      first: {line_text(mapping, pattern.first.offset, size)}")
+            if pattern.last.offset != pattern.first.offset:
+                print(f"      last:  {line_text(mapping, pattern.last.offset, size)}")
+
+        if context is None:
+            return
+        for pattern in stats:
+            for occurrence in pattern.samples:
+                print(f"\n--- {pattern.set_name}/{pattern.name} at line {occurrence.line} ---")
+                for relative, text in context_window(mapping, occurrence.offset, size, context, context):
+                    marker = ">" if relative == 0 else " "
+                    print(f"{marker}{occurrence.line + relative:>8}: {text}")
+
+def to_dict(path, stats, lines, size, context):
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+        def occurrence(found):
+            if found is None:
+                return None
+            entry = {"line": found.line, "text": line_text(mapping, found.offset, size)}
+            if context is not None:
+                entry["context"] = [text for _, text in context_window(
+                    mapping, found.offset, size, context, context)]
+            return entry
+
+        return {
+            "path": path,
+            "lines": lines,
+            "bytes": size,
+            "patterns": [{
+                "set": pattern.set_name,
+                "pattern": pattern.name,
+                "count": pattern.count,
+                "first": occurrence(pattern.first),
+                "last": occurrence(pattern.last),
+                "samples": [occurrence(found) for found in pattern.samples],
+            } for pattern in stats],
+        }
+
+def main(argv=None):
+    """Entry point for `castar-tools logs`"""
+    parser = argparse.ArgumentParser(prog="castar-tools logs",
+                                     description="Scan captured device/console logs for CastarSDK, "
+                                                 "MethodChannel and Flutter error patterns")
+    parser.add_argument("log", help="Log file to scan")
+    parser.add_argument("--set", action="append", choices=sorted(PATTERN_SETS), dest="sets",
+                        help="Only run these pattern sets (repeatable; default: all)")
+    parser.add_argument("--pattern", action="append", type=parse_pattern, default=[],
+                        metavar="NAME=REGEX", help="Extra pattern, scanned as the 'custom' set")
+    parser.add_argument("--samples", type=int, default=3, help="Occurrences kept per pattern (default: 3)")
+    parser.add_argument("--context", type=int, nargs="?", const=2,
+                        help="Show N lines of context around each sample (default N: 2)")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    profiling.add_profile_argument(parser)
+    args = parser.parse_args(argv)
+
+    pattern_sets = {name: PATTERN_SETS[name] for name in (args.sets or PATTERN_SETS)}
+    if args.pattern:
+        pattern_sets["custom"] = args.pattern
+
+    if not os.path.isfile(args.log):
+        print(f"❌ Log not found: {args.log}")
+        return False
+    if not os.path.getsize(args.log):
+        print(f"ℹ️ {args.log} is empty")
+        return True
+
+    with profiling.profile_session(args.profile, "logs"):
+        started = time.perf_counter()
+        stats, lines, size = analyze(args.log, pattern_sets, max(args.samples, 1), args.workers)
+        elapsed = time.perf_counter() - started
+        if args.json:
+            print(json.dumps(to_dict(args.log, stats, lines, size, args.context), indent=2))
+        else:
+            print_report(args.log, stats, lines, size, elapsed, args.context)
+    return True
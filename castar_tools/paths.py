@@ -0,0 +1,82 @@
+"""
+Project path resolution shared by all tooling scripts
+
+The project root is resolved once (walking up from the working directory
+to the nearest pubspec.yaml) so scripts work whether they are started
+from the project root, from ios/, or through castar-tools.
+"""
+
+import os
+from pathlib import Path
+
+FRAMEWORK_NAME = "CastarSDK.framework"
+
+_project_root = None
+
+def find_project_root(start=None):
+    """Walk up from start (default: cwd) to the directory holding pubspec.yaml"""
+    start = Path(start or Path.cwd()).resolve()
+    for candidate in (start, *start.parents):
+        if (candidate / "pubspec.yaml").exists():
+            return candidate
+    # Fall back to the checkout these tools live in
+    return Path(__file__).resolve().parent.parent
+
+def set_project_root(path):
+    """Pin the project root, e.g. from a --root option"""
+    global _project_root
+    _project_root = Path(path).resolve()
+    return _project_root
+
+def add_root_argument(parser):
+    """Register the --root option and the profiling flags every script takes"""
+    # profiling imports this module, so it can't be imported at the top
+    from castar_tools import profiling
+
+    parser.add_argument("--root", help="Project root (default: nearest directory with pubspec.yaml)")
+    profiling.add_profile_argument(parser)
+
+def apply_root(args):
+    """Pin the project root if --root was given"""
+    if args.root:
+        set_project_root(args.root)
+
+def project_root():
+    """Return the project root, resolving it on first use"""
+    global _project_root
+    if _project_root is None:
+        _project_root = find_project_root()
+    return _project_root
+
+def ios_dir():
+    return project_root() / "ios"
+
+def runner_dir():
+    return ios_dir() / "Runner"
+
+def frameworks_dir():
+    return ios_dir() / "Frameworks"
+
+def framework_dir():
+    return frameworks_dir() / FRAMEWORK_NAME
+
+def headers_dir():
+    return framework_dir() / "Headers"
+
+def modules_dir():
+    return framework_dir() / "Modules"
+
+def xcode_project_dir():
+    return ios_dir() / "Runner.xcodeproj"
+
+def pbxproj_path():
+    return xcode_project_dir() / "project.pbxproj"
+
+def cache_dir():
+    """Per-user cache for project-independent results (e.g. flutter doctor)"""
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "castar-tools"
+
+def state_dir():
+    """Per-project tool state shared between pipeline steps"""
+    return project_root() / ".dart_tool" / "castar_tools"
@@ -0,0 +1,355 @@
+"""
+Info.plist inspection with declarative rules
+
+    castar-tools plist [--json]
+
+ios/Runner/Info.plist is parsed with plistlib (XML or binary) and cached
+in .dart_tool/castar_tools by content hash; the framework's Info.plist and
+the binary's minimum OS come from the shared framework snapshot, which
+already parsed them. RULES is evaluated in one pass over those models
+plus the Runner build settings from project.pbxproj.
+
+A rule is a dict: id, severity, the CHECKS function that implements it
+and that function's parameters. Add a rule by adding a row; add a kind
+of check by adding a function to CHECKS.
+"""
+
+import argparse
+import hashlib
+import json
+import plistlib
+import re
+import xml.etree.ElementTree as ElementTree
+
+from castar_tools import fileutil, framework_snapshot, paths, profiling
+
+CACHE_NAME = "plist_cache.json"
+CACHE_VERSION = 1
+
+# Values iOS accepts in UIBackgroundModes; anything else is silently ignored
+BACKGROUND_MODES = {
+    "audio", "location", "voip", "external-accessory", "bluetooth-central", "bluetooth-peripheral",
+    "fetch", "remote-notification", "processing", "nearby-interaction", "push-to-talk",
+}
+# Xcode capability names people paste instead of the plist values
+BACKGROUND_MODE_ALIASES = {"background-fetch": "fetch", "background-processing": "processing"}
+BUNDLE_ID = re.compile(r"^[A-Za-z0-9-]+(\.[A-Za-z0-9-]+)+$")
+BUILD_SETTING = re.compile(r"\b(PRODUCT_BUNDLE_IDENTIFIER|IPHONEOS_DEPLOYMENT_TARGET)\s*=\s*\"?([^\";]+)\"?;")
+VARIABLE = re.compile(r"\$\((\w+)(?::[^)]*)?\)|\$\{(\w+)\}")
+
+class PlistModel:
+    """A parsed plist and where it came from"""
+    __slots__ = ("path", "sha256", "format", "data", "duplicate_keys", "error")
+
+    def __init__(self, path, sha256="", plist_format="", data=None, duplicate_keys=(), error=""):
+        self.path = str(path)
+        self.sha256 = sha256
+        self.format = plist_format
+        self.data = data
+        self.duplicate_keys = list(duplicate_keys)
+        self.error = error
+
+    @property
+    def exists(self):
+        return self.data is not None
+
+    def get(self, key, default=None):
+        return (self.data or {}).get(key, default)
+
+def _duplicate_keys(data):
+    """Top-level keys that appear more than once (plistlib keeps the last)"""
+    try:
+        root = ElementTree.fromstring(data)
+    except ElementTree.ParseError:
+        return []
+    top = root.find("dict")
+    if top is None:
+        return []
+    seen, duplicates = set(), []
+    for element in top.findall("key"):
+        if element.text in seen and element.text not in duplicates:
+            duplicates.append(element.text)
+        seen.add(element.text)
+    return duplicates
+
+def parse_plist(path, data):
+    digest = hashlib.sha256(data).hexdigest()
+    binary = data.startswith(b"bplist")
+    try:
+        parsed = plistlib.loads(data)
+    except Exception as e:
+        return PlistModel(path, digest, "binary" if binary else "xml", error=str(e))
+    duplicates = [] if binary else _duplicate_keys(data)
+    return PlistModel(path, digest, "binary" if binary else "xml",
+                      framework_snapshot.jsonable(parsed), duplicates)
+
+def _load_cache(cache_path):
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data.get("entries", {}) if data.get("version") == CACHE_VERSION else {}
+
+@profiling.traced("io", "load Info.plist")
+def load_plist(path, cache_path=None):
+    """Parse path, or reuse the cached model when its content hash matches"""
+    try:
+        data = path.read_bytes()
+    except OSError as e:
+        return PlistModel(path, error=str(e) if path.exists() else "")
+    digest = hashlib.sha256(data).hexdigest()
+    cache_path = cache_path or paths.state_dir() / CACHE_NAME
+    entries = _load_cache(cache_path)
+    entry = entries.get(str(path))
+    if entry and entry["sha256"] == digest:
+        return PlistModel(path, digest, entry["format"], entry["data"], entry["duplicate_keys"])
+
+    model = parse_plist(path, data)
+    if not model.error:
+        entries[str(path)] = {"sha256": digest, "format": model.format, "data": model.data,
+                              "duplicate_keys": model.duplicate_keys}
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        fileutil.atomic_write_text(cache_path, json.dumps({"version": CACHE_VERSION, "entries": entries}))
+    return model
+
+def read_build_settings(pbxproj_path=None):
+    """App bundle IDs and deployment targets set anywhere in project.pbxproj"""
+    settings = {"PRODUCT_BUNDLE_IDENTIFIER": [], "IPHONEOS_DEPLOYMENT_TARGET": []}
+    try:
+        text = (pbxproj_path or paths.pbxproj_path()).read_text(encoding="utf-8")
+    except OSError:
+        return settings
+    for name, value in BUILD_SETTING.findall(text):
+        value = value.strip()
+        # The test target's settings don't describe the app bundle
+        if name == "PRODUCT_BUNDLE_IDENTIFIER" and value.endswith("Tests"):
+            continue
+        if value not in settings[name]:
+            settings[name].append(value)
+    return settings
+
+def expand(value, settings):
+    """Substitute $(VAR) / ${VAR} with the first build setting value"""
+    def substitute(match):
+        values = settings.get(match.group(1) or match.group(2))
+        return values[0] if values else match.group(0)
+    return VARIABLE.sub(substitute, value) if isinstance(value, str) else value
+
+def version_key(version):
+    return tuple(int(part) for part in re.findall(r"\d+", str(version))[:3])
+
+class RuleContext:
+    """Everything the rules read, loaded once before evaluation"""
+    __slots__ = ("runner", "framework", "framework_exists", "binary_min_os", "settings")
+
+    def __init__(self, runner, framework, framework_exists, binary_min_os, settings):
+        self.runner = runner
+        self.framework = framework
+        self.framework_exists = framework_exists
+        self.binary_min_os = binary_min_os
+        self.settings = settings
+
+    def plist(self, name):
+        return self.runner if name == "runner" else self.framework
+
+    @property
+    def deployment_target(self):
+        targets = self.settings.get("IPHONEOS_DEPLOYMENT_TARGET") or []
+        return min(targets, key=version_key) if targets else ""
+
+def load_context(snapshot=None):
+    snapshot = snapshot or framework_snapshot.get_snapshot()
+    runner = load_plist(paths.runner_dir() / "Info.plist")
+    if snapshot.info_plist is not None:
+        entry = next((item for item in snapshot.files if item.path == "Info.plist"), None)
+        framework_plist = PlistModel(paths.framework_dir() / "Info.plist",
+                                     entry.sha256 if entry else "", "", snapshot.info_plist)
+    else:
+        framework_plist = PlistModel(paths.framework_dir() / "Info.plist")
+    binary_min_os = snapshot.binary.min_os if snapshot.binary else ""
+    return RuleContext(runner, framework_plist, snapshot.exists, binary_min_os, read_build_settings())
+
+def check_plist_readable(context, rule):
+    model = context.plist(rule["plist"])
+    if model.error:
+        return [f"{model.path} could not be parsed: {model.error}"]
+    if not model.exists and (rule["plist"] == "runner" or context.framework_exists):
+        return [f"{model.path} not found"]
+    return []
+
+def check_duplicate_keys(context, rule):
+    model = context.plist(rule["plist"])
+    return [f"'{key}' is defined more than once; only the last definition takes effect"
+            for key in model.duplicate_keys]
+
+def check_contains(context, rule):
+    model = context.plist(rule["plist"])
+    if not model.exists:
+        return []
+    values = model.get(rule["key"])
+    if not isinstance(values, list) or not values:
+        return [f"{rule['key']} is missing or empty"]
+    messages = []
+    for required in rule["values"]:
+        if required not in values:
+            alias = next((name for name, real in rule.get("aliases", {}).items()
+                          if real == required and name in values), None)
+            hint = f" ('{alias}' is not a valid value, use '{required}')" if alias else ""
+            messages.append(f"{rule['key']} lacks '{required}'{hint}")
+    return messages
+
+def check_allowed_values(context, rule):
+    model = context.plist(rule["plist"])
+    values = model.get(rule["key"]) if model.exists else None
+    if not isinstance(values, list):
+        return []
+    return [f"{rule['key']} value '{value}' is not recognized by iOS and is ignored"
+            for value in values if value not in rule["allowed"]]
+
+def check_requires_key(context, rule):
+    """rule['key'] must be set when rule['if_key'] contains rule['if_value']"""
+    model = context.plist(rule["plist"])
+    trigger = model.get(rule["if_key"]) if model.exists else None
+    if isinstance(trigger, list) and rule["if_value"] in trigger and not model.get(rule["key"]):
+        return [f"{rule['key']} is required when {rule['if_key']} contains '{rule['if_value']}'"]
+    return []
+
+def check_bundle_id(context, rule):
+    model = context.plist(rule["plist"])
+    if not model.exists:
+        return []
+    raw = model.get("CFBundleIdentifier")
+    if not raw:
+        return ["CFBundleIdentifier is missing"]
+    value = expand(raw, context.settings)
+    if "$" in value:
+        return [f"CFBundleIdentifier '{raw}' references an unknown build setting"]
+    if not BUNDLE_ID.match(value):
+        return [f"CFBundleIdentifier '{value}' is not a valid reverse-DNS identifier"]
+    if rule.get("reject_prefix") and value.startswith(rule["reject_prefix"]):
+        return [f"CFBundleIdentifier '{value}' still uses the {rule['reject_prefix']} placeholder"]
+    if rule.get("distinct_from"):
+        other = context.plist(rule["distinct_from"])
+        other_value = expand(other.get("CFBundleIdentifier", ""), context.settings)
+        if value == other_value:
+            return [f"CFBundleIdentifier '{value}' is the same as the {rule['distinct_from']} bundle's"]
+    return []
+
+def check_minimum_os(context, rule):
+    """Framework MinimumOSVersion and binary min OS vs. the app deployment target"""
+    if not context.framework_exists:
+        return []
+    target = context.deployment_target
+    declared = context.framework.get("MinimumOSVersion", "")
+    built = context.binary_min_os
+    messages = []
+    if target:
+        for label, version in (("Info.plist MinimumOSVersion", declared), ("binary", built)):
+            if version and version_key(version) > version_key(target):
+                messages.append(f"CastarSDK {label} requires iOS {version} but the app deploys to iOS {target}")
+    if declared and built and version_key(declared) != version_key(built):
+        messages.append(f"CastarSDK Info.plist MinimumOSVersion {declared} does not match "
+                        f"the binary's {built} (App Store validation rejects this)")
+    return messages
+
+def check_ats(context, rule):
+    model = context.plist(rule["plist"])
+    ats = model.get("NSAppTransportSecurity") if model.exists else None
+    if not isinstance(ats, dict):
+        return []
+    messages = []
+    if ats.get("NSAllowsArbitraryLoads"):
+        overriding = [key for key in ("NSAllowsArbitraryLoadsInWebContent", "NSAllowsArbitraryLoadsForMedia",
+                                      "NSAllowsLocalNetworking") if key in ats]
+        if overriding:
+            messages.append(f"NSAllowsArbitraryLoads is ignored on iOS 10+ because {', '.join(overriding)} "
+                            "is also set; use NSExceptionDomains for the SDK's hosts")
+        else:
+            messages.append("NSAllowsArbitraryLoads disables ATS for every host; "
+                            "App Review asks for a justification")
+    domains = ats.get("NSExceptionDomains", {})
+    if not isinstance(domains, dict):
+        return messages + ["NSExceptionDomains must be a dictionary"]
+    for domain, exception in sorted(domains.items()):
+        if not isinstance(exception, dict):
+            messages.append(f"NSExceptionDomains['{domain}'] must be a dictionary")
+        elif not any(key.startswith("NSException") or key.startswith("NSThirdPartyException")
+                     or key == "NSIncludesSubdomains" for key in exception):
+            messages.append(f"NSExceptionDomains['{domain}'] has no exception keys and does nothing")
+    return messages
+
+CHECKS = {
+    "readable": check_plist_readable,
+    "duplicate_keys": check_duplicate_keys,
+    "contains": check_contains,
+    "allowed_values": check_allowed_values,
+    "requires_key": check_requires_key,
+    "bundle_id": check_bundle_id,
+    "minimum_os": check_minimum_os,
+    "ats": check_ats,
+}
+
+# Errors are for plists iOS can't use as written (unreadable, a usage
+# description missing for a declared mode, a framework bundle ID clashing
+# with the app's). The app's own choices stay warnings: whether it needs
+# background fetch/processing, and whether it still deploys below the
+# SDK's minimum iOS (that only fails on those older devices).
+RULES = [
+    {"id": "runner-plist", "severity": "error", "check": "readable", "plist": "runner"},
+    {"id": "framework-plist", "severity": "error", "check": "readable", "plist": "framework"},
+    {"id": "runner-duplicate-keys", "severity": "warning", "check": "duplicate_keys", "plist": "runner"},
+    {"id": "background-modes", "severity": "warning", "check": "contains", "plist": "runner",
+     "key": "UIBackgroundModes", "values": ["fetch", "processing"], "aliases": BACKGROUND_MODE_ALIASES},
+    {"id": "background-mode-values", "severity": "warning", "check": "allowed_values", "plist": "runner",
+     "key": "UIBackgroundModes", "allowed": BACKGROUND_MODES},
+    {"id": "bg-task-identifiers", "severity": "warning", "check": "requires_key", "plist": "runner",
+     "key": "BGTaskSchedulerPermittedIdentifiers", "if_key": "UIBackgroundModes", "if_value": "processing"},
+    {"id": "location-usage", "severity": "error", "check": "requires_key", "plist": "runner",
+     "key": "NSLocationAlwaysAndWhenInUseUsageDescription", "if_key": "UIBackgroundModes",
+     "if_value": "location"},
+    {"id": "runner-bundle-id", "severity": "warning", "check": "bundle_id", "plist": "runner",
+     "reject_prefix": "com.example."},
+    {"id": "framework-bundle-id", "severity": "error", "check": "bundle_id", "plist": "framework",
+     "distinct_from": "runner"},
+    {"id": "minimum-os", "severity": "warning", "check": "minimum_os"},
+    {"id": "ats", "severity": "warning", "check": "ats", "plist": "runner"},
+]
+
+@profiling.traced("phase", "evaluate plist rules")
+def evaluate(context, rules=None):
+    """Run every rule once; returns [{'rule', 'severity', 'message'}]"""
+    results = []
+    for rule in rules or RULES:
+        for message in CHECKS[rule["check"]](context, rule):
+            results.append({"rule": rule["id"], "severity": rule["severity"], "message": message})
+    return results
+
+def print_results(context, results):
+    runner = context.runner
+    if runner.exists:
+        cached = f", {runner.format}" if runner.format else ""
+        print(f"✅ Info.plist parsed ({len(runner.data)} keys{cached})")
+    for result in results:
+        marker = "❌" if result["severity"] == "error" else "⚠️"
+        print(f"{marker} [{result['rule']}] {result['message']}")
+    if not any(result["severity"] == "error" for result in results):
+        warnings = f" ({len(results)} warnings)" if results else ""
+        print(f"✅ {len(RULES)} plist rules passed{warnings}")
+
+def main(argv=None):
+    """Entry point for `castar-tools plist`"""
+    parser = argparse.ArgumentParser(prog="castar-tools plist",
+                                     description="Check the Runner and CastarSDK Info.plist files")
+    parser.add_argument("--json", action="store_true", help="Print rule results as JSON")
+    profiling.add_profile_argument(parser)
+    args = parser.parse_args(argv)
+
+    with profiling.profile_session(args.profile, "plist"):
+        context = load_context()
+        results = evaluate(context)
+        if args.json:
+            print(json.dumps(results, indent=2))
+        else:
+            print_results(context, results)
+    return not any(result["severity"] == "error" for result in results)
@@ -0,0 +1,167 @@
+"""
+Opt-in profiling for the tooling scripts
+
+`--profile` records cProfile stats and a Chrome trace-event JSON file
+(open it in chrome://tracing or https://ui.perfetto.dev). Spans mark
+phases, subprocesses and file operations:
+
+    with profiling.span("read project.pbxproj", "io"):
+        ...
+
+    @profiling.traced()
+    def check_ios_setup():
+        ...
+
+When profiling is off, span() and traced() cost a single flag check.
+"""
+
+import argparse
+import contextlib
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import subprocess
+import threading
+import time
+from pathlib import Path
+
+from castar_tools import paths
+
+_events = []
+_enabled = False
+_lock = threading.Lock()
+
+def _now_us():
+    return time.perf_counter_ns() / 1000
+
+def is_enabled():
+    return _enabled
+
+def _record(name, category, start_us, args):
+    event = {
+        "name": name,
+        "cat": category,
+        "ph": "X",
+        "ts": start_us,
+        "dur": _now_us() - start_us,
+        "pid": os.getpid(),
+        "tid": threading.get_ident(),
+    }
+    if args:
+        event["args"] = {key: str(value) for key, value in args.items()}
+    with _lock:
+        _events.append(event)
+
+@contextlib.contextmanager
+def span(name, category="phase", **args):
+    """Record a complete trace event around a block"""
+    if not _enabled:
+        yield
+        return
+    start_us = _now_us()
+    try:
+        yield
+    finally:
+        _record(name, category, start_us, args)
+
+def traced(category="phase", name=None):
+    """Decorator form of span(), named after the function by default"""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with span(span_name, category):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def run(cmd, **kwargs):
+    """subprocess.run wrapped in a 'subprocess' span"""
+    label = cmd if isinstance(cmd, str) else " ".join(str(part) for part in cmd)
+    with span(label, "subprocess"):
+        return subprocess.run(cmd, **kwargs)
+
+class _ProfileFlag(argparse.Action):
+    """--profile turns profiling on without replacing a --profile-prefix value"""
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        if getattr(namespace, self.dest) is None:
+            setattr(namespace, self.dest, "")
+
+def add_profile_argument(parser):
+    """
+    Register --profile and --profile-prefix on a script's argument parser.
+
+    Both store into args.profile (see profile_session). --profile takes
+    no value, so it can't swallow a following subcommand or path.
+    """
+    parser.add_argument(
+        "--profile", action=_ProfileFlag, nargs=0, default=None,
+        help="Record cProfile stats and a Chrome trace under .dart_tool/castar_tools/profiles/",
+    )
+    parser.add_argument(
+        "--profile-prefix", dest="profile", metavar="PREFIX",
+        help="Profile and write PREFIX.prof and PREFIX.trace.json instead (implies --profile)",
+    )
+
+def write_trace(trace_path, tool_name):
+    """Write the collected spans as Chrome trace-event JSON"""
+    metadata = [{
+        "name": "process_name",
+        "ph": "M",
+        "pid": os.getpid(),
+        "args": {"name": tool_name},
+    }]
+    with _lock:
+        events = metadata + sorted(_events, key=lambda event: event["ts"])
+    with open(trace_path, 'w', encoding='utf-8') as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+@contextlib.contextmanager
+def profile_session(prefix, tool_name):
+    """
+    Profile the enclosed block when prefix is not None.
+
+    prefix is args.profile: None (off), "" (--profile, default location)
+    or the --profile-prefix path prefix for the .prof and .trace.json files.
+    """
+    global _enabled
+    if prefix is None:
+        yield
+        return
+
+    if not prefix:
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        prefix = str(paths.state_dir() / "profiles" / f"{tool_name}-{stamp}")
+    Path(prefix).parent.mkdir(parents=True, exist_ok=True)
+
+    with _lock:
+        _events.clear()
+    _enabled = True
+    profiler = cProfile.Profile()
+    start_us = _now_us()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        _record(tool_name, "phase", start_us, {})
+        _enabled = False
+
+        stats_path = f"{prefix}.prof"
+        trace_path = f"{prefix}.trace.json"
+        profiler.dump_stats(stats_path)
+        write_trace(trace_path, tool_name)
+
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(10)
+        print("\n⏱️ Profile (top 10 by cumulative time):")
+        print(summary.getvalue().rstrip())
+        print(f"📄 cProfile stats: {stats_path}")
+        print(f"📄 Chrome trace: {trace_path}")
@@ -0,0 +1,247 @@
+"""
+Append-only SQLite history of debug reports
+
+Every run of debug_app.py appends its report here instead of only
+overwriting debug_report.json, so questions like "when did the build
+start failing" can be answered with indexed queries.
+"""
+
+import argparse
+import json
+import platform
+import sqlite3
+import time
+from pathlib import Path
+
+from castar_tools import paths, profiling
+
+DB_NAME = "debug_reports.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    timestamp TEXT NOT NULL,
+    flutter_version TEXT,
+    machine TEXT,
+    outcome TEXT NOT NULL,
+    build_seconds REAL,
+    payload TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS checks (
+    report_id INTEGER NOT NULL REFERENCES reports(id),
+    name TEXT NOT NULL,
+    ok INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_reports_created_at ON reports(created_at);
+CREATE INDEX IF NOT EXISTS idx_reports_flutter_version ON reports(flutter_version, created_at);
+CREATE INDEX IF NOT EXISTS idx_reports_machine ON reports(machine, created_at);
+CREATE INDEX IF NOT EXISTS idx_reports_outcome ON reports(outcome, created_at);
+CREATE INDEX IF NOT EXISTS idx_checks_name_ok ON checks(name, ok, created_at);
+"""
+
+# Columns that can be summarised with `median`
+NUMERIC_FIELDS = ("build_seconds",)
+
+def default_db_path():
+    """History database location inside the project root"""
+    return paths.project_root() / DB_NAME
+
+def connect(db_path=None):
+    """Open the history database, creating the schema if needed"""
+    db_path = db_path or default_db_path()
+    conn = sqlite3.connect(str(db_path))
+    conn.executescript(SCHEMA)
+    return conn
+
+def append_report(report, db_path=None):
+    """Append a debug report and its check outcomes, returning the row id"""
+    # A check stored as None didn't run (e.g. the build skipped after a
+    # failed channel check); it is neither a pass nor a failure
+    checks = {name: ok for name, ok in report.get("checks", {}).items() if ok is not None}
+    created_at = report.get("created_at", time.time())
+    outcome = "pass" if checks and all(checks.values()) else "fail"
+
+    conn = connect(db_path)
+    try:
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO reports (created_at, timestamp, flutter_version, machine, "
+                "outcome, build_seconds, payload) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    created_at,
+                    report.get("timestamp", ""),
+                    report.get("flutter_version", ""),
+                    report.get("machine") or platform.node(),
+                    outcome,
+                    report.get("build_seconds"),
+                    json.dumps(report, ensure_ascii=False),
+                ),
+            )
+            report_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT INTO checks (report_id, name, ok, created_at) VALUES (?, ?, ?, ?)",
+                [(report_id, name, int(bool(ok)), created_at) for name, ok in checks.items()],
+            )
+        return report_id
+    finally:
+        conn.close()
+
+def parse_since(value):
+    """
+    Turn '7d', '12h', '30m' or 'week' into an epoch cutoff (None means no cutoff).
+
+    Used as the argparse type of --since, so bad values are usage errors.
+    """
+    if not value:
+        return None
+    if value == "week":
+        value = "7d"
+    elif value == "day":
+        value = "1d"
+    units = {"d": 86400, "h": 3600, "m": 60}
+    unit, amount = value[-1], value[:-1]
+    if unit not in units or not amount.replace(".", "", 1).isdigit():
+        raise argparse.ArgumentTypeError(f"unknown duration: {value!r} (use e.g. 7d, 12h, 30m or week)")
+    return time.time() - float(amount) * units[unit]
+
+def _filters(since=None, machine=None, flutter_version=None):
+    """Build a WHERE clause for the common report filters"""
+    clauses, params = [], []
+    if since is not None:
+        clauses.append("r.created_at >= ?")
+        params.append(since)
+    if machine:
+        clauses.append("r.machine = ?")
+        params.append(machine)
+    if flutter_version:
+        clauses.append("r.flutter_version LIKE ?")
+        params.append(f"%{flutter_version}%")
+    return clauses, params
+
+def first_failure(conn, check="build", since=None, machine=None, flutter_version=None):
+    """
+    Return (last_pass, first_fail) rows for a check.
+
+    first_fail is the earliest failing run after the most recent pass, i.e.
+    when the current failure streak started. Both are None when unknown.
+    Only reports matching the filters count, as passes and as failures.
+    """
+    clauses, params = _filters(since, machine, flutter_version)
+    where = "".join(f" AND {c}" for c in clauses)
+    columns = "r.id, r.timestamp, r.machine, r.flutter_version"
+
+    last_pass = conn.execute(
+        f"SELECT {columns} FROM checks c JOIN reports r ON r.id = c.report_id "
+        f"WHERE c.name = ? AND c.ok = 1{where} ORDER BY c.created_at DESC LIMIT 1",
+        [check, *params],
+    ).fetchone()
+
+    fail_params = [check, *params]
+    after = ""
+    if last_pass:
+        after = " AND c.created_at > (SELECT created_at FROM reports WHERE id = ?)"
+        fail_params.append(last_pass[0])
+    first_fail = conn.execute(
+        f"SELECT {columns} FROM checks c JOIN reports r ON r.id = c.report_id "
+        f"WHERE c.name = ? AND c.ok = 0{where}{after} ORDER BY c.created_at ASC LIMIT 1",
+        fail_params,
+    ).fetchone()
+    return last_pass, first_fail
+
+def median(conn, field="build_seconds", since=None, machine=None, flutter_version=None):
+    """Median of a numeric column, computed in SQL without loading all rows"""
+    if field not in NUMERIC_FIELDS:
+        raise ValueError(f"Unsupported field: {field}")
+    clauses, params = _filters(since, machine, flutter_version)
+    clauses.append(f"r.{field} IS NOT NULL")
+    where = " WHERE " + " AND ".join(clauses)
+
+    count = conn.execute(f"SELECT COUNT(*) FROM reports r{where}", params).fetchone()[0]
+    if count == 0:
+        return None, 0
+    # One value for odd counts, the two middle values for even counts
+    limit = 1 if count % 2 else 2
+    rows = conn.execute(
+        f"SELECT r.{field} FROM reports r{where} ORDER BY r.{field} LIMIT ? OFFSET ?",
+        [*params, limit, (count - 1) // 2],
+    ).fetchall()
+    return sum(row[0] for row in rows) / len(rows), count
+
+def recent(conn, limit=10, since=None, machine=None, flutter_version=None, outcome=None):
+    """Yield the most recent report summaries, newest first"""
+    clauses, params = _filters(since, machine, flutter_version)
+    if outcome:
+        clauses.append("r.outcome = ?")
+        params.append(outcome)
+    where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+    yield from conn.execute(
+        "SELECT r.id, r.timestamp, r.machine, r.flutter_version, r.outcome, r.build_seconds "
+        f"FROM reports r{where} ORDER BY r.created_at DESC LIMIT ?",
+        [*params, limit],
+    )
+
+def run_query(args):
+    """Entry point for the `history` subcommand"""
+    db_path = Path(args.db) if args.db else default_db_path()
+    if not db_path.exists():
+        print(f"❌ No report history found at {db_path}")
+        return False
+
+    conn = connect(db_path)
+    try:
+        if args.query == "first-failure":
+            last_pass, first_fail = first_failure(conn, args.check, args.since,
+                                                  args.machine, args.flutter_version)
+            if first_fail is None:
+                print(f"✅ No failing '{args.check}' runs since the last pass")
+            else:
+                print(f"❌ '{args.check}' started failing at {first_fail[1]} "
+                      f"(report #{first_fail[0]}, {first_fail[2]})")
+                if last_pass:
+                    print(f"   Last pass: {last_pass[1]} (report #{last_pass[0]}, {last_pass[3]})")
+                else:
+                    print("   No passing run recorded")
+        elif args.query == "median":
+            value, count = median(conn, args.field, args.since,
+                                  args.machine, args.flutter_version)
+            if value is None:
+                print(f"⚠️ No {args.field} values recorded for this range")
+            else:
+                print(f"📊 Median {args.field}: {value:.1f} over {count} runs")
+        else:
+            rows = recent(conn, args.limit, args.since,
+                          args.machine, args.flutter_version, args.outcome)
+            for row_id, timestamp, machine, version, outcome, build_seconds in rows:
+                icon = "✅" if outcome == "pass" else "❌"
+                seconds = f"{build_seconds:.1f}s" if build_seconds is not None else "-"
+                print(f"{icon} #{row_id} {timestamp}  {machine}  {seconds}  {version}")
+        return True
+    finally:
+        conn.close()
+
+def add_arguments(parser):
+    """Register the `history` query arguments on an argparse parser"""
+    parser.add_argument("query", choices=["list", "first-failure", "median"],
+                        help="Question to ask of the report history")
+    parser.add_argument("--db", help=f"History database path (default: <project root>/{DB_NAME})")
+    parser.add_argument("--check", default="build",
+                        help="Check name for first-failure (flutter, ios, sdk, build)")
+    parser.add_argument("--field", default="build_seconds", choices=NUMERIC_FIELDS,
+                        help="Numeric field for median")
+    parser.add_argument("--since", type=parse_since, help="Only consider reports newer than e.g. 7d, 12h or 'week'")
+    parser.add_argument("--machine", help="Only consider reports from this machine")
+    parser.add_argument("--flutter-version", help="Only consider reports whose Flutter version matches")
+    parser.add_argument("--outcome", choices=["pass", "fail"], help="Filter list by outcome")
+    parser.add_argument("--limit", type=int, default=10, help="Rows to show for list")
+
+def main(argv=None):
+    """Standalone entry point for `castar-tools history`"""
+    parser = argparse.ArgumentParser(prog="castar-tools history",
+                                     description="Query the debug report history")
+    add_arguments(parser)
+    profiling.add_profile_argument(parser)
+    args = parser.parse_args(argv)
+    with profiling.profile_session(args.profile, "history"):
+        return run_query(args)
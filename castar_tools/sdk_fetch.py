@@ -0,0 +1,542 @@
+"""
+Content-addressed download cache for CastarSDK.framework
+
+    castar-tools fetch-sdk [--url URL] [--sha256 HEX]
+
+The archive is streamed once: every chunk is hashed, appended to the
+cached archive and fed to a streaming zip reader that extracts members
+from their local headers as they arrive. Only the central directory is
+read afterwards, to restore symlinks and file modes.
+
+Cache layout (under ~/.cache/castar-tools/sdk):
+
+    archives/<sha256>.zip   verified archives
+    trees/<sha256>/         their extracted contents
+    urls.json               last known hash per URL
+
+An interrupted download keeps its bytes in archives/.partial-<url key>.zip
+and the next attempt resumes it with an HTTP Range request (guarded by
+If-Range on the ETag / Last-Modified). The kept bytes are re-read from
+disk through the hash and the extractor, so resuming never skips either.
+
+A cache hit is a hash check of the cached archive plus hardlinking (or
+copying) the extracted tree into ios/Frameworks.
+"""
+
+import argparse
+import hashlib
+import http.client
+import json
+import os
+import shutil
+import stat
+import struct
+import tempfile
+import urllib.error
+import urllib.request
+import zipfile
+import zlib
+from pathlib import Path
+
+from castar_tools import fileutil, framework_snapshot, paths, profiling
+
+DEFAULT_URL = "https://github.com/castarsdk/ios-sdk/releases/download/v1.0.0/CastarSDK.framework.zip"
+CHUNK_SIZE = 256 * 1024
+DOWNLOAD_RETRIES = 3
+# Another job may be downloading the same URL; wait for it rather than race
+DOWNLOAD_LOCK_TIMEOUT = 30 * 60
+
+LOCAL_HEADER_SIG = 0x04034B50
+DATA_DESCRIPTOR_SIG = 0x08074B50
+LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+ZIP64_EXTRA_ID = 0x0001
+
+class FetchError(Exception):
+    """Download, verification or extraction failed"""
+
+    def __init__(self, message, resumable=False):
+        super().__init__(message)
+        # Worth retrying: the transfer broke off (a kept partial archive is
+        # resumed) or the server refused to resume a stale one
+        self.resumable = resumable
+
+class StreamingUnsupported(Exception):
+    """The archive uses a feature the streaming reader can't handle"""
+
+class TeeReader:
+    """
+    Reads a response in chunks, hashing and copying every byte to the archive file.
+
+    When resuming, the first `prefix_size` bytes come from `prefix` (the kept
+    partial archive): they are hashed and extracted but not written again.
+    """
+
+    def __init__(self, source, sink, prefix=None, prefix_size=0):
+        self.source = source
+        self.sink = sink
+        self.prefix = prefix
+        self.prefix_left = prefix_size
+        self.digest = hashlib.sha256()
+        self.buffer = bytearray()
+        self.size = 0
+        self.eof = False
+
+    def _fill(self):
+        if self.prefix_left:
+            chunk = self.prefix.read(min(CHUNK_SIZE, self.prefix_left))
+            if not chunk:
+                raise FetchError("Partial archive shrank while resuming")
+            self.prefix_left -= len(chunk)
+        else:
+            chunk = self.source.read(CHUNK_SIZE)
+            if not chunk:
+                self.eof = True
+                return False
+            self.sink.write(chunk)
+        self.digest.update(chunk)
+        self.size += len(chunk)
+        self.buffer += chunk
+        return True
+
+    def read_exact(self, count):
+        while len(self.buffer) < count:
+            if not self._fill():
+                raise FetchError("Archive ended unexpectedly")
+        data = bytes(self.buffer[:count])
+        del self.buffer[:count]
+        return data
+
+    def read_some(self):
+        """Return whatever is buffered, fetching one chunk if empty ('' at EOF)"""
+        if not self.buffer and not self._fill():
+            return b""
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+    def unread(self, data):
+        self.buffer[:0] = data
+
+    def peek(self, count):
+        while len(self.buffer) < count and self._fill():
+            pass
+        return bytes(self.buffer[:count])
+
+    def drain(self):
+        """Consume the rest of the stream (central directory etc.)"""
+        self.buffer.clear()
+        while self._fill():
+            self.buffer.clear()
+
+def _safe_target(root, name):
+    """Resolve a member name under root, rejecting absolute paths and '..'"""
+    parts = Path(name).parts
+    if not parts or Path(name).is_absolute() or ".." in parts:
+        raise FetchError(f"Unsafe path in archive: {name}")
+    return root.joinpath(*parts)
+
+def _zip64_sizes(extra, compressed, uncompressed):
+    """Apply the zip64 extra field to 0xFFFFFFFF sizes"""
+    offset = 0
+    while offset + 4 <= len(extra):
+        header_id, size = struct.unpack_from("<HH", extra, offset)
+        if header_id == ZIP64_EXTRA_ID:
+            field = extra[offset + 4:offset + 4 + size]
+            values = list(struct.unpack_from(f"<{len(field) // 8}Q", field))
+            if uncompressed == 0xFFFFFFFF and values:
+                uncompressed = values.pop(0)
+            if compressed == 0xFFFFFFFF and values:
+                compressed = values.pop(0)
+            return compressed, uncompressed, True
+        offset += 4 + size
+    return compressed, uncompressed, False
+
+def _copy_stored(reader, out, length):
+    """Copy `length` raw bytes, returning their CRC-32"""
+    crc = 0
+    remaining = length
+    while remaining:
+        data = reader.read_some()
+        if not data:
+            raise FetchError("Archive ended inside a member")
+        if len(data) > remaining:
+            reader.unread(data[remaining:])
+            data = data[:remaining]
+        crc = zlib.crc32(data, crc)
+        out.write(data)
+        remaining -= len(data)
+    return crc
+
+def _inflate(reader, out):
+    """Inflate one raw deflate stream, returning its CRC-32 (stream end is self-delimiting)"""
+    inflater = zlib.decompressobj(-15)
+    crc = 0
+    while not inflater.eof:
+        data = reader.read_some()
+        if not data:
+            raise FetchError("Archive ended inside a member")
+        chunk = inflater.decompress(data)
+        crc = zlib.crc32(chunk, crc)
+        out.write(chunk)
+    if inflater.unused_data:
+        reader.unread(inflater.unused_data)
+    return crc
+
+def stream_extract(reader, dest):
+    """
+    Extract members from local headers as the bytes arrive.
+
+    Stops at the first non-local-header record (the central directory).
+    Raises StreamingUnsupported for encrypted members, unknown compression
+    methods, or stored members whose size is only in a data descriptor.
+    """
+    names = []
+    while True:
+        signature = reader.peek(4)
+        if len(signature) < 4 or struct.unpack("<I", signature)[0] != LOCAL_HEADER_SIG:
+            return names
+        (_, _, flags, method, _, _, crc, compressed, uncompressed,
+         name_len, extra_len) = LOCAL_HEADER.unpack(reader.read_exact(LOCAL_HEADER.size))
+        name = reader.read_exact(name_len).decode('utf-8' if flags & 0x800 else 'cp437')
+        extra = reader.read_exact(extra_len)
+        compressed, uncompressed, is_zip64 = _zip64_sizes(extra, compressed, uncompressed)
+        has_descriptor = bool(flags & 0x08)
+
+        if flags & 0x01:
+            raise StreamingUnsupported(f"{name} is encrypted")
+        if method not in (0, 8):
+            raise StreamingUnsupported(f"{name} uses compression method {method}")
+        if method == 0 and has_descriptor:
+            raise StreamingUnsupported(f"{name} is stored with a data descriptor")
+
+        skip = name.startswith("__MACOSX/")
+        target = None if skip else _safe_target(dest, name)
+        if target is not None and name.endswith("/"):
+            target.mkdir(parents=True, exist_ok=True)
+            target = None
+        if target is not None:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            out = open(target, 'wb')
+        else:
+            out = open(os.devnull, 'wb')
+
+        with out:
+            if method == 8:
+                actual_crc = _inflate(reader, out)
+            else:
+                actual_crc = _copy_stored(reader, out, compressed)
+
+        if has_descriptor:
+            if struct.unpack("<I", reader.peek(4))[0] == DATA_DESCRIPTOR_SIG:
+                reader.read_exact(4)
+            crc = struct.unpack("<I", reader.read_exact(4))[0]
+            reader.read_exact(16 if is_zip64 else 8)
+        if actual_crc != crc:
+            raise FetchError(f"CRC mismatch for {name}")
+        if not skip and not name.endswith("/"):
+            names.append(name)
+
+def restore_metadata(archive_path, dest):
+    """Apply symlinks and permission bits from the central directory"""
+    with zipfile.ZipFile(archive_path) as archive:
+        for info in archive.infolist():
+            if info.filename.startswith("__MACOSX/") or info.is_dir():
+                continue
+            mode = info.external_attr >> 16
+            target = _safe_target(dest, info.filename)
+            if stat.S_ISLNK(mode):
+                link = target.read_text(encoding='utf-8')
+                target.unlink()
+                os.symlink(link, target)
+            elif mode & 0o777:
+                os.chmod(target, mode & 0o777)
+
+class SdkCache:
+    """Content-addressed store of archives and their extracted trees"""
+
+    def __init__(self, root=None):
+        self.root = Path(root or paths.cache_dir() / "sdk")
+        self.archives = self.root / "archives"
+        self.trees = self.root / "trees"
+        self.index_path = self.root / "urls.json"
+
+    def archive_path(self, sha256):
+        return self.archives / f"{sha256}.zip"
+
+    def tree_path(self, sha256):
+        return self.trees / sha256
+
+    def partial_path(self, url):
+        """Where an interrupted download of url is kept for resuming"""
+        key = hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+        return self.archives / f".partial-{key}.zip"
+
+    def known_hash(self, url):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f).get(url)
+        except (OSError, ValueError):
+            return None
+
+    def remember(self, url, sha256):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        index[url] = sha256
+        tmp_path = self.index_path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    @profiling.traced("io", "verify cached archive")
+    def verify(self, sha256):
+        """Hash check of a cached archive; True when it and its tree are intact"""
+        archive = self.archive_path(sha256)
+        if not archive.is_file() or not self.tree_path(sha256).is_dir():
+            return False
+        digest = hashlib.sha256()
+        with open(archive, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest() == sha256
+
+    def _open(self, url, offset, validator, timeout):
+        """
+        Open url, asking for the bytes after offset when resuming.
+
+        Returns (response, resumed, total). The server answers a Range
+        request with 206 only while the If-Range validator still matches;
+        a 200 means the archive changed and the download starts over.
+        """
+        request = urllib.request.Request(url)
+        if offset and validator:
+            request.add_header("Range", f"bytes={offset}-")
+            request.add_header("If-Range", validator)
+        try:
+            response = urllib.request.urlopen(request, timeout=timeout)
+        except urllib.error.HTTPError as e:
+            if e.code == 416:
+                # Nothing left to resume (or a stale partial): start over
+                raise FetchError("Server rejected the resume range", resumable=True)
+            raise FetchError(f"Download failed: HTTP {e.code} {e.reason}")
+        resumed = bool(offset and validator) and response.status == 206
+        total = None
+        if resumed:
+            content_range = response.headers.get("Content-Range", "")
+            if not content_range.startswith(f"bytes {offset}-"):
+                response.close()
+                raise FetchError(f"Unexpected Content-Range: {content_range!r}", resumable=True)
+            total = content_range.rsplit("/", 1)[-1]
+        else:
+            total = response.headers.get("Content-Length")
+        total = int(total) if total and total.isdigit() else None
+        if resumed and total is None:
+            response.close()
+            raise FetchError("Resumed response has no total size", resumable=True)
+        return response, resumed, total
+
+    @profiling.traced("io", "download and extract")
+    def download(self, url, expected_sha256=None, timeout=60):
+        """
+        Stream url into the cache, extracting as it downloads; returns the sha256.
+
+        Raises FetchError with resumable=True when a retry may succeed; if
+        the transfer broke off, the received bytes are kept to resume from.
+        """
+        self.archives.mkdir(parents=True, exist_ok=True)
+        self.trees.mkdir(parents=True, exist_ok=True)
+        partial = self.partial_path(url)
+        validator_path = partial.with_suffix(".json")
+        try:
+            with open(validator_path, 'r', encoding='utf-8') as f:
+                kept = json.load(f)
+        except (OSError, ValueError):
+            kept = {}
+        offset = partial.stat().st_size if partial.exists() and kept.get("url") == url else 0
+        validator = kept.get("validator") if offset else None
+
+        staging = Path(tempfile.mkdtemp(prefix=".staging-", dir=self.trees))
+        # The cache may be shared between users on build hosts
+        os.chmod(staging, 0o755)
+        reader = None
+        total = None
+        keep_partial = False
+        try:
+            response, resumed, total = self._open(url, offset, validator, timeout)
+            if resumed:
+                print(f"⏯️ Resuming at {offset / 1024 / 1024:.1f} MB")
+            else:
+                offset = 0
+                validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+                with open(validator_path, 'w', encoding='utf-8') as f:
+                    json.dump({"url": url, "validator": validator}, f)
+            with response, open(partial, 'ab' if resumed else 'wb') as sink, open(partial, 'rb') as prefix:
+                os.chmod(partial, 0o644)
+                reader = TeeReader(response, sink, prefix, offset)
+                streamed = True
+                try:
+                    stream_extract(reader, staging)
+                except StreamingUnsupported as e:
+                    print(f"⚠️ Streaming extraction not possible ({e}); extracting after download")
+                    streamed = False
+                reader.drain()
+            if total is not None and reader.size < total:
+                raise FetchError(f"Connection closed after {reader.size} of {total} bytes")
+            sha256 = reader.digest.hexdigest()
+            print(f"📦 Downloaded {reader.size / 1024 / 1024:.1f} MB (sha256 {sha256})")
+
+            if expected_sha256 and sha256 != expected_sha256.lower():
+                raise FetchError(f"SHA-256 mismatch: expected {expected_sha256}, got {sha256}")
+
+            if not streamed:
+                shutil.rmtree(staging)
+                staging.mkdir()
+                with zipfile.ZipFile(partial) as archive:
+                    for info in archive.infolist():
+                        _safe_target(staging, info.filename)
+                    archive.extractall(staging)
+            restore_metadata(partial, staging)
+
+            os.replace(partial, self.archive_path(sha256))
+            tree = self.tree_path(sha256)
+            if tree.exists():
+                # Another job finished the same archive first
+                shutil.rmtree(staging)
+            else:
+                os.replace(staging, tree)
+            self.remember(url, sha256)
+            return sha256
+        except (FetchError, OSError, http.client.HTTPException, zipfile.BadZipFile) as e:
+            # Keep what arrived if the transfer stopped short (or, without a
+            # Content-Length, if the connection failed); anything else is bad data
+            received = reader.size if reader is not None else 0
+            if total is not None:
+                truncated = received < total
+            else:
+                truncated = reader is not None and isinstance(e, (OSError, http.client.HTTPException))
+            keep_partial = truncated and bool(validator)
+            if not truncated:
+                if isinstance(e, FetchError):
+                    raise
+                if isinstance(e, zipfile.BadZipFile):
+                    raise FetchError(f"Not a valid zip archive: {e}")
+            raise FetchError(f"Download failed: {e}", resumable=truncated)
+        finally:
+            if not keep_partial:
+                for leftover in (partial, validator_path):
+                    if leftover.exists():
+                        leftover.unlink()
+            if staging.exists():
+                shutil.rmtree(staging, ignore_errors=True)
+
+def _link_tree(source, dest, copy):
+    """Recreate source under dest using hardlinks (falling back to copies)"""
+    linked = copied = 0
+    for dirpath, dirnames, filenames in os.walk(source):
+        relative = Path(dirpath).relative_to(source)
+        target_dir = dest / relative
+        target_dir.mkdir(parents=True, exist_ok=True)
+        for name in dirnames + filenames:
+            src = Path(dirpath) / name
+            dst = target_dir / name
+            if src.is_symlink():
+                os.symlink(os.readlink(src), dst)
+            elif src.is_file():
+                if not copy:
+                    try:
+                        os.link(src, dst)
+                        linked += 1
+                        continue
+                    except OSError:
+                        pass
+                shutil.copy2(src, dst)
+                copied += 1
+    return linked, copied
+
+@profiling.traced("io", "materialize framework")
+def materialize(tree, dest, copy=False):
+    """Swap the cached tree's top-level entries into dest"""
+    dest.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=".castar-fetch-", dir=dest))
+    try:
+        linked, copied = _link_tree(tree, staging, copy)
+        for entry in sorted(os.listdir(staging)):
+            target = dest / entry
+            if target.is_dir() and not target.is_symlink():
+                shutil.rmtree(target)
+            elif target.exists() or target.is_symlink():
+                target.unlink()
+            os.replace(staging / entry, target)
+        return linked, copied
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+def _cached_hash(cache, url, expected_sha256):
+    sha256 = expected_sha256.lower() if expected_sha256 else cache.known_hash(url)
+    return sha256 if sha256 and cache.verify(sha256) else None
+
+def fetch_sdk(url=DEFAULT_URL, expected_sha256=None, dest=None, cache_root=None, copy=False,
+              retries=DOWNLOAD_RETRIES):
+    """Make dest contain the SDK archive's contents, downloading only on a cache miss"""
+    cache = SdkCache(cache_root)
+    dest = Path(dest or paths.frameworks_dir())
+
+    sha256 = _cached_hash(cache, url, expected_sha256)
+    if sha256:
+        print(f"♻️ Cache hit for {sha256[:12]}")
+    else:
+        cache.archives.mkdir(parents=True, exist_ok=True)
+        try:
+            with fileutil.file_lock(cache.partial_path(url), DOWNLOAD_LOCK_TIMEOUT):
+                # A job we waited for may have just filled the cache
+                sha256 = _cached_hash(cache, url, expected_sha256)
+                if sha256:
+                    print(f"♻️ Cache hit for {sha256[:12]} (downloaded by another job)")
+                else:
+                    sha256 = _download_with_retries(cache, url, expected_sha256, retries)
+        except fileutil.LockTimeout as e:
+            raise FetchError(str(e))
+
+    linked, copied = materialize(cache.tree_path(sha256), dest, copy)
+    print(f"✅ CastarSDK extracted to {dest} ({linked} hardlinked, {copied} copied)")
+    return sha256
+
+def _download_with_retries(cache, url, expected_sha256, retries):
+    if expected_sha256 is None:
+        print("⚠️ No --sha256 pinned; the download will be cached but not verified")
+    print(f"📥 Downloading {url}")
+    for attempt in range(retries + 1):
+        try:
+            return cache.download(url, expected_sha256)
+        except FetchError as e:
+            if not e.resumable or attempt == retries:
+                raise
+            print(f"⚠️ {e}; retrying ({attempt + 1}/{retries})")
+
+def main(argv=None):
+    """Entry point for `castar-tools fetch-sdk`"""
+    parser = argparse.ArgumentParser(prog="castar-tools fetch-sdk",
+                                     description="Download CastarSDK.framework through a verified cache")
+    parser.add_argument("--url", default=os.environ.get("CASTAR_SDK_URL", DEFAULT_URL),
+                        help="Archive URL (default: $CASTAR_SDK_URL or the v1.0.0 release)")
+    parser.add_argument("--sha256", default=os.environ.get("CASTAR_SDK_SHA256"),
+                        help="Expected archive SHA-256 (default: $CASTAR_SDK_SHA256)")
+    parser.add_argument("--dest", help="Extraction directory (default: ios/Frameworks)")
+    parser.add_argument("--cache-dir", help="Cache directory (default: ~/.cache/castar-tools/sdk)")
+    parser.add_argument("--copy", action="store_true", help="Copy from the cache instead of hardlinking")
+    parser.add_argument("--retries", type=int, default=DOWNLOAD_RETRIES,
+                        help="Times to resume an interrupted download (default: %(default)s)")
+    profiling.add_profile_argument(parser)
+    args = parser.parse_args(argv)
+
+    with profiling.profile_session(args.profile, "fetch-sdk"):
+        try:
+            fetch_sdk(args.url, args.sha256 or None, args.dest, args.cache_dir, args.copy, args.retries)
+        except FetchError as e:
+            print(f"❌ {e}")
+            return False
+    # The framework may have changed under any saved snapshot
+    framework_snapshot.invalidate()
+    return True
@@ -0,0 +1,555 @@
+"""
+Batch symbolizer for Dart AOT stack traces
+
+Release builds use --split-debug-info=build/debug-info, so the raw traces
+that main() prints from runZonedGuarded only carry addresses:
+
+    build_id: '6d5f0e...'
+    isolate_dso_base: 10fa20000, vm_dso_base: 10fa20000
+        #00 abs 000000010fc8c2c3 virt 00000000002712c3 _kDartIsolateSnapshotInstructions+0x26a253
+
+Each .symbols ELF file is loaded once into a sorted address index
+(function symbols from .symtab, file:line rows from .debug_line) that
+is looked up with bisect. The index is cached on disk keyed by the
+file's build id (or its path, size and mtime if it has none), so
+triaging many reports doesn't reparse the ELF or run `flutter symbolize`
+once per trace. Cache files are plain data (a JSON header and raw
+arrays) and are validated on load, so a shared cache directory can't
+run code or crash the run.
+
+    castar-tools symbolize --symbols build/debug-info traces.txt ...
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+from pathlib import Path
+
+from castar_tools import paths, profiling
+
+INDEX_VERSION = 2
+
+SHT_SYMTAB = 2
+SHT_NOTE = 7
+STT_FUNC = 2
+NT_GNU_BUILD_ID = 3
+
+BUILD_ID_RE = re.compile(r"build_id: '([0-9a-fA-F]+)'")
+DSO_BASE_RE = re.compile(r"isolate_dso_base: ([0-9a-fA-F]+)")
+FRAME_RE = re.compile(
+    r"#(?P<index>\d+)\s+abs\s+(?P<abs>[0-9a-fA-F]+)"
+    r"(?:\s+virt\s+(?P<virt>[0-9a-fA-F]+))?"
+    r"\s+(?P<symbol>\S+)"
+)
+TRACE_START = "*** *** ***"
+
+class SymbolizeError(Exception):
+    """A symbols file could not be read"""
+
+# --- ELF ------------------------------------------------------------------
+
+def _read_sections(data):
+    """Return {name: (type, addr, offset, size)} for a little-endian ELF file"""
+    if data[:4] != b"\x7fELF":
+        raise SymbolizeError("not an ELF file")
+    if data[5] != 1:
+        raise SymbolizeError("big-endian ELF is not supported")
+    is_64 = data[4] == 2
+    if is_64:
+        shoff, = struct.unpack_from("<Q", data, 0x28)
+        shentsize, shnum, shstrndx = struct.unpack_from("<HHH", data, 0x3A)
+        header = struct.Struct("<IIQQQQIIQQ")
+    else:
+        shoff, = struct.unpack_from("<I", data, 0x20)
+        shentsize, shnum, shstrndx = struct.unpack_from("<HHH", data, 0x2E)
+        header = struct.Struct("<IIIIIIIIII")
+
+    raw = [header.unpack_from(data, shoff + index * shentsize) for index in range(shnum)]
+    names_offset = raw[shstrndx][4]
+    sections = {}
+    for entry in raw:
+        name_offset, section_type, _, addr, offset, size = entry[:6]
+        start = names_offset + name_offset
+        # find(), not index(): data may be an mmap
+        name = data[start:data.find(b"\0", start)].decode('ascii', errors='replace')
+        sections[name] = (section_type, addr, offset, size)
+    return sections, is_64
+
+def _section_bytes(data, sections, name):
+    if name not in sections:
+        return b""
+    _, _, offset, size = sections[name]
+    return data[offset:offset + size]
+
+def _build_id(data, sections):
+    for name, (section_type, _, offset, size) in sections.items():
+        if section_type != SHT_NOTE:
+            continue
+        cursor = offset
+        while cursor + 12 <= offset + size:
+            namesz, descsz, note_type = struct.unpack_from("<III", data, cursor)
+            desc_start = cursor + 12 + ((namesz + 3) & ~3)
+            if note_type == NT_GNU_BUILD_ID:
+                return data[desc_start:desc_start + descsz].hex()
+            cursor = desc_start + ((descsz + 3) & ~3)
+    return ""
+
+def _function_symbols(data, sections, is_64):
+    """Sorted (start, end, name) for function symbols in .symtab"""
+    if ".symtab" not in sections:
+        return []
+    _, _, offset, size = sections[".symtab"]
+    strtab = _section_bytes(data, sections, ".strtab")
+    entry = struct.Struct("<IBBHQQ" if is_64 else "<IIIBBH")
+    symbols = []
+    sized = []
+    for cursor in range(offset, offset + size, entry.size):
+        if is_64:
+            name_offset, info, _, shndx, value, sym_size = entry.unpack_from(data, cursor)
+        else:
+            name_offset, value, sym_size, info, _, shndx = entry.unpack_from(data, cursor)
+        if not name_offset or not shndx or not sym_size:
+            continue
+        name = strtab[name_offset:strtab.index(b"\0", name_offset)].decode('utf-8', errors='replace')
+        if info & 0xF == STT_FUNC:
+            symbols.append((value, value + sym_size, name))
+        else:
+            sized.append((value, value + sym_size, name))
+    # Fall back to any sized symbol if the writer didn't mark functions
+    symbols = symbols or sized
+    symbols.sort()
+    return symbols
+
+# --- DWARF .debug_line -----------------------------------------------------
+
+def _uleb(data, cursor):
+    result = shift = 0
+    while True:
+        byte = data[cursor]
+        cursor += 1
+        result |= (byte & 0x7F) << shift
+        shift += 7
+        if byte < 0x80:
+            return result, cursor
+
+def _sleb(data, cursor):
+    result = shift = 0
+    while True:
+        byte = data[cursor]
+        cursor += 1
+        result |= (byte & 0x7F) << shift
+        shift += 7
+        if byte < 0x80:
+            if byte & 0x40:
+                result -= 1 << shift
+            return result, cursor
+
+def _cstring(data, cursor):
+    end = data.index(b"\0", cursor)
+    return data[cursor:end].decode('utf-8', errors='replace'), end + 1
+
+# DW_FORM values used by DWARF 5 line table entry formats
+DW_FORM_block = 0x09
+DW_FORM_data1, DW_FORM_data2, DW_FORM_data4, DW_FORM_data8, DW_FORM_data16 = 0x0B, 0x05, 0x06, 0x07, 0x1E
+DW_FORM_string, DW_FORM_strp, DW_FORM_line_strp, DW_FORM_udata = 0x08, 0x0E, 0x1F, 0x0F
+DW_LNCT_path, DW_LNCT_directory_index = 0x1, 0x2
+
+def _read_form(data, cursor, form, offset_size, strings):
+    if form == DW_FORM_string:
+        return _cstring(data, cursor)
+    if form in (DW_FORM_strp, DW_FORM_line_strp):
+        fmt = "<Q" if offset_size == 8 else "<I"
+        offset, = struct.unpack_from(fmt, data, cursor)
+        table = strings[form]
+        return _cstring(table, offset)[0], cursor + offset_size
+    if form == DW_FORM_udata:
+        return _uleb(data, cursor)
+    sizes = {DW_FORM_data1: 1, DW_FORM_data2: 2, DW_FORM_data4: 4, DW_FORM_data8: 8, DW_FORM_data16: 16}
+    if form in sizes:
+        size = sizes[form]
+        return int.from_bytes(data[cursor:cursor + size], 'little'), cursor + size
+    if form == DW_FORM_block:
+        length, cursor = _uleb(data, cursor)
+        return None, cursor + length
+    raise SymbolizeError(f"unsupported DWARF form 0x{form:x} in .debug_line")
+
+def _entry_table(data, cursor, offset_size, strings):
+    """Parse a DWARF 5 directory/file table into a list of {content_type: value}"""
+    format_count = data[cursor]
+    cursor += 1
+    formats = []
+    for _ in range(format_count):
+        content_type, cursor = _uleb(data, cursor)
+        form, cursor = _uleb(data, cursor)
+        formats.append((content_type, form))
+    count, cursor = _uleb(data, cursor)
+    entries = []
+    for _ in range(count):
+        entry = {}
+        for content_type, form in formats:
+            entry[content_type], cursor = _read_form(data, cursor, form, offset_size, strings)
+        entries.append(entry)
+    return entries, cursor
+
+def parse_debug_line(data, strings):
+    """
+    Run the .debug_line programs of every unit.
+
+    Returns (rows, files): rows are (address, file_id, line) with line 0
+    marking the end of a sequence; files is the global file name list.
+    """
+    rows = []
+    files = []
+    cursor = 0
+    while cursor < len(data):
+        unit_length, = struct.unpack_from("<I", data, cursor)
+        cursor += 4
+        offset_size = 4
+        if unit_length == 0xFFFFFFFF:
+            unit_length, = struct.unpack_from("<Q", data, cursor)
+            cursor += 8
+            offset_size = 8
+        unit_end = cursor + unit_length
+        version, = struct.unpack_from("<H", data, cursor)
+        cursor += 2
+        address_size = 8
+        if version >= 5:
+            address_size = data[cursor]
+            cursor += 2
+        header_length = int.from_bytes(data[cursor:cursor + offset_size], 'little')
+        cursor += offset_size
+        program_start = cursor + header_length
+        min_inst_length = data[cursor]
+        cursor += 1
+        if version >= 4:
+            cursor += 1  # maximum_operations_per_instruction (VLIW only)
+        cursor += 1  # default_is_stmt
+        line_base = struct.unpack_from("<b", data, cursor)[0]
+        line_range = data[cursor + 1]
+        opcode_base = data[cursor + 2]
+        standard_lengths = data[cursor + 3:cursor + 3 + opcode_base - 1]
+        cursor += 3 + opcode_base - 1
+
+        unit_files = []
+        if version >= 5:
+            directories, cursor = _entry_table(data, cursor, offset_size, strings)
+            entries, cursor = _entry_table(data, cursor, offset_size, strings)
+            dir_names = [entry.get(DW_LNCT_path, "") for entry in directories]
+            for entry in entries:
+                name = entry.get(DW_LNCT_path, "")
+                directory = entry.get(DW_LNCT_directory_index, 0)
+                if directory and directory < len(dir_names) and not name.startswith("/"):
+                    name = f"{dir_names[directory]}/{name}"
+                unit_files.append(name)
+        else:
+            dir_names = [""]
+            while data[cursor]:
+                name, cursor = _cstring(data, cursor)
+                dir_names.append(name)
+            cursor += 1
+            unit_files.append("")  # file numbers are 1-based before DWARF 5
+            while data[cursor]:
+                name, cursor = _cstring(data, cursor)
+                directory, cursor = _uleb(data, cursor)
+                _, cursor = _uleb(data, cursor)
+                _, cursor = _uleb(data, cursor)
+                if directory and directory < len(dir_names) and not name.startswith("/"):
+                    name = f"{dir_names[directory]}/{name}"
+                unit_files.append(name)
+        file_base = len(files)
+        files.extend(unit_files)
+
+        cursor = program_start
+        address, file_index, line = 0, 1, 1
+        while cursor < unit_end:
+            opcode = data[cursor]
+            cursor += 1
+            if opcode >= opcode_base:
+                adjusted = opcode - opcode_base
+                address += (adjusted // line_range) * min_inst_length
+                line += line_base + adjusted % line_range
+                rows.append((address, file_base + file_index, line))
+            elif opcode == 0:
+                length, cursor = _uleb(data, cursor)
+                sub_opcode = data[cursor]
+                if sub_opcode == 1:  # end_sequence
+                    rows.append((address, 0, 0))
+                    address, file_index, line = 0, 1, 1
+                elif sub_opcode == 2:  # set_address
+                    address = int.from_bytes(data[cursor + 1:cursor + 1 + address_size], 'little')
+                cursor += length
+            elif opcode == 1:  # copy
+                rows.append((address, file_base + file_index, line))
+            elif opcode == 2:  # advance_pc
+                advance, cursor = _uleb(data, cursor)
+                address += advance * min_inst_length
+            elif opcode == 3:  # advance_line
+                advance, cursor = _sleb(data, cursor)
+                line += advance
+            elif opcode == 4:  # set_file
+                file_index, cursor = _uleb(data, cursor)
+            elif opcode == 8:  # const_add_pc
+                address += ((255 - opcode_base) // line_range) * min_inst_length
+            elif opcode == 9:  # fixed_advance_pc
+                address += struct.unpack_from("<H", data, cursor)[0]
+                cursor += 2
+            else:
+                # Other standard opcodes only carry ULEB operands we don't need
+                for _ in range(standard_lengths[opcode - 1]):
+                    _, cursor = _uleb(data, cursor)
+        cursor = unit_end
+    # A sequence may start where another ends; keep the end marker first so
+    # bisect lands on the real row
+    rows.sort(key=lambda row: (row[0], row[2] != 0))
+    return rows, files
+
+# --- Index -------------------------------------------------------------------
+
+class SymbolIndex:
+    """Sorted address tables for one .symbols file"""
+    __slots__ = ("path", "build_id", "starts", "ends", "name_ids", "names",
+                 "line_addrs", "line_files", "line_numbers", "files")
+
+    # Array attributes in the order they are stored in a cache file
+    ARRAYS = (("starts", "Q"), ("ends", "Q"), ("name_ids", "I"),
+              ("line_addrs", "Q"), ("line_files", "I"), ("line_numbers", "I"))
+
+    def __init__(self, path, build_id, symbols=(), rows=(), files=()):
+        self.path = str(path)
+        self.build_id = build_id
+        self.starts = array('Q', (start for start, _, _ in symbols))
+        self.ends = array('Q', (end for _, end, _ in symbols))
+        names = {}
+        self.name_ids = array('I', (names.setdefault(name, len(names)) for _, _, name in symbols))
+        self.names = list(names)
+        self.line_addrs = array('Q', (row[0] for row in rows))
+        self.line_files = array('I', (row[1] for row in rows))
+        self.line_numbers = array('I', (row[2] for row in rows))
+        self.files = list(files)
+
+    def function_at(self, address):
+        position = bisect_right(self.starts, address) - 1
+        if position >= 0 and address < self.ends[position]:
+            return self.names[self.name_ids[position]]
+        return None
+
+    def line_at(self, address):
+        position = bisect_right(self.line_addrs, address) - 1
+        if position < 0 or self.line_numbers[position] == 0:
+            return None
+        file_id = self.line_files[position]
+        name = self.files[file_id] if file_id < len(self.files) else "??"
+        return name, self.line_numbers[position]
+
+    def save(self, cache_file):
+        """Write the index as a JSON header line followed by the raw arrays"""
+        header = {
+            "version": INDEX_VERSION,
+            "build_id": self.build_id,
+            "byteorder": sys.byteorder,
+            "arrays": [[name, typecode, array(typecode).itemsize, len(getattr(self, name))]
+                       for name, typecode in self.ARRAYS],
+            "names": self.names,
+            "files": self.files,
+        }
+        tmp_path = cache_file.with_suffix(".tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(json.dumps(header, ensure_ascii=False).encode('utf-8') + b"\n")
+            for name, _ in self.ARRAYS:
+                getattr(self, name).tofile(f)
+        os.replace(tmp_path, cache_file)
+
+    @classmethod
+    def load(cls, cache_file, path, build_id):
+        """Read an index written by save(); ValueError if it isn't a valid one for build_id"""
+        with open(cache_file, 'rb') as f:
+            header = json.loads(f.readline())
+            if not isinstance(header, dict) or header.get("version") != INDEX_VERSION:
+                raise ValueError("index version mismatch")
+            if header.get("build_id") != build_id or header.get("byteorder") != sys.byteorder:
+                raise ValueError("index is for another symbols file or platform")
+            index = cls(path, build_id)
+            index.names = [str(name) for name in header["names"]]
+            index.files = [str(name) for name in header["files"]]
+            layout = [tuple(entry) for entry in header["arrays"]]
+            if [(name, typecode) for name, typecode, _, _ in layout] != list(cls.ARRAYS):
+                raise ValueError("unexpected index layout")
+            for name, typecode, itemsize, count in layout:
+                values = array(typecode)
+                if values.itemsize != itemsize or not isinstance(count, int) or count < 0:
+                    raise ValueError("unexpected index layout")
+                values.fromfile(f, count)  # EOFError if the file is truncated
+                setattr(index, name, values)
+            if f.read(1):
+                raise ValueError("trailing data in index")
+        # Every table must line up and every id must resolve
+        if not (len(index.starts) == len(index.ends) == len(index.name_ids)) or \
+                not (len(index.line_addrs) == len(index.line_files) == len(index.line_numbers)):
+            raise ValueError("index tables differ in length")
+        if index.name_ids and max(index.name_ids) >= len(index.names):
+            raise ValueError("index refers to missing names")
+        return index
+
+@profiling.traced("io", "parse symbols ELF")
+def build_index(path):
+    """Parse a .symbols ELF file into a SymbolIndex"""
+    data = Path(path).read_bytes()
+    sections, is_64 = _read_sections(data)
+    strings = {
+        DW_FORM_strp: _section_bytes(data, sections, ".debug_str"),
+        DW_FORM_line_strp: _section_bytes(data, sections, ".debug_line_str"),
+    }
+    rows, files = [], []
+    debug_line = _section_bytes(data, sections, ".debug_line")
+    if debug_line:
+        rows, files = parse_debug_line(debug_line, strings)
+    return SymbolIndex(path, _build_id(data, sections), _function_symbols(data, sections, is_64),
+                       rows, files)
+
+def read_build_id(path):
+    """The GNU build id of an ELF file, reading only its headers and notes"""
+    with open(path, 'rb') as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            raise SymbolizeError("not an ELF file")
+    with data:
+        sections, _ = _read_sections(data)
+        return _build_id(data, sections)
+
+def _cache_path(path, build_id, cache_dir):
+    """Build ids name the content, so their indexes can be shared between hosts"""
+    if build_id:
+        return cache_dir / f"{build_id}.v{INDEX_VERSION}.index"
+    info = path.stat()
+    key = f"{path.resolve()}:{info.st_size}:{info.st_mtime_ns}:{INDEX_VERSION}"
+    return cache_dir / f"{hashlib.sha1(key.encode()).hexdigest()}.index"
+
+def load_index(path, cache_dir=None):
+    """Return the SymbolIndex for path, from the on-disk cache when still valid"""
+    path = Path(path)
+    cache_dir = Path(cache_dir or paths.cache_dir() / "symbols")
+    build_id = read_build_id(path)
+    cache_file = _cache_path(path, build_id, cache_dir)
+    try:
+        with profiling.span("load symbol index", "io"):
+            return SymbolIndex.load(cache_file, path, build_id)
+    except FileNotFoundError:
+        pass
+    except (OSError, EOFError, ValueError, TypeError, KeyError) as e:
+        # Truncated, from another version or not an index at all: rebuild it
+        print(f"⚠️ Ignoring unreadable symbol index {cache_file.name}: {e}", file=sys.stderr)
+    index = build_index(path)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    index.save(cache_file)
+    return index
+
+def find_symbol_files(locations):
+    """Expand directories into the .symbols files they contain"""
+    found = []
+    for location in locations:
+        location = Path(location)
+        if location.is_dir():
+            found.extend(sorted(location.rglob("*.symbols")))
+        elif location.exists():
+            found.append(location)
+    return found
+
+class Symbolizer:
+    """Symbolizes trace lines against a set of indexed .symbols files"""
+
+    def __init__(self, symbol_files, cache_dir=None):
+        self.indexes = [load_index(path, cache_dir) for path in symbol_files]
+        self.by_build_id = {index.build_id: index for index in self.indexes if index.build_id}
+
+    def index_for(self, build_id):
+        if build_id and build_id in self.by_build_id:
+            return self.by_build_id[build_id]
+        if len(self.indexes) == 1:
+            return self.indexes[0]
+        return None
+
+    def symbolize_lines(self, lines):
+        """Yield output lines, rewriting frames of every trace found in lines"""
+        build_id = None
+        dso_base = None
+        for line in lines:
+            if TRACE_START in line:
+                build_id = dso_base = None
+            match = BUILD_ID_RE.search(line)
+            if match:
+                build_id = match.group(1).lower()
+            match = DSO_BASE_RE.search(line)
+            if match:
+                dso_base = int(match.group(1), 16)
+
+            frame = FRAME_RE.search(line)
+            index = self.index_for(build_id) if frame else None
+            if frame is None or index is None:
+                yield line
+                continue
+
+            if frame.group("virt"):
+                address = int(frame.group("virt"), 16)
+            elif dso_base is not None:
+                address = int(frame.group("abs"), 16) - dso_base
+            else:
+                yield line
+                continue
+            # Frames above the first hold return addresses; look up the call instead
+            lookup = address - 1 if int(frame.group("index")) > 0 else address
+            function = index.function_at(lookup)
+            location = index.line_at(lookup)
+            if function is None and location is None:
+                yield line
+                continue
+            text = function or frame.group("symbol")
+            if location:
+                text += f" ({location[0]}:{location[1]})"
+            ending = "\n" if line.endswith("\n") else ""
+            yield f"{line[:frame.start()]}#{frame.group('index')} {address:#x} {text}{ending}"
+
+def main(argv=None):
+    """Entry point for `castar-tools symbolize`"""
+    parser = argparse.ArgumentParser(prog="castar-tools symbolize",
+                                     description="Symbolize Dart AOT stack traces with split debug info")
+    parser.add_argument("traces", nargs="*", help="Files with pasted or logged traces (default: stdin)")
+    parser.add_argument("--symbols", action="append",
+                        help="A .symbols file or directory of them (default: build/debug-info)")
+    parser.add_argument("--output", help="Write symbolized output here instead of stdout")
+    parser.add_argument("--cache-dir", help="Index cache directory (default: ~/.cache/castar-tools/symbols)")
+    profiling.add_profile_argument(parser)
+    args = parser.parse_args(argv)
+
+    locations = args.symbols or [paths.project_root() / "build" / "debug-info"]
+    symbol_files = find_symbol_files(locations)
+    if not symbol_files:
+        print(f"❌ No .symbols files found in: {', '.join(str(l) for l in locations)}", file=sys.stderr)
+        return False
+
+    with profiling.profile_session(args.profile, "symbolize"):
+        try:
+            symbolizer = Symbolizer(symbol_files, args.cache_dir)
+        except (OSError, SymbolizeError, struct.error, IndexError) as e:
+            print(f"❌ Could not index symbols: {e}", file=sys.stderr)
+            return False
+
+        out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+        try:
+            if args.traces:
+                for trace_path in args.traces:
+                    with open(trace_path, 'r', encoding='utf-8', errors='replace') as f:
+                        out.writelines(symbolizer.symbolize_lines(f))
+            else:
+                out.writelines(symbolizer.symbolize_lines(sys.stdin))
+        finally:
+            if args.output:
+                out.close()
+    return True
@@ -5,16 +5,39 @@ Helps diagnose startup crashes and provides detailed logging
 """
 
 import os
+import io
 import sys
 import subprocess
 import time
 import json
+import platform
+import argparse
+import contextlib
+import functools
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
+from castar_tools import paths
+
+# The check modules are imported by the functions that use them, as in
+# cli.py, so `--help` and spawned fleet workers only load what they run
+
+def traced(func):
+    """profiling.traced(), importing profiling only once the check runs"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        from castar_tools import profiling
+        return profiling.traced()(func)(*args, **kwargs)
+    return wrapper
+
 def run_command(cmd, cwd=None):
     """Run a command and return the result"""
+    from castar_tools import profiling
+
+    if cwd is None:
+        cwd = paths.project_root()
     try:
-        result = subprocess.run(
+        result = profiling.run(
             cmd, 
             shell=True, 
             cwd=cwd,
@@ -30,8 +53,11 @@ def run_command(cmd, cwd=None):
     except Exception as e:
         return -1, "", str(e)
 
-def check_flutter_environment():
+@traced
+def check_flutter_environment(context=None):
     """Check Flutter environment"""
+    from castar_tools import flutter_doctor
+
     print("🔍 Checking Flutter environment...")
     
     # Check Flutter version
@@ -42,31 +68,47 @@ def check_flutter_environment():
         lines = stdout.split('\n')
         if lines:
             print(lines[0])
+            if context is not None:
+                context["flutter_version"] = lines[0]
     else:
         print("❌ Flutter not found or error:", stderr)
         return False
     
-    # Check Flutter doctor
+    # Check Flutter doctor (parsed and cached per Flutter SDK / Xcode)
     print("\n🔍 Running Flutter doctor...")
-    code, stdout, stderr = run_command("flutter doctor -v")
-    if code == 0:
-        print("✅ Flutter doctor completed")
+    refresh = context.get("refresh_doctor", False) if context is not None else False
+    sections, from_cache, error = flutter_doctor.get_doctor_sections(refresh=refresh)
+    if sections is not None:
+        if from_cache:
+            print("✅ Flutter doctor results reused from cache")
+        else:
+            print("✅ Flutter doctor completed")
+        if context is not None:
+            context["doctor"] = sections
         # Look for iOS setup
-        if "iOS toolchain" in stdout and "✓" in stdout:
-            print("✅ iOS toolchain is properly configured")
+        ios_section = flutter_doctor.ios_toolchain(sections)
+        if ios_section is None:
+            print("⚠️ iOS toolchain not reported by Flutter doctor")
+        elif ios_section["status"] == "ok":
+            print(f"✅ iOS toolchain is properly configured ({ios_section['summary']})")
         else:
-            print("⚠️ iOS toolchain may have issues")
+            print(f"⚠️ iOS toolchain has issues ({ios_section['summary']})")
+            for issue in ios_section["issues"]:
+                print(f"   - {issue['message']}")
     else:
-        print("❌ Flutter doctor failed:", stderr)
+        print("❌ Flutter doctor failed:", error)
     
     return True
 
-def check_ios_setup():
+@traced
+def check_ios_setup(context=None):
     """Check iOS-specific setup"""
+    from castar_tools import plist_rules
+
     print("\n🔍 Checking iOS setup...")
     
     # Check if iOS folder exists
-    ios_path = Path("ios")
+    ios_path = paths.ios_dir()
     if not ios_path.exists():
         print("❌ iOS folder not found")
         return False
@@ -89,44 +131,40 @@ def check_ios_setup():
     else:
         print("❌ AppDelegate.swift not found")
     
-    # Check Info.plist
-    info_plist_path = ios_path / "Runner" / "Info.plist"
-    if info_plist_path.exists():
-        print("✅ Info.plist found")
-        
-        # Check for background modes
-        try:
-            with open(info_plist_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                if "UIBackgroundModes" in content:
-                    print("✅ Background modes configured")
-                else:
-                    print("❌ Background modes not configured")
-        except Exception as e:
-            print(f"❌ Error reading Info.plist: {e}")
-    else:
-        print("❌ Info.plist not found")
+    # Check Info.plist (Runner and CastarSDK) against the plist rules
+    try:
+        plist_context = plist_rules.load_context()
+        results = plist_rules.evaluate(plist_context)
+        plist_rules.print_results(plist_context, results)
+        plist_ok = not any(result["severity"] == "error" for result in results)
+        if context is not None:
+            context["plist_results"] = results
+    except Exception as e:
+        print(f"❌ Error checking Info.plist: {e}")
+        plist_ok = False
     
-    return True
+    return plist_ok
 
+@traced
 def check_castar_sdk():
     """Check CastarSDK setup"""
+    from castar_tools import framework_snapshot
+
     print("\n🔍 Checking CastarSDK setup...")
     
     # Check if framework exists
-    framework_path = Path("ios/Frameworks/CastarSDK.framework")
-    if framework_path.exists():
+    snapshot = framework_snapshot.get_snapshot()
+    if snapshot.exists:
         print("✅ CastarSDK.framework found")
         
         # Check framework contents
-        headers_path = framework_path / "Headers"
-        if headers_path.exists():
+        if snapshot.has_headers:
             print("✅ Framework headers found")
-            header_files = list(headers_path.glob("*.h"))
-            if header_files:
-                print(f"✅ Found {len(header_files)} header files")
-                for header in header_files:
-                    print(f"   - {header.name}")
+            header_names = snapshot.header_names
+            if header_names:
+                print(f"✅ Found {len(header_names)} header files")
+                for name in header_names:
+                    print(f"   - {name}")
             else:
                 print("❌ No header files found")
         else:
@@ -137,9 +175,57 @@ def check_castar_sdk():
     
     return True
 
-def build_and_test():
+@traced
+def check_sdk_headers(context=None):
+    """Check the umbrella header and the Castar interface Swift imports"""
+    from castar_tools import framework_snapshot
+
+    print("\n🔍 Checking CastarSDK headers...")
+    
+    snapshot = framework_snapshot.get_snapshot()
+    if not snapshot.has_headers:
+        print("❌ Framework headers not found")
+        return False
+    if context is not None:
+        context["header_count"] = len(snapshot.header_names)
+    
+    headers_ok = True
+    umbrella = snapshot.headers.get("CastarSDK.h")
+    if umbrella is None:
+        print("❌ Umbrella header CastarSDK.h not found")
+        headers_ok = False
+    elif '#import "CSDK.h"' not in umbrella and '#import <CastarSDK/CSDK.h>' not in umbrella:
+        print("⚠️ CSDK.h not imported in umbrella header (run fix_framework_swift.py)")
+    
+    if any("@interface Castar" in text for text in snapshot.headers.values()):
+        print("✅ Castar interface declared")
+    else:
+        print("❌ Castar interface not found in headers")
+        headers_ok = False
+    return headers_ok
+
+@traced
+def check_method_channel(context=None):
+    """Check that the Dart MethodChannel calls match the Swift handlers"""
+    from castar_tools import channel_contract
+
+    print("\n🔍 Checking MethodChannel contract...")
+    
+    try:
+        ok, issues = channel_contract.run_check()
+    except Exception as e:
+        print(f"❌ Error checking MethodChannel contract: {e}")
+        return False
+    
+    if context is not None:
+        context["channel_issues"] = issues
+    return ok
+
+@traced
+def build_and_test(context=None):
     """Build and test the app"""
     print("\n🔧 Building and testing the app...")
+    started = time.time()
     
     # Clean build
     print("🧹 Cleaning build...")
@@ -158,6 +244,8 @@ def build_and_test():
     # Build for iOS (simulator)
     print("🔨 Building for iOS simulator...")
     code, stdout, stderr = run_command("flutter build ios --debug --simulator")
+    if context is not None:
+        context["build_seconds"] = time.time() - started
     if code == 0:
         print("✅ Build successful")
         return True
@@ -167,6 +255,7 @@ def build_and_test():
         print("STDERR:", stderr)
         return False
 
+@traced
 def analyze_crash_logs():
     """Analyze crash logs if available"""
     print("\n📊 Analyzing crash logs...")
@@ -198,28 +287,46 @@ def analyze_crash_logs():
             else:
                 print("   No crash files found")
 
-def generate_debug_report():
+@traced
+def generate_debug_report(context=None):
     """Generate a comprehensive debug report"""
+    from castar_tools import framework_snapshot, profiling, report_history
+
     print("\n📋 Generating debug report...")
     
+    # Reuse whatever the checks already computed in this run
+    context = context or {}
+    created_at = time.time()
     report = {
-        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-        "flutter_version": "",
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(created_at)),
+        "created_at": created_at,
+        "machine": platform.node(),
+        "flutter_version": context.get("flutter_version", ""),
         "ios_setup": {},
         "castar_sdk": {},
+        "plist_results": context.get("plist_results", []),
+        "method_channel_issues": context.get("channel_issues", []),
+        "checks": context.get("checks", {}),
+        "build_seconds": context.get("build_seconds"),
         "build_status": "",
         "recommendations": []
     }
     
-    # Get Flutter version
-    code, stdout, stderr = run_command("flutter --version")
-    if code == 0:
-        lines = stdout.split('\n')
-        if lines:
-            report["flutter_version"] = lines[0]
+    # Get Flutter version only if the environment check didn't run
+    if "flutter_version" not in context:
+        code, stdout, stderr = run_command("flutter --version")
+        if code == 0:
+            lines = stdout.split('\n')
+            if lines:
+                report["flutter_version"] = lines[0]
+    
+    if report["checks"].get("build", False) is None:
+        report["build_status"] = "skipped"
+    elif "build" in report["checks"]:
+        report["build_status"] = "success" if report["checks"]["build"] else "failed"
     
     # Check iOS setup
-    ios_path = Path("ios")
+    ios_path = paths.ios_dir()
     if ios_path.exists():
         report["ios_setup"]["folder_exists"] = True
         report["ios_setup"]["app_delegate_exists"] = (ios_path / "Runner" / "AppDelegate.swift").exists()
@@ -227,45 +334,67 @@ def generate_debug_report():
     else:
         report["ios_setup"]["folder_exists"] = False
     
-    # Check CastarSDK
-    framework_path = Path("ios/Frameworks/CastarSDK.framework")
-    report["castar_sdk"]["framework_exists"] = framework_path.exists()
-    if framework_path.exists():
-        report["castar_sdk"]["headers_exist"] = (framework_path / "Headers").exists()
+    # Check CastarSDK (reuses the snapshot from check_castar_sdk)
+    report["castar_sdk"] = framework_snapshot.get_snapshot().summary()
     
-    # Save report
+    # Save latest report
     try:
-        with open("debug_report.json", 'w', encoding='utf-8') as f:
-            json.dump(report, f, indent=2, ensure_ascii=False)
+        with profiling.span("write debug_report.json", "io"):
+            with open(paths.project_root() / "debug_report.json", 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
         print("✅ Debug report saved to debug_report.json")
     except Exception as e:
         print(f"❌ Error saving debug report: {e}")
     
+    # Append to history
+    try:
+        with profiling.span("append report history", "io"):
+            report_id = report_history.append_report(report)
+        print(f"✅ Report #{report_id} appended to {report_history.DB_NAME}")
+    except Exception as e:
+        print(f"❌ Error appending to report history: {e}")
+    
     return report
 
-def main():
-    """Main debug function"""
+def run_checks(refresh_doctor=False):
+    """Run all checks and write the debug report"""
     print("🚀 CastarSDK Flutter App Debug Tool")
     print("=" * 50)
     
     # Check if we're in the right directory
-    if not Path("pubspec.yaml").exists():
+    if not (paths.project_root() / "pubspec.yaml").exists():
         print("❌ pubspec.yaml not found. Please run this script from the Flutter project root.")
         return
     
+    context = {"refresh_doctor": refresh_doctor}
+    
     # Run all checks
-    flutter_ok = check_flutter_environment()
-    ios_ok = check_ios_setup()
+    flutter_ok = check_flutter_environment(context)
+    ios_ok = check_ios_setup(context)
     sdk_ok = check_castar_sdk()
+    channel_ok = check_method_channel(context)
     
-    # Build test
-    build_ok = build_and_test()
+    # Build test, gated on the channel contract: a mismatch only shows up
+    # as a runtime crash or hang, so don't spend a build on it
+    if channel_ok:
+        build_ok = build_and_test(context)
+    else:
+        print("\n⏭️ Skipping build: fix the MethodChannel contract first")
+        # None = didn't run; the history must not record it as a failed build
+        build_ok = None
     
     # Analyze crashes
     analyze_crash_logs()
     
     # Generate report
-    report = generate_debug_report()
+    context["checks"] = {
+        "flutter": flutter_ok,
+        "ios": ios_ok,
+        "sdk": sdk_ok,
+        "channel": channel_ok,
+        "build": build_ok,
+    }
+    generate_debug_report(context)
     
     # Summary
     print("\n" + "=" * 50)
@@ -274,7 +403,8 @@ def main():
     print(f"Flutter Environment: {'✅' if flutter_ok else '❌'}")
     print(f"iOS Setup: {'✅' if ios_ok else '❌'}")
     print(f"CastarSDK Setup: {'✅' if sdk_ok else '❌'}")
-    print(f"Build Test: {'✅' if build_ok else '❌'}")
+    print(f"MethodChannel Contract: {'✅' if channel_ok else '❌'}")
+    print(f"Build Test: {'⏭️ skipped' if build_ok is None else '✅' if build_ok else '❌'}")
     
     # Recommendations
     print("\n💡 RECOMMENDATIONS:")
@@ -284,14 +414,205 @@ def main():
         print("- Check iOS project setup")
     if not sdk_ok:
         print("- Download and integrate CastarSDK framework")
-    if not build_ok:
+    if not channel_ok:
+        print("- Make the Dart invokeMethod calls match the AppDelegate.swift handlers")
+    if build_ok is False:
         print("- Fix build errors before testing")
     
-    if all([flutter_ok, ios_ok, sdk_ok, build_ok]):
+    if all([flutter_ok, ios_ok, sdk_ok, channel_ok, build_ok]):
         print("- All checks passed! App should work correctly.")
         print("- If app still crashes, check device logs for specific errors.")
     
     print("\n📄 Full debug report saved to: debug_report.json")
 
+# Fleet mode: the non-build checks across many checkouts. flutter and its
+# doctor don't depend on the project, so they run once up front.
+FLEET_CHECKS = ("ios", "sdk", "headers", "channel")
+FLEET_SORT_KEYS = {
+    "project": lambda row: row["project"].lower(),
+    "status": lambda row: (-len(row["failed"]), row["project"].lower()),
+    "plist": lambda row: (-row["plist_errors"], -row["plist_warnings"], row["project"].lower()),
+    "channel": lambda row: (-row["channel_issues"], row["project"].lower()),
+    "time": lambda row: -row["seconds"],
+}
+
+def check_project(root):
+    """Run the per-project non-build checks in this process; returns a fleet row"""
+    from castar_tools import framework_snapshot
+
+    paths.set_project_root(root)
+    context = {}
+    log = io.StringIO()
+    started = time.perf_counter()
+    row = {"project": Path(root).name, "root": str(root), "checks": {}, "failed": [], "error": ""}
+    try:
+        with contextlib.redirect_stdout(log):
+            if not (paths.project_root() / "pubspec.yaml").exists():
+                raise FileNotFoundError("pubspec.yaml not found")
+            row["checks"] = {
+                "ios": check_ios_setup(context),
+                # check_castar_sdk() only reports; a fleet row needs the framework present
+                "sdk": check_castar_sdk() and framework_snapshot.get_snapshot().exists,
+                "headers": check_sdk_headers(context),
+                "channel": check_method_channel(context),
+            }
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+    plist_results = context.get("plist_results", [])
+    row.update({
+        "failed": [name for name in FLEET_CHECKS if row["checks"].get(name) is False] or
+                  (["error"] if row["error"] else []),
+        "plist_errors": sum(1 for result in plist_results if result["severity"] == "error"),
+        "plist_warnings": sum(1 for result in plist_results if result["severity"] == "warning"),
+        "plist_results": plist_results,
+        "channel_issues": len(context.get("channel_issues", [])),
+        "header_count": context.get("header_count", 0),
+        "seconds": round(time.perf_counter() - started, 3),
+        "log": log.getvalue(),
+    })
+    return row
+
+def discover_projects(directory):
+    """Flutter checkouts with an ios/ folder directly under directory"""
+    found = []
+    for entry in sorted(Path(directory).iterdir()):
+        if (entry / "pubspec.yaml").is_file() and (entry / "ios").is_dir():
+            found.append(entry.resolve())
+    return found
+
+def read_roots_file(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+def print_fleet_table(rows, shared):
+    print(f"\n{'PROJECT':<28} {'STATUS':<6} {'IOS':<4} {'PLIST E/W':<10} {'SDK':<4} "
+          f"{'HEADERS':<8} {'CHANNEL':<8} {'TIME':>7}")
+    mark = lambda value: "✅" if value else ("❌" if value is False else "-")
+    for row in rows:
+        checks = row["checks"]
+        status = "✅" if not row["failed"] else "❌"
+        print(f"{row['project'][:28]:<28} {status:<6} {mark(checks.get('ios')):<4} "
+              f"{row['plist_errors']}/{row['plist_warnings']:<8} {mark(checks.get('sdk')):<4} "
+              f"{mark(checks.get('headers')) + ' ' + str(row['header_count']):<8} "
+              f"{mark(checks.get('channel')) + ' ' + str(row['channel_issues']):<8} {row['seconds']:>6.2f}s")
+        if row["error"]:
+            print(f"   ❌ {row['error']}")
+    failing = sum(1 for row in rows if row["failed"])
+    print(f"\n📊 {len(rows) - failing}/{len(rows)} projects passed"
+          f" · Flutter: {shared.get('flutter_version') or 'not available'}")
+
+def add_fleet_arguments(parser):
+    """Register fleet options on a (sub)parser"""
+    parser.add_argument("roots", nargs="*", help="Flutter project roots to check")
+    parser.add_argument("--roots-file", help="File listing project roots, one per line (# comments)")
+    parser.add_argument("--discover", metavar="DIR", help="Check every Flutter project directly under DIR")
+    parser.add_argument("--jobs", type=int, default=min(8, os.cpu_count() or 1),
+                        help="Parallel worker processes (default: min(8, CPUs))")
+    parser.add_argument("--sort", choices=sorted(FLEET_SORT_KEYS), default="status",
+                        help="Table order (default: status, failing projects first)")
+    parser.add_argument("--json", metavar="PATH", help="Also write the aggregated report as JSON")
+    parser.add_argument("--verbose", action="store_true", help="Print each project's full check output")
+    parser.add_argument("--refresh-doctor", action="store_true",
+                        help="Rerun flutter doctor even if the cached result is still valid")
+
+def run_fleet(args):
+    """Check every project root; returns True if all passed"""
+    from castar_tools import flutter_doctor, profiling
+
+    roots = list(args.roots)
+    if args.roots_file:
+        roots += read_roots_file(args.roots_file)
+    if args.discover:
+        roots += [str(root) for root in discover_projects(args.discover)]
+    roots = list(dict.fromkeys(str(Path(root).resolve()) for root in roots))
+    if not roots:
+        print("❌ No project roots given (pass roots, --roots-file or --discover)")
+        return False
+    
+    print(f"🚀 CastarSDK fleet check: {len(roots)} projects, {args.jobs} workers")
+    print("=" * 50)
+    
+    # Shared by every project: one flutter --version and one doctor
+    shared = {"refresh_doctor": args.refresh_doctor}
+    flutter_ok = check_flutter_environment(shared)
+    
+    rows = []
+    started = time.perf_counter()
+    with profiling.span("fleet checks"):
+        with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+            futures = {pool.submit(check_project, root): root for root in roots}
+            for future in as_completed(futures):
+                try:
+                    row = future.result()
+                except Exception as e:
+                    root = futures[future]
+                    row = {"project": Path(root).name, "root": root, "checks": {}, "failed": ["error"],
+                           "error": f"worker crashed: {e}", "plist_errors": 0, "plist_warnings": 0,
+                           "plist_results": [], "channel_issues": 0, "header_count": 0, "seconds": 0.0, "log": ""}
+                rows.append(row)
+                print(f"{'✅' if not row['failed'] else '❌'} {row['project']} ({row['seconds']:.2f}s)")
+    elapsed = time.perf_counter() - started
+    
+    rows.sort(key=FLEET_SORT_KEYS[args.sort])
+    if args.verbose:
+        for row in rows:
+            print(f"\n{'=' * 20} {row['project']} ({row['root']}) {'=' * 20}")
+            print(row["log"].rstrip())
+    print_fleet_table(rows, shared)
+    print(f"⏱️ {elapsed:.1f}s wall, {sum(row['seconds'] for row in rows):.1f}s of checks")
+    
+    if args.json:
+        report = {
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "machine": platform.node(),
+            "flutter_ok": flutter_ok,
+            "flutter_version": shared.get("flutter_version", ""),
+            "ios_toolchain": flutter_doctor.ios_toolchain(shared["doctor"]) if shared.get("doctor") else None,
+            "projects": rows,
+        }
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"📄 Fleet report saved to: {args.json}")
+    
+    return flutter_ok and not any(row["failed"] for row in rows)
+
+def fleet_main(argv=None):
+    """Entry point for `castar-tools fleet`"""
+    from castar_tools import profiling
+
+    parser = argparse.ArgumentParser(prog="castar-tools fleet",
+                                     description="Run the non-build checks across many project checkouts")
+    add_fleet_arguments(parser)
+    profiling.add_profile_argument(parser)
+    args = parser.parse_args(argv)
+    with profiling.profile_session(args.profile, "fleet"):
+        return run_fleet(args)
+
+def main(argv=None):
+    """Main debug function"""
+    from castar_tools import profiling, report_history
+
+    parser = argparse.ArgumentParser(description="CastarSDK Flutter App Debug Tool")
+    parser.add_argument("--refresh-doctor", action="store_true",
+                        help="Rerun flutter doctor even if the cached result is still valid")
+    paths.add_root_argument(parser)
+    subparsers = parser.add_subparsers(dest="command")
+    history_parser = subparsers.add_parser("history", help="Query the debug report history")
+    report_history.add_arguments(history_parser)
+    fleet_parser = subparsers.add_parser("fleet", help="Run the non-build checks across many projects")
+    add_fleet_arguments(fleet_parser)
+    args = parser.parse_args(argv)
+    paths.apply_root(args)
+    
+    with profiling.profile_session(args.profile, "debug_app"):
+        if args.command == "history":
+            return report_history.run_query(args)
+        if args.command == "fleet":
+            return run_fleet(args)
+        
+        run_checks(refresh_doctor=args.refresh_doctor)
+    return True
+
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    success = main()
+    sys.exit(0 if success else 1) 
\ No newline at end of file
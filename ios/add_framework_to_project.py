@@ -4,48 +4,28 @@ Script to programmatically add CastarSDK.framework to Xcode project
 This fixes the "No such module 'CastarSDK'" error in CI builds
 """
 
-import os
 import re
+import sys
 import uuid
+import argparse
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from castar_tools import fileutil, paths, profiling
+
 def generate_uuid():
     """Generate a UUID for Xcode project references"""
     return str(uuid.uuid4()).upper()
 
-def add_framework_to_project():
-    """Add CastarSDK.framework to the Xcode project file"""
-    
-    print("🔧 Adding CastarSDK.framework to Xcode project...")
-    
-    # Paths - since we're running from ios directory
-    project_file = Path("Runner.xcodeproj") / "project.pbxproj"
-    framework_path = Path("Frameworks") / "CastarSDK.framework"
-    
-    # Check if files exist
-    if not project_file.exists():
-        print(f"❌ Project file not found: {project_file}")
-        return False
-    
-    if not framework_path.exists():
-        print(f"❌ Framework not found: {framework_path}")
-        return False
-    
-    print(f"✅ Found project file: {project_file}")
-    print(f"✅ Found framework: {framework_path}")
-    
-    # Read project file
-    with open(project_file, 'r') as f:
-        content = f.read()
-    
+class ProjectEditError(Exception):
+    pass
+
+def insert_framework_reference(content, framework_uuid, build_file_uuid):
+    """Return content with CastarSDK.framework added, or None if it's already there"""
     # Check if framework is already added
     if "CastarSDK.framework" in content:
-        print("✅ Framework already in project file")
-        return True
-    
-    # Generate UUIDs for the framework reference
-    framework_uuid = generate_uuid()
-    build_file_uuid = generate_uuid()
+        return None
     
     # Create framework reference entry
     framework_ref = f'''		{framework_uuid} /* CastarSDK.framework */ = {{
@@ -68,8 +48,7 @@ def add_framework_to_project():
     match = re.search(file_ref_pattern, content, re.DOTALL)
     
     if not match:
-        print("❌ Could not find PBXFileReference section")
-        return False
+        raise ProjectEditError("Could not find PBXFileReference section")
     
     # Insert framework reference before the end of PBXFileReference section
     file_ref_section = match.group(1)
@@ -83,8 +62,7 @@ def add_framework_to_project():
     build_match = re.search(build_file_pattern, content, re.DOTALL)
     
     if not build_match:
-        print("❌ Could not find PBXBuildFile section")
-        return False
+        raise ProjectEditError("Could not find PBXBuildFile section")
     
     # Insert build file reference
     build_file_section = build_match.group(1)
@@ -98,8 +76,7 @@ def add_framework_to_project():
     group_match = re.search(group_pattern, content, re.DOTALL)
     
     if not group_match:
-        print("❌ Could not find PBXGroup section")
-        return False
+        raise ProjectEditError("Could not find PBXGroup section")
     
     # Add framework to the main group
     group_section = group_match.group(1)
@@ -107,40 +84,32 @@ def add_framework_to_project():
     main_group_pattern = r'(\t\t[A-F0-9]{24} /\* Runner \*/ = \{.*?\n\t\t\};)'
     main_group_match = re.search(main_group_pattern, group_section, re.DOTALL)
     
-    if main_group_match:
-        main_group = main_group_match.group(1)
-        # Add framework reference to the children list
-        if "children = (" in main_group:
-            new_main_group = main_group.replace(
-                "children = (",
-                f"children = (\n\t\t\t\t{framework_uuid} /* CastarSDK.framework */,"
-            )
-            new_group_section = group_section.replace(main_group, new_main_group)
-        else:
-            print("❌ Could not find children list in main group")
-            return False
-    else:
-        print("❌ Could not find main group")
-        return False
+    if not main_group_match:
+        raise ProjectEditError("Could not find main group")
+    main_group = main_group_match.group(1)
+    # Add framework reference to the children list
+    if "children = (" not in main_group:
+        raise ProjectEditError("Could not find children list in main group")
+    new_main_group = main_group.replace(
+        "children = (",
+        f"children = (\n\t\t\t\t{framework_uuid} /* CastarSDK.framework */,"
+    )
+    new_group_section = group_section.replace(main_group, new_main_group)
     
     # Find the target's frameworks build phase
     frameworks_phase_pattern = r'(/\* Frameworks \*/ = \{.*?\n\t\t\};)'
     frameworks_match = re.search(frameworks_phase_pattern, content, re.DOTALL)
     
-    if frameworks_match:
-        frameworks_phase = frameworks_match.group(1)
-        # Add framework to the files list
-        if "files = (" in frameworks_phase:
-            new_frameworks_phase = frameworks_phase.replace(
-                "files = (",
-                f"files = (\n\t\t\t\t{build_file_uuid} /* CastarSDK.framework in Frameworks */,"
-            )
-        else:
-            print("❌ Could not find files list in frameworks phase")
-            return False
-    else:
-        print("❌ Could not find frameworks build phase")
-        return False
+    if not frameworks_match:
+        raise ProjectEditError("Could not find frameworks build phase")
+    frameworks_phase = frameworks_match.group(1)
+    # Add framework to the files list
+    if "files = (" not in frameworks_phase:
+        raise ProjectEditError("Could not find files list in frameworks phase")
+    new_frameworks_phase = frameworks_phase.replace(
+        "files = (",
+        f"files = (\n\t\t\t\t{build_file_uuid} /* CastarSDK.framework in Frameworks */,"
+    )
     
     # Apply all changes
     new_content = content
@@ -148,10 +117,47 @@ def add_framework_to_project():
     new_content = new_content.replace(build_file_section, new_build_file_section)
     new_content = new_content.replace(group_section, new_group_section)
     new_content = new_content.replace(frameworks_phase, new_frameworks_phase)
+    return new_content
+
+@profiling.traced()
+def add_framework_to_project():
+    """Add CastarSDK.framework to the Xcode project file"""
+    
+    print("🔧 Adding CastarSDK.framework to Xcode project...")
     
-    # Write updated project file
-    with open(project_file, 'w') as f:
-        f.write(new_content)
+    # Paths
+    project_file = paths.pbxproj_path()
+    framework_path = paths.framework_dir()
+    
+    # Check if files exist
+    if not project_file.exists():
+        print(f"❌ Project file not found: {project_file}")
+        return False
+    
+    if not framework_path.exists():
+        print(f"❌ Framework not found: {framework_path}")
+        return False
+    
+    print(f"✅ Found project file: {project_file}")
+    print(f"✅ Found framework: {framework_path}")
+    
+    # Generate UUIDs for the framework reference
+    framework_uuid = generate_uuid()
+    build_file_uuid = generate_uuid()
+    
+    # Read, edit and commit under the project lock; re-applied if another
+    # job changes project.pbxproj in between
+    try:
+        with profiling.span("edit project.pbxproj", "io"):
+            written = fileutil.edit_file(
+                project_file, lambda content: insert_framework_reference(content, framework_uuid, build_file_uuid))
+    except (ProjectEditError, fileutil.LockTimeout) as e:
+        print(f"❌ {e}")
+        return False
+    
+    if not written:
+        print("✅ Framework already in project file")
+        return True
     
     print("✅ Successfully added CastarSDK.framework to Xcode project")
     print("📝 Framework UUID:", framework_uuid)
@@ -159,24 +165,15 @@ def add_framework_to_project():
     
     return True
 
-def add_framework_search_path():
-    """Add framework search path to build settings"""
-    
-    print("🔧 Adding framework search path...")
-    
-    project_file = Path("Runner.xcodeproj/project.pbxproj")
-    
-    with open(project_file, 'r') as f:
-        content = f.read()
-    
+def add_search_path_to_configs(content, notes):
+    """Return content with "$(SRCROOT)/Frameworks" in every Debug/Release config, or None"""
     # Look for build configuration sections
     # We need to find the build settings for both Debug and Release configurations
     build_config_pattern = r'(/\* Begin XCBuildConfiguration section \*/.*?/\* End XCBuildConfiguration section \*/)'
     build_config_match = re.search(build_config_pattern, content, re.DOTALL)
     
     if not build_config_match:
-        print("❌ Could not find build configuration section")
-        return False
+        raise ProjectEditError("Could not find build configuration section")
     
     build_config_section = build_config_match.group(1)
     
@@ -189,7 +186,7 @@ def add_framework_search_path():
     for config_block in config_blocks:
         # Check if this is a build configuration (not a project configuration)
         if "buildSettings = {" in config_block and ("Debug" in config_block or "Release" in config_block):
-            print(f"🔧 Processing build configuration: {config_block.split('/*')[1].split('*/')[0].strip()}")
+            notes.append(f"🔧 Processing build configuration: {config_block.split('/*')[1].split('*/')[0].strip()}")
             
             # Check if FRAMEWORK_SEARCH_PATHS already exists
             if "FRAMEWORK_SEARCH_PATHS" in config_block:
@@ -204,7 +201,7 @@ def add_framework_search_path():
                     )
                     new_content = new_content.replace(config_block, new_config_block)
                     modified = True
-                    print(f"✅ Added framework search path to existing configuration")
+                    notes.append("✅ Added framework search path to existing configuration")
             else:
                 # Add new FRAMEWORK_SEARCH_PATHS
                 new_config_block = config_block.replace(
@@ -214,11 +211,35 @@ def add_framework_search_path():
                 )
                 new_content = new_content.replace(config_block, new_config_block)
                 modified = True
-                print(f"✅ Added new framework search path configuration")
+                notes.append("✅ Added new framework search path configuration")
+    
+    return new_content if modified else None
+
+@profiling.traced()
+def add_framework_search_path():
+    """Add framework search path to build settings"""
+    
+    print("🔧 Adding framework search path...")
+    
+    project_file = paths.pbxproj_path()
+    notes = []
+    
+    def edit(content):
+        # Only report the attempt that gets committed
+        notes.clear()
+        return add_search_path_to_configs(content, notes)
+    
+    try:
+        with profiling.span("edit project.pbxproj", "io"):
+            modified = fileutil.edit_file(project_file, edit)
+    except (ProjectEditError, fileutil.LockTimeout) as e:
+        print(f"❌ {e}")
+        return False
+    
+    for note in notes:
+        print(note)
     
     if modified:
-        with open(project_file, 'w') as f:
-            f.write(new_content)
         print("✅ Successfully updated framework search paths in build settings")
         return True
     else:
@@ -226,14 +247,21 @@ def add_framework_search_path():
         print("📋 Framework search paths may need manual configuration")
         return True
 
-def main():
+def main(argv=None):
     """Main function"""
+    parser = argparse.ArgumentParser(description="CastarSDK Framework Integration Script")
+    paths.add_root_argument(parser)
+    args = parser.parse_args(argv)
+    paths.apply_root(args)
+    
     print("🚀 CastarSDK Framework Integration Script")
     print("=" * 50)
     
-    success = add_framework_to_project()
+    with profiling.profile_session(args.profile, "add_framework_to_project"):
+        success = add_framework_to_project()
+        if success:
+            add_framework_search_path()
     if success:
-        add_framework_search_path()
         print("\n✅ Framework integration complete!")
         print("📱 You can now build the project with: flutter build ios --release --no-codesign")
     else:
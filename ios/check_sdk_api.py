@@ -3,35 +3,41 @@
 Script to check CastarSDK API and find the correct method names
 """
 
-import os
+import sys
+import argparse
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from castar_tools import framework_snapshot, paths, profiling
+
+@profiling.traced()
 def check_sdk_api():
     """Check the CastarSDK framework headers for available methods"""
     
     print("🔍 Checking CastarSDK API...")
     
     # Paths
-    headers_dir = Path("Frameworks/CastarSDK.framework/Headers")
+    headers_dir = paths.headers_dir()
+    snapshot = framework_snapshot.get_snapshot()
     
-    if not headers_dir.exists():
+    if not snapshot.has_headers:
         print(f"❌ Headers directory not found: {headers_dir}")
         return False
     
     print(f"✅ Found headers directory: {headers_dir}")
     
     # List header files
-    header_files = list(headers_dir.glob("*.h"))
-    print(f"📁 Header files found: {[f.name for f in header_files]}")
+    header_names = snapshot.header_names
+    print(f"📁 Header files found: {header_names}")
     
     # Check each header file
-    for header_file in header_files:
-        print(f"\n📄 Analyzing {header_file.name}:")
+    for header_name in header_names:
+        print(f"\n📄 Analyzing {header_name}:")
         print("=" * 50)
         
         try:
-            with open(header_file, 'r') as f:
-                content = f.read()
+            content = snapshot.headers[header_name]
             
             # Look for method declarations
             lines = content.split('\n')
@@ -43,16 +49,22 @@ def check_sdk_api():
                         print(f"Line {i+1}: {line}")
                         
         except Exception as e:
-            print(f"❌ Error reading {header_file}: {e}")
+            print(f"❌ Error reading {header_name}: {e}")
     
     return True
 
-def main():
+def main(argv=None):
     """Main function"""
+    parser = argparse.ArgumentParser(description="CastarSDK API Checker")
+    paths.add_root_argument(parser)
+    args = parser.parse_args(argv)
+    paths.apply_root(args)
+    
     print("🚀 CastarSDK API Checker")
     print("=" * 50)
     
-    success = check_sdk_api()
+    with profiling.profile_session(args.profile, "check_sdk_api"):
+        success = check_sdk_api()
     if success:
         print("\n✅ API check complete!")
     else:
@@ -3,38 +3,44 @@
 Script to debug and examine CastarSDK header files
 """
 
-import os
+import sys
+import argparse
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from castar_tools import framework_snapshot, paths, profiling
+
+@profiling.traced()
 def debug_headers():
     """Debug and examine CastarSDK header files"""
     
     print("🔍 Debugging CastarSDK header files...")
     
     # Paths
-    headers_dir = Path("Frameworks/CastarSDK.framework/Headers")
+    headers_dir = paths.headers_dir()
+    snapshot = framework_snapshot.get_snapshot()
     
-    if not headers_dir.exists():
+    if not snapshot.has_headers:
         print(f"❌ Headers directory not found: {headers_dir}")
         return False
     
     print(f"✅ Found headers directory: {headers_dir}")
     
     # List all header files
-    header_files = list(headers_dir.glob("*.h"))
-    print(f"📁 Header files found: {[f.name for f in header_files]}")
+    header_names = snapshot.header_names
+    print(f"📁 Header files found: {header_names}")
     
     # Examine each header file
-    for header_file in header_files:
-        print(f"\n📄 Examining {header_file.name}:")
+    for header_name in header_names:
+        print(f"\n📄 Examining {header_name}:")
         print("=" * 60)
         
         try:
-            with open(header_file, 'r') as f:
-                content = f.read()
+            content = snapshot.headers[header_name]
             
             print(f"File size: {len(content)} characters")
-            print(f"First 500 characters:")
+            print("First 500 characters:")
             print("-" * 40)
             print(content[:500])
             print("-" * 40)
@@ -54,12 +60,12 @@ def debug_headers():
                     class_lines.append(f"Line {i+1}: {line}")
             
             if interface_lines:
-                print(f"\n🔍 @interface declarations found:")
+                print("\n🔍 @interface declarations found:")
                 for line in interface_lines:
                     print(f"  {line}")
             
             if class_lines:
-                print(f"\n🔍 Class declarations found:")
+                print("\n🔍 Class declarations found:")
                 for line in class_lines:
                     print(f"  {line}")
             
@@ -72,7 +78,7 @@ def debug_headers():
                         method_lines.append(f"Line {i+1}: {line}")
             
             if method_lines:
-                print(f"\n🔍 Method declarations found:")
+                print("\n🔍 Method declarations found:")
                 for line in method_lines[:10]:  # Show first 10 methods
                     print(f"  {line}")
                 if len(method_lines) > 10:
@@ -86,21 +92,27 @@ def debug_headers():
                     import_lines.append(f"Line {i+1}: {line}")
             
             if import_lines:
-                print(f"\n🔍 Import statements found:")
+                print("\n🔍 Import statements found:")
                 for line in import_lines:
                     print(f"  {line}")
             
         except Exception as e:
-            print(f"❌ Error reading {header_file}: {e}")
+            print(f"❌ Error reading {header_name}: {e}")
     
     return True
 
-def main():
+def main(argv=None):
     """Main function"""
+    parser = argparse.ArgumentParser(description="CastarSDK Header Debugger")
+    paths.add_root_argument(parser)
+    args = parser.parse_args(argv)
+    paths.apply_root(args)
+    
     print("🚀 CastarSDK Header Debugger")
     print("=" * 50)
     
-    success = debug_headers()
+    with profiling.profile_session(args.profile, "debug_headers"):
+        success = debug_headers()
     if success:
         print("\n✅ Header debugging complete!")
     else:
@@ -3,21 +3,27 @@
 Script to check and fix CastarSDK framework configuration for Swift compatibility
 """
 
-import os
-import re
+import sys
+import argparse
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from castar_tools import fileutil, framework_snapshot, paths, profiling
+
+@profiling.traced()
 def check_and_fix_framework():
     """Check and fix CastarSDK framework for Swift compatibility"""
     
     print("🔧 Checking CastarSDK framework for Swift compatibility...")
     
     # Paths
-    framework_dir = Path("Frameworks/CastarSDK.framework")
+    framework_dir = paths.framework_dir()
     headers_dir = framework_dir / "Headers"
     modules_dir = framework_dir / "Modules"
+    snapshot = framework_snapshot.get_snapshot()
     
-    if not framework_dir.exists():
+    if not snapshot.exists:
         print(f"❌ Framework directory not found: {framework_dir}")
         return False
     
@@ -25,22 +31,33 @@ def check_and_fix_framework():
     
     # 1. Check umbrella header (CastarSDK.h)
     umbrella_header = headers_dir / "CastarSDK.h"
-    if umbrella_header.exists():
+    if "CastarSDK.h" in snapshot.headers:
         print(f"📄 Checking umbrella header: {umbrella_header}")
-        with open(umbrella_header, 'r') as f:
-            content = f.read()
+        content = snapshot.headers["CastarSDK.h"]
         
         # Check if CSDK.h is imported
         if '#import "CSDK.h"' not in content and '#import <CastarSDK/CSDK.h>' not in content:
             print("⚠️ CSDK.h not imported in umbrella header")
             print("🔧 Adding CSDK.h import to umbrella header...")
             
-            # Add import at the end of the file
-            new_content = content.rstrip() + '\n\n#import "CSDK.h"\n'
+            # Add import at the end of the file. Re-checked against the
+            # current file under its lock, since another job may have fixed it
+            def add_import(current):
+                if current is None or '#import "CSDK.h"' in current or '#import <CastarSDK/CSDK.h>' in current:
+                    return None
+                return current.rstrip() + '\n\n#import "CSDK.h"\n'
             
-            with open(umbrella_header, 'w') as f:
-                f.write(new_content)
-            print("✅ Added CSDK.h import to umbrella header")
+            try:
+                with profiling.span(f"write {umbrella_header.name}", "io"):
+                    written = fileutil.edit_file(umbrella_header, add_import)
+            except fileutil.LockTimeout as e:
+                print(f"❌ {e}")
+                return False
+            if written:
+                framework_snapshot.invalidate()
+                print("✅ Added CSDK.h import to umbrella header")
+            else:
+                print("✅ CSDK.h import already added by another job")
         else:
             print("✅ CSDK.h already imported in umbrella header")
     else:
@@ -49,10 +66,9 @@ def check_and_fix_framework():
     
     # 2. Check module map
     module_map = modules_dir / "module.modulemap"
-    if module_map.exists():
+    if snapshot.modulemap is not None:
         print(f"📄 Checking module map: {module_map}")
-        with open(module_map, 'r') as f:
-            content = f.read()
+        content = snapshot.modulemap
         
         # Check if it's properly configured
         if 'umbrella header "CastarSDK.h"' not in content:
@@ -65,9 +81,22 @@ def check_and_fix_framework():
     module * { export * }
 }'''
             
-            with open(module_map, 'w') as f:
-                f.write(new_content)
-            print("✅ Fixed module map")
+            def fix_module_map(current):
+                if current is not None and 'umbrella header "CastarSDK.h"' in current:
+                    return None
+                return new_content
+            
+            try:
+                with profiling.span(f"write {module_map.name}", "io"):
+                    written = fileutil.edit_file(module_map, fix_module_map)
+            except fileutil.LockTimeout as e:
+                print(f"❌ {e}")
+                return False
+            if written:
+                framework_snapshot.invalidate()
+                print("✅ Fixed module map")
+            else:
+                print("✅ Module map already fixed by another job")
         else:
             print("✅ Module map properly configured")
     else:
@@ -76,10 +105,9 @@ def check_and_fix_framework():
     
     # 3. Check CSDK.h header
     csdk_header = headers_dir / "CSDK.h"
-    if csdk_header.exists():
+    if "CSDK.h" in snapshot.headers:
         print(f"📄 Checking CSDK.h header: {csdk_header}")
-        with open(csdk_header, 'r') as f:
-            content = f.read()
+        content = snapshot.headers["CSDK.h"]
         
         # Check if Castar class is properly declared (the class is named Castar, not CSDK)
         if '@interface Castar' in content:
@@ -100,25 +128,22 @@ def check_and_fix_framework():
     
     # 4. Check Info.plist for framework configuration
     info_plist = framework_dir / "Info.plist"
-    if info_plist.exists():
+    if snapshot.info_plist is not None:
         print(f"📄 Framework Info.plist exists: {info_plist}")
     else:
         print(f"⚠️ Framework Info.plist not found: {info_plist}")
     
     # 5. Check if framework is dynamic
     binary_path = framework_dir / "CastarSDK"
-    if binary_path.exists():
+    if snapshot.binary.exists:
         print(f"✅ Framework binary exists: {binary_path}")
         
-        # Check if it's a dynamic library
-        try:
-            import subprocess
-            result = subprocess.run(['file', str(binary_path)], capture_output=True, text=True)
-            if 'dynamically linked' in result.stdout:
-                print("✅ Framework is dynamic library")
-            else:
-                print("⚠️ Framework may not be dynamic library")
-        except:
+        # Check if it's a dynamic library (from the Mach-O header, no `file` call)
+        if snapshot.binary.is_dynamic:
+            print(f"✅ Framework is dynamic library ({', '.join(snapshot.binary.archs)})")
+        elif snapshot.binary.kind:
+            print(f"⚠️ Framework may not be dynamic library (binary type: {snapshot.binary.kind})")
+        else:
             print("⚠️ Could not check framework binary type")
     else:
         print(f"❌ Framework binary not found: {binary_path}")
@@ -126,12 +151,13 @@ def check_and_fix_framework():
     
     return True
 
+@profiling.traced()
 def create_swift_bridge_header():
     """Create a Swift bridging header if needed"""
     
     print("\n🔧 Creating Swift bridging header...")
     
-    bridge_header = Path("Runner/Runner-Bridging-Header.h")
+    bridge_header = paths.runner_dir() / "Runner-Bridging-Header.h"
     
     if not bridge_header.exists():
         bridge_content = '''//
@@ -149,22 +175,36 @@ def create_swift_bridge_header():
 #endif /* Runner_Bridging_Header_h */
 '''
         
-        with open(bridge_header, 'w') as f:
-            f.write(bridge_content)
-        print(f"✅ Created bridging header: {bridge_header}")
+        # Only create it if no other job did in the meantime
+        try:
+            written = fileutil.edit_file(bridge_header, lambda current: bridge_content if current is None else None)
+        except fileutil.LockTimeout as e:
+            print(f"❌ {e}")
+            return False
+        if written:
+            print(f"✅ Created bridging header: {bridge_header}")
+        else:
+            print(f"✅ Bridging header already created by another job: {bridge_header}")
     else:
         print(f"✅ Bridging header already exists: {bridge_header}")
     
     return True
 
-def main():
+def main(argv=None):
     """Main function"""
+    parser = argparse.ArgumentParser(description="CastarSDK Framework Swift Compatibility Fixer")
+    paths.add_root_argument(parser)
+    args = parser.parse_args(argv)
+    paths.apply_root(args)
+    
     print("🚀 CastarSDK Framework Swift Compatibility Fixer")
     print("=" * 60)
     
-    success = check_and_fix_framework()
+    with profiling.profile_session(args.profile, "fix_framework_swift"):
+        success = check_and_fix_framework()
+        if success:
+            create_swift_bridge_header()
     if success:
-        create_swift_bridge_header()
         print("\n✅ Framework Swift compatibility check and fix complete!")
         print("📱 The framework should now be accessible from Swift")
     else:
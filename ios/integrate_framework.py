@@ -6,24 +6,38 @@ This ensures the framework is properly linked for both local and CI builds
 
 import os
 import sys
-import plistlib
-import subprocess
+import argparse
 from pathlib import Path
 
-def main():
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from castar_tools import fileutil, framework_snapshot, paths, profiling
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Integrate CastarSDK.framework into the Xcode project")
+    paths.add_root_argument(parser)
+    args = parser.parse_args(argv)
+    paths.apply_root(args)
+    
+    with profiling.profile_session(args.profile, "integrate_framework"):
+        return integrate_framework()
+
+@profiling.traced()
+def integrate_framework():
+    """Check the framework and its Xcode project reference"""
     print("🔧 Integrating CastarSDK.framework into Xcode project...")
     
     # Paths
-    ios_dir = Path("ios")
-    framework_path = ios_dir / "Frameworks" / "CastarSDK.framework"
-    project_path = ios_dir / "Runner.xcodeproj"
+    framework_path = paths.framework_dir()
+    project_path = paths.xcode_project_dir()
     
-    # Check if framework exists
-    if not framework_path.exists():
+    # Check if framework exists (shared snapshot, reused by later steps)
+    snapshot = framework_snapshot.get_snapshot()
+    if not snapshot.exists:
         print(f"❌ Framework not found at: {framework_path}")
         return False
     
-    print(f"✅ Found framework at: {framework_path}")
+    print(f"✅ Found framework at: {framework_path} ({len(snapshot.files)} files)")
     
     # Create a temporary solution: Add framework to project.pbxproj
     pbxproj_path = project_path / "project.pbxproj"
@@ -35,8 +49,9 @@ def main():
     print("📝 Updating Xcode project configuration...")
     
     # Read the project file
-    with open(pbxproj_path, 'r') as f:
-        content = f.read()
+    with profiling.span("read project.pbxproj", "io"):
+        with open(pbxproj_path, 'r') as f:
+            content = f.read()
     
     # Add framework reference if not already present
     framework_ref = "CastarSDK.framework"
@@ -61,10 +76,9 @@ def main():
     print("✅ Framework reference found in project file")
     
     # Create a build script that will handle the framework integration
-    create_build_script()
-    
-    return True
+    return create_build_script()
 
+@profiling.traced()
 def create_build_script():
     """Create a build script that handles framework integration"""
     
@@ -93,14 +107,24 @@ ls -la ios/Frameworks/CastarSDK.framework/
 echo "✅ Framework integration script ready"
 '''
     
-    script_path = Path("ios/setup_framework.sh")
-    with open(script_path, 'w') as f:
-        f.write(script_content)
+    script_path = paths.ios_dir() / "setup_framework.sh"
+    # Parallel jobs regenerate the same script; write it under its lock
+    # and leave an up-to-date copy alone
+    try:
+        with profiling.span("write setup_framework.sh", "io"):
+            written = fileutil.edit_file(script_path, lambda _: script_content, mode=0o755)
+    except fileutil.LockTimeout as e:
+        print(f"❌ {e}")
+        return False
     
     # Make script executable
     os.chmod(script_path, 0o755)
     
-    print(f"✅ Created setup script: {script_path}")
+    if written:
+        print(f"✅ Created setup script: {script_path}")
+    else:
+        print(f"✅ Setup script up to date: {script_path}")
+    return True
 
 if __name__ == "__main__":
     success = main()
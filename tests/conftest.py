@@ -0,0 +1,30 @@
+"""
+Shared fixtures for the castar-tools tests
+
+The tools import each other the way the launchers set them up: the
+castar_tools package and debug_app.py from the checkout root, the
+scripts under ios/ by module name.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+for search_path in (str(ROOT), str(ROOT / "ios")):
+    if search_path not in sys.path:
+        sys.path.insert(0, search_path)
+
+from castar_tools import paths
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    """An empty Flutter project pinned as the project root"""
+    root = tmp_path / "project"
+    (root / "ios" / "Runner").mkdir(parents=True)
+    (root / "lib").mkdir()
+    (root / "pubspec.yaml").write_text("name: castar_test\n")
+    monkeypatch.setattr(paths, "_project_root", None)
+    paths.set_project_root(root)
+    return root
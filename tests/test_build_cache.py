@@ -0,0 +1,86 @@
+import os
+import shutil
+import stat
+import tempfile
+import traceback
+from pathlib import Path
+
+import pytest
+
+from castar_tools import build_cache
+
+NOBODY = 65534
+
+def make_tree(root, files, size=4096, mtime=None):
+    root.mkdir(parents=True, exist_ok=True)
+    for index in range(files):
+        path = root / f"file{index}"
+        path.write_bytes(b"x" * size)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+
+def test_project_units_keep_tool_state_and_debug_info(tmp_path):
+    project = tmp_path / "app"
+    for kind in ("build/ios", "build/debug-info", ".dart_tool/flutter_build", ".dart_tool/castar_tools"):
+        make_tree(project / kind, 2)
+    kinds = {unit.kind for unit in build_cache.project_units(str(project))}
+    assert kinds == {"build/ios", ".dart_tool/flutter_build"}
+
+def test_prune_is_least_recently_used_first(tmp_path):
+    project = tmp_path / "app"
+    make_tree(project / "build" / "old", 4, mtime=1_000_000)
+    make_tree(project / "build" / "new", 4, mtime=2_000_000)
+    make_tree(project / "build" / "empty", 0)
+    units = build_cache.scan_units(build_cache.project_units(str(project)), workers=4)
+    sizes = {unit.kind: unit.size for unit in units}
+    victims, remaining = build_cache.plan_prune(units, sizes["build/new"])
+    assert [unit.kind for unit in victims] == ["build/old"]
+    assert remaining == sizes["build/new"]
+
+def delete_read_only_products(base):
+    product = base / "DerivedData" / "Runner-abc" / "Build" / "Products"
+    app = product / "Debug-iphoneos" / "Runner.app"
+    make_tree(app, 3)
+    make_tree(app / "_CodeSignature", 2)
+    for path in app.iterdir():
+        if path.is_file():
+            path.chmod(stat.S_IREAD)
+    # One directory that can't even be listed, one that can't be written
+    (app / "_CodeSignature").chmod(0)
+    app.chmod(stat.S_IREAD | stat.S_IEXEC)
+    units = build_cache.derived_data_units(str(base / "DerivedData"))
+    assert [(unit.project, unit.kind) for unit in units] == [("Runner", "Build/Products")]
+    assert build_cache.delete_units(units) == []
+    assert not product.exists()
+
+@pytest.mark.skipif(not hasattr(os, "geteuid"), reason="POSIX permissions")
+def test_delete_read_only_products(tmp_path):
+    if os.geteuid() != 0:
+        delete_read_only_products(tmp_path)
+        return
+    # Root ignores permission bits, so run the deletion as nobody
+    base = Path(tempfile.mkdtemp(prefix="castar-readonly-"))
+    try:
+        os.chown(base, NOBODY, NOBODY)
+        pid = os.fork()
+        if pid == 0:
+            status = 1
+            try:
+                os.setgid(NOBODY)
+                os.setuid(NOBODY)
+                delete_read_only_products(base)
+                status = 0
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                os._exit(status)
+        _, status = os.waitpid(pid, 0)
+        assert os.waitstatus_to_exitcode(status) == 0
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+def test_parse_and_format_size():
+    assert build_cache.parse_size("20G") == 20 * 1024 ** 3
+    assert build_cache.parse_size("1.5tb") == int(1.5 * 1024 ** 4)
+    assert build_cache.parse_size("4096") == 4096
+    assert build_cache.format_size(1536) == "1.5K"
@@ -0,0 +1,108 @@
+from castar_tools import channel_contract
+
+DART = '''
+import 'package:flutter/services.dart';
+
+class CastarBridge {
+  static const platform = MethodChannel('com.castarsdk.flutter/castar');
+
+  // platform.invokeMethod('commentedOut') must not count
+  Future<void> start(String key) async {
+    await platform.invokeMethod('startCastarSdk', {'clientId': key, 'debug': true});
+  }
+
+  Future<void> stop() => platform.invokeMethod('stopCastarSdk');
+
+  Future<String?> status() => platform.invokeMethod<String>("getCastarStatus", const {"verbose": false});
+
+  Future<void> typo() => platform.invokeMethod('getCastarStats');
+}
+'''
+
+SWIFT = '''
+import Flutter
+import CastarSDK
+
+@objc class AppDelegate: FlutterAppDelegate {
+  override func application(_ application: UIApplication,
+                            didFinishLaunchingWithOptions launchOptions: [UIApplication.LaunchOptionsKey: Any]?) -> Bool {
+    let controller = window?.rootViewController as! FlutterViewController
+    let channel = FlutterMethodChannel(name: "com.castarsdk.flutter/castar",
+                                       binaryMessenger: controller.binaryMessenger)
+    channel.setMethodCallHandler { call, result in
+      switch call.method {
+      case "startCastarSdk":
+        self.start(call: call, result: result)
+      case "stopCastarSdk", "getCastarStatus":
+        result(nil)
+      case "unusedMethod":
+        result("case \\"fake\\": in a string")
+      default:
+        result(FlutterMethodNotImplemented)
+      }
+    }
+    return super.application(application, didFinishLaunchingWithOptions: launchOptions)
+  }
+
+  private func start(call: FlutterMethodCall, result: FlutterResult) {
+    let args = call.arguments as? [String: Any]
+    guard let key = args?["clientKey"] as? String else {
+      result(FlutterError(code: "ARGS", message: "missing clientKey", details: nil))
+      return
+    }
+    let debug = args?["debug"] as? Bool ?? false
+    Castar.start(key, debug: debug)
+    result(true)
+  }
+}
+'''
+
+def messages(issues, severity):
+    return sorted(issue["message"] for issue in issues if issue["severity"] == severity)
+
+def write_project(project, dart=DART, swift=SWIFT):
+    (project / "lib" / "castar_bridge.dart").write_text(dart)
+    (project / "ios" / "Runner" / "AppDelegate.swift").write_text(swift)
+
+def test_dart_index_ignores_comments():
+    index = channel_contract.index_dart(DART)
+    assert [channel["name"] for channel in index["channels"]] == ["com.castarsdk.flutter/castar"]
+    calls = {call["method"]: call["keys"] for call in index["calls"]}
+    assert calls == {"startCastarSdk": ["clientId", "debug"], "stopCastarSdk": [],
+                     "getCastarStatus": ["verbose"], "getCastarStats": []}
+
+def test_swift_index_follows_handler_and_guard():
+    index = channel_contract.index_swift(SWIFT)
+    cases = {case["method"]: case["keys"] for case in index["cases"]}
+    assert set(cases) == {"startCastarSdk", "stopCastarSdk", "getCastarStatus", "unusedMethod"}
+    assert cases["startCastarSdk"] == {"clientKey": True, "debug": False}
+
+def test_contract_issues(project):
+    write_project(project)
+    ok, issues = channel_contract.run_check(project, verbose=False)
+    assert not ok
+    errors = messages(issues, "error")
+    assert any("'getCastarStats'" in message and "not handled" in message for message in errors)
+    assert any("requires argument 'clientKey'" in message for message in errors)
+    warnings = messages(issues, "warning")
+    assert any("sends argument 'clientId'" in message for message in warnings)
+    assert any("'unusedMethod'" in message for message in warnings)
+    assert not any("'debug'" in message for message in errors + warnings)
+
+def test_missing_channel_on_ios(project):
+    write_project(project, swift="import Flutter\n")
+    ok, issues = channel_contract.run_check(project, verbose=False)
+    assert not ok
+    assert any("has no FlutterMethodChannel" in message for message in messages(issues, "error"))
+
+def test_index_cache_reuses_and_reparses(project):
+    write_project(project)
+    _, stats = channel_contract.build_index(project)
+    assert stats["parsed"] == 2
+    _, stats = channel_contract.build_index(project)
+    assert (stats["reused"], stats["parsed"]) == (2, 0)
+    fixed = DART.replace("'clientId'", "'clientKey'").replace("getCastarStats", "getCastarStatus")
+    (project / "lib" / "castar_bridge.dart").write_text(fixed)
+    files, stats = channel_contract.build_index(project)
+    assert stats["parsed"] == 1
+    assert not messages(channel_contract.check_contract(files), "error")
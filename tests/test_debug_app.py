@@ -0,0 +1,65 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+import debug_app
+from castar_tools import report_history
+from conftest import ROOT
+
+@pytest.fixture
+def stub_checks(monkeypatch):
+    """Stub the environment checks; returns the dict of their outcomes"""
+    outcomes = {"flutter": True, "ios": True, "sdk": True, "channel": True, "build": True}
+
+    def flutter(context):
+        context["flutter_version"] = "Flutter 3.19.0"
+        return outcomes["flutter"]
+
+    monkeypatch.setattr(debug_app, "check_flutter_environment", flutter)
+    monkeypatch.setattr(debug_app, "check_ios_setup", lambda context: outcomes["ios"])
+    monkeypatch.setattr(debug_app, "check_castar_sdk", lambda: outcomes["sdk"])
+    monkeypatch.setattr(debug_app, "check_method_channel", lambda context: outcomes["channel"])
+    monkeypatch.setattr(debug_app, "build_and_test", lambda context: outcomes["build"])
+    monkeypatch.setattr(debug_app, "analyze_crash_logs", lambda: None)
+    return outcomes
+
+def test_skipped_build_is_not_a_build_failure(project, stub_checks, capsys):
+    debug_app.run_checks()
+    stub_checks["channel"] = False
+    debug_app.run_checks()
+
+    report = json.loads((project / "debug_report.json").read_text())
+    assert report["checks"]["build"] is None
+    assert report["build_status"] == "skipped"
+    assert "Build Test: ⏭️ skipped" in capsys.readouterr().out
+
+    conn = report_history.connect()
+    try:
+        last_pass, first_fail = report_history.first_failure(conn, "build")
+        assert last_pass is not None and first_fail is None
+        _, channel_fail = report_history.first_failure(conn, "channel")
+        assert channel_fail is not None
+        outcomes = [row[4] for row in report_history.recent(conn)]
+        assert outcomes == ["fail", "pass"]
+    finally:
+        conn.close()
+
+def test_failed_build_is_recorded(project, stub_checks):
+    stub_checks["build"] = False
+    debug_app.run_checks()
+    report = json.loads((project / "debug_report.json").read_text())
+    assert report["build_status"] == "failed"
+    conn = report_history.connect()
+    try:
+        assert report_history.first_failure(conn, "build")[1] is not None
+    finally:
+        conn.close()
+
+def test_import_does_not_load_check_modules():
+    # What a spawned fleet worker or `doctor --help` pays before any check runs
+    code = ("import sys, debug_app; print(' '.join(sorted(name for name in sys.modules "
+            "if name.startswith('castar_tools.'))))")
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert result.stdout.split() == ["castar_tools.paths"]
@@ -0,0 +1,113 @@
+import multiprocessing
+import os
+import stat
+
+from castar_tools import fileutil, framework_snapshot
+import fix_framework_swift
+
+WORKERS = 6
+APPENDS = 25
+
+def append_lines(path, worker, count):
+    for index in range(count):
+        fileutil.edit_file(path, lambda text: (text or "") + f"{worker}:{index}\n")
+
+def test_concurrent_edits_compose(tmp_path):
+    target = tmp_path / "project.pbxproj"
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=append_lines, args=(str(target), worker, APPENDS))
+               for worker in range(WORKERS)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join(60)
+    assert [process.exitcode for process in workers] == [0] * WORKERS
+    lines = target.read_text().splitlines()
+    assert sorted(lines) == sorted(f"{worker}:{index}" for worker in range(WORKERS)
+                                   for index in range(APPENDS))
+    # Each worker's own appends stay in order
+    for worker in range(WORKERS):
+        mine = [line for line in lines if line.startswith(f"{worker}:")]
+        assert mine == [f"{worker}:{index}" for index in range(APPENDS)]
+
+def test_stale_edit_is_reapplied_to_current_content(tmp_path):
+    target = tmp_path / "CastarSDK.h"
+    target.write_text("a\n")
+    calls = []
+
+    def edit(text):
+        calls.append(text)
+        if len(calls) == 1:
+            # Another writer commits between our read and our commit
+            fileutil.atomic_write_text(target, "a\nb\n")
+        return text + "c\n"
+
+    assert fileutil.edit_file(target, edit)
+    assert calls == ["a\n", "a\nb\n"]
+    assert target.read_text() == "a\nb\nc\n"
+
+def test_no_change_does_not_write(tmp_path):
+    target = tmp_path / "module.modulemap"
+    target.write_text("framework module CastarSDK {}\n")
+    before = target.stat().st_ino
+    assert not fileutil.edit_file(target, lambda text: None)
+    assert not fileutil.edit_file(target, lambda text: text)
+    assert target.stat().st_ino == before
+
+def test_write_keeps_mode_and_breaks_hardlinks(tmp_path):
+    cached = tmp_path / "cached.sh"
+    cached.write_text("old\n")
+    cached.chmod(0o755)
+    target = tmp_path / "script.sh"
+    os.link(cached, target)
+    assert fileutil.edit_file(target, lambda text: "new\n")
+    assert cached.read_text() == "old\n"
+    assert stat.S_IMODE(target.stat().st_mode) == 0o755
+    assert fileutil.edit_file(tmp_path / "created.sh", lambda text: "x\n", mode=0o700)
+    assert stat.S_IMODE((tmp_path / "created.sh").stat().st_mode) == 0o700
+
+def test_lock_files_survive_flutter_clean(project):
+    pbxproj = project / "ios" / "Runner.xcodeproj" / "project.pbxproj"
+    header = project / "ios" / "Frameworks" / "CastarSDK.framework" / "Headers" / "CastarSDK.h"
+    script = project / "ios" / "Runner" / "castar_setup.sh"
+    assert fileutil.lock_path_for(pbxproj) == \
+        project.resolve() / "ios" / ".Runner.xcodeproj_project.pbxproj.castar-lock"
+    assert fileutil.lock_path_for(header) == \
+        project.resolve() / "ios" / "Frameworks" / ".CastarSDK.framework_Headers_CastarSDK.h.castar-lock"
+    assert fileutil.lock_path_for(script) == \
+        project.resolve() / "ios" / "Runner" / ".castar_setup.sh.castar-lock"
+    for path in (pbxproj, header, script):
+        lock_path = fileutil.lock_path_for(path)
+        assert ".dart_tool" not in lock_path.parts and "build" not in lock_path.parts
+
+def test_lock_timeout(tmp_path, monkeypatch):
+    target = tmp_path / "project.pbxproj"
+    monkeypatch.setenv("CASTAR_TOOLS_LOCK_TIMEOUT", "0.2")
+    with fileutil.file_lock(target):
+        context = multiprocessing.get_context("spawn")
+        process = context.Process(target=append_lines, args=(str(target), 0, 1))
+        process.start()
+        process.join(30)
+    assert process.exitcode != 0
+    assert not target.exists()
+
+def test_fix_reports_edit_made_by_another_job(project, monkeypatch, capsys):
+    framework = project / "ios" / "Frameworks" / "CastarSDK.framework"
+    (framework / "Headers").mkdir(parents=True)
+    (framework / "Modules").mkdir()
+    (framework / "Headers" / "CastarSDK.h").write_text("// CastarSDK\n")
+    (framework / "Headers" / "CSDK.h").write_text("@interface Castar : NSObject\n@end\n")
+    (framework / "Modules" / "module.modulemap").write_text('framework module CastarSDK {\n    umbrella header "CastarSDK.h"\n}\n')
+    (framework / "CastarSDK").write_bytes(b"\0" * 64)
+    monkeypatch.setattr(framework_snapshot, "_current", None)
+    framework_snapshot.get_snapshot()
+    # Another job fixes the header after this one took its snapshot
+    (framework / "Headers" / "CastarSDK.h").write_text('// CastarSDK\n#import "CSDK.h"\n')
+    invalidated = []
+    monkeypatch.setattr(framework_snapshot, "invalidate", lambda: invalidated.append(True))
+    assert fix_framework_swift.check_and_fix_framework()
+    output = capsys.readouterr().out
+    assert "CSDK.h import already added by another job" in output
+    assert "Added CSDK.h import" not in output
+    assert invalidated == []
+    assert (framework / "Headers" / "CastarSDK.h").read_text() == '// CastarSDK\n#import "CSDK.h"\n'
@@ -0,0 +1,81 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ROOT
+
+# The launchers as `python <script>` runs them on macOS / Windows: workers
+# are spawned, not forked, so they re-import the launcher's __main__
+LAUNCH_WITH_SPAWN = """
+import multiprocessing, os, runpy, sys
+multiprocessing.set_start_method("spawn")
+sys.argv = sys.argv[1:]
+sys.path[0] = os.path.dirname(os.path.abspath(sys.argv[0]))
+runpy.run_path(sys.argv[0], run_name="__main__")
+"""
+
+FAKE_FLUTTER = """#!/bin/sh
+if [ "$1" = "--version" ]; then
+    echo "Flutter 3.19.0 • channel stable"
+    exit 0
+fi
+echo "[✓] Flutter (Channel stable, 3.19.0, on macOS)"
+echo "[✓] Xcode - develop for iOS and macOS (Xcode 15.2)"
+"""
+
+def make_project(root, with_framework):
+    (root / "ios" / "Runner").mkdir(parents=True)
+    (root / "lib").mkdir()
+    (root / "pubspec.yaml").write_text(f"name: {root.name}\n")
+    if with_framework:
+        framework = root / "ios" / "Frameworks" / "CastarSDK.framework"
+        (framework / "Headers").mkdir(parents=True)
+        (framework / "Modules").mkdir()
+        (framework / "Headers" / "CastarSDK.h").write_text('#import "CSDK.h"\n')
+        (framework / "Headers" / "CSDK.h").write_text("@interface Castar : NSObject\n@end\n")
+        (framework / "Modules" / "module.modulemap").write_text(
+            'framework module CastarSDK {\n    umbrella header "CastarSDK.h"\n}\n')
+        (framework / "CastarSDK").write_bytes(b"\0" * 64)
+    return root
+
+@pytest.fixture
+def fleet_env(tmp_path):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    flutter = bin_dir / "flutter"
+    flutter.write_text(FAKE_FLUTTER)
+    flutter.chmod(0o755)
+    env = dict(os.environ, PATH=f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}",
+               XDG_CACHE_HOME=str(tmp_path / "cache"))
+    return env
+
+@pytest.mark.parametrize("launcher, command", [
+    ("castar-tools", ["fleet"]),
+    ("debug_app.py", ["fleet"]),
+])
+def test_fleet_pool_under_spawn(tmp_path, fleet_env, launcher, command):
+    fleet = tmp_path / "fleet"
+    with_sdk = make_project(fleet / "app_with_sdk", with_framework=True)
+    without_sdk = make_project(fleet / "app_without_sdk", with_framework=False)
+    report_path = tmp_path / "fleet.json"
+    result = subprocess.run(
+        [sys.executable, "-c", LAUNCH_WITH_SPAWN, str(ROOT / launcher), *command,
+         "--discover", str(fleet), "--jobs", "2", "--json", str(report_path)],
+        capture_output=True, text=True, timeout=300, cwd=tmp_path, env=fleet_env)
+    assert "BrokenProcessPool" not in result.stderr and "worker crashed" not in result.stdout, \
+        result.stdout + result.stderr
+    report = json.loads(report_path.read_text())
+    assert report["flutter_ok"]
+    rows = {row["project"]: row for row in report["projects"]}
+    assert sorted(rows) == ["app_with_sdk", "app_without_sdk"]
+    for row in rows.values():
+        assert row["error"] == "" and set(row["checks"]) == {"ios", "sdk", "headers", "channel"}
+    # Each worker checked its own checkout
+    assert rows["app_with_sdk"]["root"] == str(with_sdk.resolve())
+    assert rows["app_with_sdk"]["checks"]["sdk"] is True
+    assert rows["app_without_sdk"]["checks"]["sdk"] is False
+    assert rows["app_with_sdk"]["header_count"] == 2
+    assert not (fleet / ".dart_tool").exists() and without_sdk.exists()
@@ -0,0 +1,55 @@
+import json
+
+from castar_tools import flutter_doctor
+
+DOCTOR_OUTPUT = """\
+[✓] Flutter (Channel stable, 3.19.0, on macOS 14.3 23D56 darwin-arm64, locale en-US)
+    • Flutter version 3.19.0 on channel stable at /Users/dev/flutter
+    • Framework revision bae5e49bc2 (4 weeks ago), 2024-02-13 17:46:18 -0800
+[!] Android toolchain - develop for Android devices (Android SDK version 34.0.0)
+    • Android SDK at /Users/dev/Library/Android/sdk
+    ✗ cmdline-tools component is missing
+      Run `path/to/sdkmanager --install "cmdline-tools;latest"`
+    ! Some Android licenses not accepted.
+[✓] Xcode - develop for iOS and macOS (Xcode 15.2)
+    • Xcode at /Applications/Xcode.app/Contents/Developer
+    • Build 15C500b
+[X] Chrome - develop for the web (Cannot find Chrome executable at google-chrome)
+
+! Doctor found issues in 2 categories.
+"""
+
+def test_sections_and_statuses():
+    sections = flutter_doctor.parse_doctor_output(DOCTOR_OUTPUT)
+    assert [(s["name"], s["status"]) for s in sections] == [
+        ("Flutter", "ok"), ("Android toolchain", "partial"), ("Xcode", "ok"), ("Chrome", "missing"),
+    ]
+
+def test_versions():
+    sections = flutter_doctor.parse_doctor_output(DOCTOR_OUTPUT)
+    assert flutter_doctor.find_section(sections, "Flutter")["version"] == "3.19.0"
+    assert flutter_doctor.find_section(sections, "Android")["version"] == "34.0.0"
+    assert flutter_doctor.ios_toolchain(sections)["version"] == "15.2"
+
+def test_issues_and_continuations():
+    android = flutter_doctor.find_section(flutter_doctor.parse_doctor_output(DOCTOR_OUTPUT), "Android")
+    assert android["details"] == ["Android SDK at /Users/dev/Library/Android/sdk"]
+    assert [issue["severity"] for issue in android["issues"]] == ["error", "warning"]
+    assert android["issues"][0]["message"].startswith("cmdline-tools component is missing Run ")
+
+def test_footer_ends_the_last_section():
+    chrome = flutter_doctor.parse_doctor_output(DOCTOR_OUTPUT)[-1]
+    assert chrome["details"] == [] and chrome["issues"] == []
+
+def test_older_ios_toolchain_name_and_windows_marks():
+    sections = flutter_doctor.parse_doctor_output(
+        "[√] iOS toolchain - develop for iOS devices (Xcode 12.5)\n    • ios-deploy 1.11.4\n")
+    assert flutter_doctor.ios_toolchain(sections)["status"] == "ok"
+
+def test_cache_is_keyed(tmp_path):
+    cache_path = tmp_path / "doctor.json"
+    sections = flutter_doctor.parse_doctor_output(DOCTOR_OUTPUT)
+    key = {"flutter_revision": "abc", "xcode": "/Applications/Xcode.app@1"}
+    flutter_doctor.save_cached(key, sections, cache_path)
+    assert flutter_doctor.load_cached(key, cache_path)["sections"] == json.loads(json.dumps(sections))
+    assert flutter_doctor.load_cached(dict(key, xcode="other"), cache_path) is None
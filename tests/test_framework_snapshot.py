@@ -0,0 +1,45 @@
+import os
+
+from castar_tools import framework_snapshot
+
+def make_framework(project):
+    framework = project / "ios" / "Frameworks" / "CastarSDK.framework"
+    (framework / "Headers").mkdir(parents=True)
+    (framework / "Modules").mkdir()
+    (framework / "Headers" / "CastarSDK.h").write_text('#import "CSDK.h"\n')
+    (framework / "Headers" / "CSDK.h").write_text("@interface Castar : NSObject\n@end\n")
+    (framework / "Modules" / "module.modulemap").write_text("framework module CastarSDK {}\n")
+    return framework
+
+def reload_from_disk():
+    """What the next pipeline step (a new process) sees"""
+    framework_snapshot._current = None
+    return framework_snapshot.get_snapshot()
+
+def test_saved_snapshot_is_reused(project):
+    make_framework(project)
+    first = framework_snapshot.get_snapshot()
+    assert first.exists and first.header_names == ["CSDK.h", "CastarSDK.h"]
+    assert reload_from_disk().scanned_at == first.scanned_at
+
+def test_in_place_header_edit_invalidates_saved_snapshot(project):
+    framework = make_framework(project)
+    framework_snapshot.get_snapshot()
+    header = framework / "Headers" / "CastarSDK.h"
+    directory_mtime = (framework / "Headers").stat().st_mtime_ns
+    header.write_text('#import "CSDK.h"\n#import "Extra.h"\n')
+    os.utime(framework / "Headers", ns=(directory_mtime, directory_mtime))
+    assert "Extra.h" in reload_from_disk().headers["CastarSDK.h"]
+
+def test_same_size_modulemap_edit_invalidates_saved_snapshot(project):
+    framework = make_framework(project)
+    modulemap = framework / "Modules" / "module.modulemap"
+    framework_snapshot.get_snapshot()
+    stat = modulemap.stat()
+    modulemap.write_text("framework module CastarSDX {}\n")
+    os.utime(modulemap, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert "CastarSDX" in reload_from_disk().modulemap
+
+def test_missing_framework(project):
+    snapshot = reload_from_disk()
+    assert not snapshot.exists and not snapshot.has_headers
@@ -0,0 +1,133 @@
+import json
+import random
+import zipfile
+
+from castar_tools import ipa_size
+
+APP = "Payload/Runner.app"
+
+def random_bytes(size, seed):
+    return random.Random(seed).randbytes(size)
+
+def make_ipa(path, overrides=None):
+    """A small IPA: incompressible binaries, compressible resources"""
+    members = {
+        f"{APP}/Runner": random_bytes(40_000, 1),
+        f"{APP}/Info.plist": b"<plist>" + b"x" * 2000 + b"</plist>",
+        f"{APP}/Assets.car": random_bytes(8_000, 2),
+        f"{APP}/Frameworks/CastarSDK.framework/CastarSDK": random_bytes(120_000, 3),
+        f"{APP}/Frameworks/CastarSDK.framework/Info.plist": b"<plist/>",
+        f"{APP}/Frameworks/Flutter.framework/Flutter": random_bytes(90_000, 4),
+        f"{APP}/Frameworks/App.framework/App": random_bytes(60_000, 5),
+        f"{APP}/Frameworks/App.framework/flutter_assets/AssetManifest.json": b"{}" * 500,
+        f"{APP}/Frameworks/App.framework/flutter_assets/fonts/MaterialIcons-Regular.otf":
+            random_bytes(20_000, 6),
+        f"{APP}/_CodeSignature/CodeResources": b"<plist>" + b"y" * 3000 + b"</plist>",
+        f"{APP}/en.lproj/Main.strings": b"\"title\" = \"Castar\";\n" * 50,
+        f"{APP}/PlugIns/Widget.appex/Widget": random_bytes(10_000, 7),
+        "SwiftSupport/iphoneos/libswiftCore.dylib": random_bytes(5_000, 8),
+    }
+    members.update(overrides or {})
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(f"{APP}/", b"")
+        for name, data in members.items():
+            if data is not None:
+                archive.writestr(name, data)
+    return path
+
+def test_central_directory_matches_zipfile(tmp_path):
+    path = make_ipa(tmp_path / "app.ipa")
+    entries, size = ipa_size.read_entries(path)
+    assert size == path.stat().st_size
+    with zipfile.ZipFile(path) as archive:
+        expected = {info.filename: (info.compress_size, info.file_size)
+                    for info in archive.infolist() if not info.is_dir()}
+    assert {entry.name: (entry.compressed, entry.uncompressed) for entry in entries} == expected
+
+def test_components(tmp_path):
+    breakdown = ipa_size.analyze(make_ipa(tmp_path / "app.ipa"))
+    files = {name: totals[2] for name, totals in breakdown.components.items()}
+    assert files == {
+        "Runner executable": 1,
+        "Other resources": 1,
+        "Asset catalog": 1,
+        "Frameworks/CastarSDK.framework": 2,
+        "Frameworks/Flutter.framework": 1,
+        "App.framework (Dart AOT)": 1,
+        "flutter_assets": 1,
+        "flutter_assets (fonts)": 1,
+        "Code signature": 1,
+        "Localizations": 1,
+        "PlugIns/Widget.appex": 1,
+        "SwiftSupport": 1,
+    }
+    assert breakdown.components["Frameworks/CastarSDK.framework"][1] == 120_000 + len(b"<plist/>")
+    assert breakdown.compressed < breakdown.archive_size
+
+def test_unpacked_app_matches_ipa(tmp_path):
+    app = tmp_path / "Runner.app"
+    with zipfile.ZipFile(make_ipa(tmp_path / "app.ipa")) as archive:
+        for info in archive.infolist():
+            if info.filename.startswith(f"{APP}/") and not info.is_dir():
+                target = app / info.filename[len(APP) + 1:]
+                target.parent.mkdir(parents=True, exist_ok=True)
+                target.write_bytes(archive.read(info))
+    bundle = ipa_size.analyze(app)
+    ipa = ipa_size.analyze(tmp_path / "app.ipa")
+    assert {name: totals[1] for name, totals in bundle.components.items()} == \
+        {name: totals[1] for name, totals in ipa.components.items() if name != "SwiftSupport"}
+    assert bundle.archive_size == bundle.compressed
+
+def test_breakdown_order_shares_and_top_files(tmp_path, capsys):
+    breakdown = ipa_size.analyze(make_ipa(tmp_path / "app.ipa"))
+    ipa_size.print_breakdown(breakdown, top=3)
+    output = capsys.readouterr().out
+    table, _, top = output.partition("🔝 Largest 3 files")
+    rows = [line for line in table.splitlines() if "%" in line]
+    # Largest compressed component first, zip headers last
+    assert rows[0].endswith("Frameworks/CastarSDK.framework")
+    assert rows[1].endswith("Frameworks/Flutter.framework")
+    assert rows[-1].endswith("(zip headers)")
+    # Every share is of the archive on disk, so they add up to 100%
+    shares = [float(line.split("%")[0].split()[-1]) for line in rows]
+    sdk = breakdown.components["Frameworks/CastarSDK.framework"][0]
+    assert shares[0] == round(100 * sdk / breakdown.archive_size, 1)
+    assert abs(sum(shares) - 100) <= 0.05 * len(shares)
+    top_names = [line.split()[-1] for line in top.splitlines()[1:] if line.strip()]
+    assert top_names == [f"{APP}/Frameworks/CastarSDK.framework/CastarSDK",
+                         f"{APP}/Frameworks/Flutter.framework/Flutter",
+                         f"{APP}/Frameworks/App.framework/App"]
+
+def test_diff_against_base(tmp_path):
+    base = ipa_size.analyze(make_ipa(tmp_path / "base.ipa"))
+    current = ipa_size.analyze(make_ipa(tmp_path / "current.ipa", {
+        f"{APP}/Frameworks/CastarSDK.framework/CastarSDK": random_bytes(150_000, 3),
+        f"{APP}/PlugIns/Widget.appex/Widget": None,
+        f"{APP}/Frameworks/Sentry.framework/Sentry": random_bytes(12_000, 9),
+    }))
+    rows = {row[0]: row for row in ipa_size.diff(base, current)}
+    assert rows["Frameworks/CastarSDK.framework"][3:] == (120_008, 150_008)
+    assert rows["PlugIns/Widget.appex"][2] == 0 and rows["PlugIns/Widget.appex"][4] == 0
+    assert rows["Frameworks/Sentry.framework"][1] == 0 and rows["Frameworks/Sentry.framework"][4] == 12_000
+    assert rows["Runner executable"][1] == rows["Runner executable"][2]
+    ordered = ipa_size.diff(base, current)
+    assert ordered[0][0] == "Frameworks/CastarSDK.framework"
+    changes = [abs(new - old) for _, old, new, _, _ in ordered]
+    assert changes == sorted(changes, reverse=True)
+
+def test_json_includes_diff(tmp_path, capsys):
+    base = make_ipa(tmp_path / "base.ipa")
+    current = make_ipa(tmp_path / "current.ipa", {f"{APP}/Runner": random_bytes(50_000, 1)})
+    assert ipa_size.main([str(current), "--base", str(base), "--json"])
+    report = json.loads(capsys.readouterr().out)
+    assert report["base"]["path"] == str(base)
+    runner = next(row for row in report["diff"] if row["component"] == "Runner executable")
+    assert runner["base_uncompressed"] == 40_000 and runner["uncompressed"] == 50_000
+    assert runner["uncompressed_change"] == 10_000
+    assert report["diff"][0]["component"] == "Runner executable"
+
+def test_not_a_zip(tmp_path, capsys):
+    path = tmp_path / "app.ipa"
+    path.write_bytes(b"not a zip" * 10)
+    assert not ipa_size.main([str(path)])
+    assert "Cannot read archive" in capsys.readouterr().out
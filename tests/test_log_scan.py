@@ -0,0 +1,111 @@
+import json
+import mmap
+import multiprocessing
+import re
+import subprocess
+import sys
+
+import pytest
+
+from castar_tools import log_scan
+
+from conftest import ROOT
+
+LOG_LINES = [
+    "2026-01-01 10:00:00 Runner[42] dyld: Library not loaded: @rpath/CastarSDK.framework/CastarSDK",
+    "flutter: ══╡ EXCEPTION CAUGHT BY WIDGETS LIBRARY ╞══",
+    "plain line",
+    "MissingPluginException(No implementation found for method startCastarSdk on channel "
+    "com.castarsdk.flutter/castar)",
+    "\tcontinued CastarSDK CastarSDK twice\r",
+    "",
+    "Unhandled Exception: PlatformException(error, getCastarStatus failed)",
+    "Terminating app due to uncaught exception, SIGABRT",
+    "ünïcödé CastarSDK",
+]
+
+def write_log(path, repeat, trailing_newline=True):
+    text = "\n".join(LOG_LINES * repeat) + ("\n" if trailing_newline else "")
+    path.write_bytes(text.encode("utf-8"))
+    return path
+
+def reference(path):
+    """Line-by-line re scan: {(set, pattern): (count, first line, last line)}"""
+    expected = {}
+    lines = path.read_bytes().split(b"\n")
+    for set_name, patterns in log_scan.PATTERN_SETS.items():
+        regex = re.compile(b"|".join(b"(?P<p%d>%s)" % (index, pattern)
+                                     for index, (_, pattern, _) in enumerate(patterns)))
+        for number, line in enumerate(lines, 1):
+            for match in regex.finditer(line):
+                name = patterns[int(match.lastgroup[1:])][0]
+                count, first, _ = expected.get((set_name, name), (0, number, number))
+                expected[(set_name, name)] = (count + 1, first, number)
+    return expected
+
+def summarize(stats):
+    return {(s.set_name, s.name): (s.count, s.first.line, s.last.line) for s in stats if s.count}
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1000, 1 << 20])
+@pytest.mark.parametrize("trailing_newline", [True, False])
+def test_chunk_boundaries_do_not_change_results(tmp_path, chunk_size, trailing_newline):
+    path = write_log(tmp_path / "device.log", 25, trailing_newline)
+    stats, lines, size = log_scan.analyze(str(path), workers=1, chunk_size=chunk_size)
+    assert summarize(stats) == reference(path)
+    assert lines == 25 * len(LOG_LINES) and size == path.stat().st_size
+
+def test_chunks_end_on_newlines(tmp_path):
+    path = write_log(tmp_path / "device.log", 3, trailing_newline=False)
+    data = path.read_bytes()
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+            bounds = log_scan.chunk_bounds(mapping, len(data), 10)
+    assert bounds[0][0] == 0 and bounds[-1][1] == len(data)
+    assert all(end == start for (_, end), (start, _) in zip(bounds, bounds[1:]))
+    assert all(data[end - 1:end] == b"\n" for _, end in bounds[:-1])
+
+def test_samples_and_context(tmp_path):
+    path = write_log(tmp_path / "device.log", 4)
+    stats, _, size = log_scan.analyze(str(path), samples=2, workers=1, chunk_size=50)
+    sdk = next(s for s in stats if (s.set_name, s.name) == ("castarsdk", "sdk"))
+    # Line 1's CastarSDK is consumed by library-not-loaded; line 5 has two
+    assert [sample.line for sample in sdk.samples] == [5, 5]
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+            window = log_scan.context_window(mapping, sdk.samples[0].offset, size, 1, 1)
+    assert window == [(-1, LOG_LINES[3]),
+                      (0, LOG_LINES[4].rstrip("\r")), (1, "")]
+
+@pytest.fixture
+def spawn_start_method():
+    previous = multiprocessing.get_start_method(allow_none=True)
+    multiprocessing.set_start_method("spawn", force=True)
+    yield
+    multiprocessing.set_start_method(previous, force=True)
+
+def test_process_pool_under_spawn(tmp_path, monkeypatch, spawn_start_method):
+    path = write_log(tmp_path / "device.log", 400)
+    monkeypatch.setattr(log_scan, "INLINE_LIMIT", 0)
+    stats, _, _ = log_scan.analyze(str(path), workers=2, chunk_size=4096)
+    assert summarize(stats) == reference(path)
+
+# What `castar-tools logs` does on macOS, where spawn is the default: pool
+# workers re-import the launcher as __mp_main__
+LAUNCH_WITH_SPAWN = """
+import multiprocessing, runpy, sys
+multiprocessing.set_start_method("spawn")
+sys.argv = sys.argv[1:]
+runpy.run_path(sys.argv[0], run_name="__main__")
+"""
+
+def test_launcher_pool_under_spawn(tmp_path):
+    path = write_log(tmp_path / "device.log", 1)
+    repeat = log_scan.INLINE_LIMIT // path.stat().st_size + 1
+    path = write_log(path, repeat)
+    result = subprocess.run(
+        [sys.executable, "-c", LAUNCH_WITH_SPAWN, str(ROOT / "castar-tools"),
+         "logs", str(path), "--workers", "2", "--json"],
+        capture_output=True, text=True, timeout=300)
+    assert result.returncode == 0, result.stderr
+    report = json.loads(result.stdout)
+    assert report["lines"] == repeat * len(LOG_LINES)
@@ -0,0 +1,91 @@
+import plistlib
+
+from castar_tools import plist_rules
+
+RUNNER = {
+    "CFBundleIdentifier": "$(PRODUCT_BUNDLE_IDENTIFIER)",
+    "UIBackgroundModes": ["fetch", "processing"],
+    "BGTaskSchedulerPermittedIdentifiers": ["com.castar.app.refresh"],
+}
+FRAMEWORK = {"CFBundleIdentifier": "com.castar.sdk", "MinimumOSVersion": "13.0"}
+SETTINGS = {"PRODUCT_BUNDLE_IDENTIFIER": ["com.castar.app"], "IPHONEOS_DEPLOYMENT_TARGET": ["13.0"]}
+
+def make_context(runner=None, framework=None, settings=None, binary_min_os="13.0", duplicates=()):
+    runner_model = plist_rules.PlistModel("Runner/Info.plist", data=dict(RUNNER, **(runner or {})),
+                                          duplicate_keys=duplicates)
+    framework_model = plist_rules.PlistModel("CastarSDK.framework/Info.plist",
+                                             data=dict(FRAMEWORK, **(framework or {})))
+    return plist_rules.RuleContext(runner_model, framework_model, True, binary_min_os,
+                                   dict(SETTINGS, **(settings or {})))
+
+def by_rule(results):
+    found = {}
+    for result in results:
+        found.setdefault(result["rule"], []).append((result["severity"], result["message"]))
+    return found
+
+def test_clean_plists_pass():
+    assert plist_rules.evaluate(make_context()) == []
+
+def test_aliased_background_modes_are_warnings():
+    context = make_context({"UIBackgroundModes": ["background-fetch", "background-processing"]})
+    found = by_rule(plist_rules.evaluate(context))
+    assert [severity for severity, _ in found["background-modes"]] == ["warning", "warning"]
+    assert "'background-fetch' is not a valid value, use 'fetch'" in found["background-modes"][0][1]
+    assert len(found["background-mode-values"]) == 2
+
+def test_processing_requires_task_identifiers():
+    context = make_context({"BGTaskSchedulerPermittedIdentifiers": None})
+    assert "bg-task-identifiers" in by_rule(plist_rules.evaluate(context))
+
+def test_location_mode_requires_usage_description():
+    context = make_context({"UIBackgroundModes": ["fetch", "processing", "location"]})
+    assert by_rule(plist_rules.evaluate(context))["location-usage"][0][0] == "error"
+
+def test_minimum_os_is_a_warning():
+    found = by_rule(plist_rules.evaluate(make_context(settings={"IPHONEOS_DEPLOYMENT_TARGET": ["12.0", "14.0"]})))
+    assert [severity for severity, _ in found["minimum-os"]] == ["warning", "warning"]
+    found = by_rule(plist_rules.evaluate(make_context(binary_min_os="14.0")))
+    assert any("does not match the binary's 14.0" in message for _, message in found["minimum-os"])
+
+def test_bundle_ids():
+    found = by_rule(plist_rules.evaluate(make_context(settings={"PRODUCT_BUNDLE_IDENTIFIER": ["com.example.app"]})))
+    assert found["runner-bundle-id"][0][0] == "warning"
+    found = by_rule(plist_rules.evaluate(make_context(framework={"CFBundleIdentifier": "com.castar.app"})))
+    assert found["framework-bundle-id"][0][0] == "error"
+    found = by_rule(plist_rules.evaluate(make_context({"CFBundleIdentifier": "$(UNKNOWN)"})))
+    assert "unknown build setting" in found["runner-bundle-id"][0][1]
+
+def test_ats():
+    context = make_context({"NSAppTransportSecurity": {
+        "NSAllowsArbitraryLoads": True, "NSAllowsArbitraryLoadsInWebContent": True,
+        "NSExceptionDomains": {"castar.com": {}}}})
+    messages = [message for _, message in by_rule(plist_rules.evaluate(context))["ats"]]
+    assert len(messages) == 2 and "is ignored on iOS 10+" in messages[0]
+
+def test_only_unreadable_plists_are_errors_on_this_kind_of_tree():
+    """The shipped Info.plist mistakes (aliases, duplicate key, older deployment target) don't fail"""
+    context = make_context({"UIBackgroundModes": ["background-fetch"]},
+                           settings={"IPHONEOS_DEPLOYMENT_TARGET": ["12.0"]}, duplicates=["UIBackgroundModes"])
+    assert not [result for result in plist_rules.evaluate(context) if result["severity"] == "error"]
+
+def test_load_plist_duplicates_binary_and_cache(tmp_path):
+    cache = tmp_path / "cache.json"
+    xml = tmp_path / "Info.plist"
+    xml.write_bytes(b'<?xml version="1.0"?><plist version="1.0"><dict>'
+                    b'<key>UIBackgroundModes</key><array><string>fetch</string></array>'
+                    b'<key>UIBackgroundModes</key><array><string>audio</string></array>'
+                    b'</dict></plist>')
+    model = plist_rules.load_plist(xml, cache)
+    assert model.format == "xml" and model.duplicate_keys == ["UIBackgroundModes"]
+    assert model.get("UIBackgroundModes") == ["audio"]
+    assert str(xml) in cache.read_text()
+
+    binary = tmp_path / "Binary.plist"
+    binary.write_bytes(plistlib.dumps({"CFBundleIdentifier": "com.castar.app"}, fmt=plistlib.FMT_BINARY))
+    model = plist_rules.load_plist(binary, cache)
+    assert model.format == "binary" and model.get("CFBundleIdentifier") == "com.castar.app"
+
+    broken = tmp_path / "Broken.plist"
+    broken.write_bytes(b"<plist><dict><key>x</key></plist>")
+    assert plist_rules.load_plist(broken, cache).error
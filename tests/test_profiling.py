@@ -0,0 +1,35 @@
+import argparse
+
+import pytest
+
+from castar_tools import profiling
+
+@pytest.fixture
+def parser():
+    parser = argparse.ArgumentParser()
+    profiling.add_profile_argument(parser)
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("history").add_argument("query")
+    return parser
+
+@pytest.mark.parametrize("argv, expected", [
+    ([], None),
+    (["--profile"], ""),
+    (["--profile-prefix", "out/run"], "out/run"),
+    (["--profile-prefix", "out/run", "--profile"], "out/run"),
+    (["--profile", "--profile-prefix", "out/run"], "out/run"),
+])
+def test_profile_values(parser, argv, expected):
+    assert parser.parse_args(argv).profile == expected
+
+def test_profile_does_not_swallow_the_subcommand(parser):
+    args = parser.parse_args(["--profile", "history", "list"])
+    assert (args.profile, args.command, args.query) == ("", "history", "list")
+
+def test_session_writes_prefix_files(tmp_path):
+    prefix = tmp_path / "run"
+    with profiling.profile_session(str(prefix), "test"):
+        with profiling.span("work"):
+            sum(range(1000))
+    assert (tmp_path / "run.prof").exists()
+    assert (tmp_path / "run.trace.json").exists()
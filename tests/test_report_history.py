@@ -0,0 +1,132 @@
+import argparse
+import time
+
+import pytest
+
+from castar_tools import report_history
+
+def test_parse_since_units():
+    now = time.time()
+    assert report_history.parse_since(None) is None
+    assert abs(report_history.parse_since("12h") - (now - 12 * 3600)) < 5
+    assert abs(report_history.parse_since("week") - (now - 7 * 86400)) < 5
+    assert abs(report_history.parse_since("1.5m") - (now - 90)) < 5
+
+@pytest.mark.parametrize("value", ["7x", "abc", "d", "nand", "-3d"])
+def test_parse_since_rejects_malformed(value):
+    with pytest.raises(argparse.ArgumentTypeError):
+        report_history.parse_since(value)
+
+def test_bad_since_is_a_usage_error(capsys):
+    parser = argparse.ArgumentParser(prog="history")
+    report_history.add_arguments(parser)
+    with pytest.raises(SystemExit) as exc:
+        parser.parse_args(["list", "--since", "7x"])
+    assert exc.value.code == 2
+    assert "unknown duration" in capsys.readouterr().err
+
+def add(db, created_at, checks, build_seconds=None, machine="mac-1", flutter_version="3.19.0"):
+    return report_history.append_report({
+        "created_at": created_at, "timestamp": f"t{created_at}", "machine": machine,
+        "flutter_version": flutter_version, "build_seconds": build_seconds, "checks": checks,
+    }, db)
+
+def test_append_report_outcome_and_checks(tmp_path):
+    db = tmp_path / "history.db"
+    passed = add(db, 100, {"flutter": True, "build": True})
+    failed = add(db, 200, {"flutter": True, "build": False})
+    skipped = add(db, 300, {"flutter": True, "channel": False, "build": None})
+    empty = add(db, 400, {})
+    conn = report_history.connect(db)
+    try:
+        outcomes = dict(conn.execute("SELECT id, outcome FROM reports"))
+        assert outcomes == {passed: "pass", failed: "fail", skipped: "fail", empty: "fail"}
+        # A check that didn't run isn't stored at all
+        assert conn.execute("SELECT name, ok FROM checks WHERE report_id = ? ORDER BY name",
+                            (skipped,)).fetchall() == [("channel", 0), ("flutter", 1)]
+        payload = conn.execute("SELECT payload FROM reports WHERE id = ?", (skipped,)).fetchone()[0]
+        assert '"build": null' in payload
+    finally:
+        conn.close()
+
+def test_recent_is_newest_first_and_filtered(tmp_path):
+    db = tmp_path / "history.db"
+    for index in range(6):
+        add(db, 100 + index, {"build": index % 2 == 0}, machine=f"mac-{index % 2}")
+    conn = report_history.connect(db)
+    try:
+        rows = report_history.recent(conn, limit=3)
+        assert not isinstance(rows, list)
+        assert [row[1] for row in rows] == ["t105", "t104", "t103"]
+        assert [row[1] for row in report_history.recent(conn, outcome="pass")] == ["t104", "t102", "t100"]
+        assert [row[1] for row in report_history.recent(conn, machine="mac-1", since=102)] == ["t105", "t103"]
+        # Newest-first comes from the index, not a sort of every report
+        plan = " ".join(row[-1] for row in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM reports r ORDER BY r.created_at DESC LIMIT 3"))
+        assert "idx_reports_created_at" in plan and "TEMP B-TREE" not in plan
+    finally:
+        conn.close()
+
+@pytest.mark.parametrize("values, expected", [
+    ([30.0], 30.0),
+    ([10.0, 50.0, 30.0], 30.0),
+    ([40.0, 10.0, 30.0, 20.0], 25.0),
+    ([5.0, 1.0, 4.0, 2.0, 3.0, 100.0], 3.5),
+])
+def test_median_odd_and_even_counts(tmp_path, values, expected):
+    db = tmp_path / "history.db"
+    for index, seconds in enumerate(values):
+        add(db, 100 + index, {"build": True}, build_seconds=seconds)
+    add(db, 50, {"build": False})  # no build time: not counted
+    conn = report_history.connect(db)
+    try:
+        assert report_history.median(conn) == (expected, len(values))
+        assert report_history.median(conn, since=1000) == (None, 0)
+        with pytest.raises(ValueError):
+            report_history.median(conn, field="payload")
+    finally:
+        conn.close()
+
+def test_median_respects_filters(tmp_path):
+    db = tmp_path / "history.db"
+    add(db, 100, {"build": True}, build_seconds=10.0, flutter_version="3.16.0")
+    add(db, 200, {"build": True}, build_seconds=20.0, flutter_version="3.19.0")
+    add(db, 300, {"build": True}, build_seconds=40.0, flutter_version="3.19.0")
+    conn = report_history.connect(db)
+    try:
+        assert report_history.median(conn, flutter_version="3.19") == (30.0, 2)
+        assert report_history.median(conn, since=150) == (30.0, 2)
+        assert report_history.median(conn) == (20.0, 3)
+    finally:
+        conn.close()
+
+def test_first_failure_streak_and_filters(tmp_path):
+    db = tmp_path / "history.db"
+    add(db, 100, {"build": True}, machine="mac-1")
+    add(db, 200, {"build": False}, machine="mac-1")
+    add(db, 300, {"build": True}, machine="mac-2", flutter_version="3.22.0")
+    add(db, 400, {"build": False}, machine="mac-1")
+    add(db, 500, {"build": False}, machine="mac-2", flutter_version="3.22.0")
+    conn = report_history.connect(db)
+    try:
+        last_pass, first_fail = report_history.first_failure(conn, "build")
+        assert (last_pass[1], first_fail[1]) == ("t300", "t400")
+        last_pass, first_fail = report_history.first_failure(conn, "build", machine="mac-1")
+        assert (last_pass[1], first_fail[1]) == ("t100", "t200")
+        last_pass, first_fail = report_history.first_failure(conn, "build", flutter_version="3.19")
+        assert (last_pass[1], first_fail[1]) == ("t100", "t200")
+        # Only failures in the window: no pass recorded there
+        last_pass, first_fail = report_history.first_failure(conn, "build", since=350)
+        assert last_pass is None and first_fail[1] == "t400"
+        assert report_history.first_failure(conn, "build", since=450, flutter_version="3.19") == (None, None)
+    finally:
+        conn.close()
+
+def test_first_failure_query_uses_filters(tmp_path, capsys):
+    db = tmp_path / "history.db"
+    add(db, time.time() - 10 * 86400, {"build": False}, flutter_version="3.16.0")
+    add(db, time.time() - 60, {"build": True}, flutter_version="3.19.0")
+    assert report_history.main(["first-failure", "--db", str(db), "--flutter-version", "3.16"])
+    assert "started failing at t" in capsys.readouterr().out
+    assert report_history.main(["first-failure", "--db", str(db), "--since", "7d"])
+    assert "No failing 'build' runs" in capsys.readouterr().out
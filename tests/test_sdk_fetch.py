@@ -0,0 +1,140 @@
+import hashlib
+import io
+import os
+import random
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from castar_tools import fileutil, sdk_fetch
+
+def make_archive(seed=1):
+    """A small framework zip with a binary larger than one download chunk"""
+    rng = random.Random(seed)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        archive.writestr("CastarSDK.framework/Headers/CastarSDK.h", "@interface Castar : NSObject\n@end\n",
+                         compress_type=zipfile.ZIP_DEFLATED)
+        archive.writestr("CastarSDK.framework/Info.plist", "<plist><dict/></plist>\n")
+        archive.writestr("CastarSDK.framework/CastarSDK", rng.randbytes(3 * sdk_fetch.CHUNK_SIZE),
+                         compress_type=zipfile.ZIP_DEFLATED)
+    return buffer.getvalue()
+
+class ArchiveHandler(BaseHTTPRequestHandler):
+    """Serves server.archive with ETag / If-Range / Range support and an optional cut-off"""
+
+    def do_GET(self):
+        server = self.server
+        data = server.archive
+        requested = self.headers.get("Range")
+        server.ranges.append(requested)
+        start = 0
+        if requested and self.headers.get("If-Range") == server.etag:
+            start = int(requested[len("bytes="):-1])
+            if start >= len(data):
+                self.send_response(416)
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+        else:
+            self.send_response(200)
+        body = data[start:]
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", server.etag)
+        self.end_headers()
+        if server.cut_after is not None:
+            # Drop the connection partway through, as a flaky network would
+            body, server.cut_after = body[:server.cut_after], None
+            self.close_connection = True
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), ArchiveHandler)
+    httpd.archive = make_archive()
+    httpd.etag = '"v1"'
+    httpd.cut_after = None
+    httpd.ranges = []
+    httpd.url = f"http://127.0.0.1:{httpd.server_port}/CastarSDK.framework.zip"
+    thread = threading.Thread(target=httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+def sha256_of(data):
+    return hashlib.sha256(data).hexdigest()
+
+def binary_of(dest):
+    return (dest / "CastarSDK.framework" / "CastarSDK").read_bytes()
+
+def test_interrupted_download_resumes(server, tmp_path):
+    server.cut_after = 300_000
+    dest, cache = tmp_path / "Frameworks", tmp_path / "cache"
+    sha256 = sdk_fetch.fetch_sdk(server.url, sha256_of(server.archive), dest, cache, retries=1)
+    assert server.ranges == [None, "bytes=300000-"]
+    assert sha256 == sha256_of(server.archive)
+    assert binary_of(dest) == zipfile.ZipFile(io.BytesIO(server.archive)).read("CastarSDK.framework/CastarSDK")
+    assert [path.name for path in (cache / "archives").glob(".partial-*")
+            if not path.name.endswith(fileutil.LOCK_SUFFIX)] == []
+
+def test_partial_download_is_kept_for_the_next_run(server, tmp_path):
+    server.cut_after = 300_000
+    dest, cache = tmp_path / "Frameworks", tmp_path / "cache"
+    with pytest.raises(sdk_fetch.FetchError) as exc:
+        sdk_fetch.fetch_sdk(server.url, None, dest, cache, retries=0)
+    assert exc.value.resumable
+    partial = sdk_fetch.SdkCache(cache).partial_path(server.url)
+    assert partial.stat().st_size == 300_000
+
+    assert sdk_fetch.fetch_sdk(server.url, None, dest, cache) == sha256_of(server.archive)
+    assert server.ranges == [None, "bytes=300000-"]
+    assert not partial.exists()
+
+def test_changed_archive_restarts_instead_of_resuming(server, tmp_path):
+    server.cut_after = 300_000
+    dest, cache = tmp_path / "Frameworks", tmp_path / "cache"
+    with pytest.raises(sdk_fetch.FetchError):
+        sdk_fetch.fetch_sdk(server.url, None, dest, cache, retries=0)
+    server.archive, server.etag = make_archive(seed=2), '"v2"'
+    # If-Range no longer matches, so the server sends the whole new archive
+    assert sdk_fetch.fetch_sdk(server.url, None, dest, cache) == sha256_of(server.archive)
+    assert server.ranges == [None, "bytes=300000-"]
+
+def test_hash_mismatch_installs_nothing(server, tmp_path):
+    dest, cache = tmp_path / "Frameworks", tmp_path / "cache"
+    with pytest.raises(sdk_fetch.FetchError, match="SHA-256 mismatch") as exc:
+        sdk_fetch.fetch_sdk(server.url, "0" * 64, dest, cache)
+    assert not exc.value.resumable
+    assert not dest.exists()
+    assert [path.name for path in (cache / "archives").iterdir()
+            if not path.name.endswith(fileutil.LOCK_SUFFIX)] == []
+    assert not list((cache / "trees").iterdir())
+
+def test_cache_hit_hardlinks_the_tree(server, tmp_path):
+    dest, cache = tmp_path / "Frameworks", tmp_path / "cache"
+    sha256 = sdk_fetch.fetch_sdk(server.url, sha256_of(server.archive), dest, cache)
+    other = tmp_path / "Other"
+    sdk_fetch.fetch_sdk(server.url, sha256, other, cache)
+    assert len(server.ranges) == 1
+    cached = sdk_fetch.SdkCache(cache).tree_path(sha256) / "CastarSDK.framework" / "CastarSDK"
+    assert os.stat(other / "CastarSDK.framework" / "CastarSDK").st_ino == cached.stat().st_ino
+
+    copied = tmp_path / "Copied"
+    sdk_fetch.fetch_sdk(server.url, sha256, copied, cache, copy=True)
+    assert os.stat(copied / "CastarSDK.framework" / "CastarSDK").st_ino != cached.stat().st_ino
+    assert binary_of(copied) == cached.read_bytes()
+
+def test_corrupted_cache_is_downloaded_again(server, tmp_path):
+    dest, cache = tmp_path / "Frameworks", tmp_path / "cache"
+    sha256 = sdk_fetch.fetch_sdk(server.url, None, dest, cache)
+    with open(sdk_fetch.SdkCache(cache).archive_path(sha256), 'ab') as f:
+        f.write(b"garbage")
+    sdk_fetch.fetch_sdk(server.url, None, dest, cache)
+    assert len(server.ranges) == 2
@@ -0,0 +1,157 @@
+import pickle
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from castar_tools import symbolize
+
+CC = shutil.which("cc") or shutil.which("gcc") or shutil.which("clang")
+NM = shutil.which("nm")
+ADDR2LINE = shutil.which("addr2line")
+pytestmark = pytest.mark.skipif(not (CC and NM), reason="needs a C compiler and nm")
+
+BUILD_ID = "c0ffee0123456789"
+SOURCE = """\
+int castar_helper(int value) {
+    return value * 3;
+}
+
+int castar_start(int value) {
+    int result = castar_helper(value);
+    return result + 1;
+}
+"""
+HELPER_LINE, START_LINE = 1, 5
+
+def compile_symbols(tmp_path, dwarf):
+    source = tmp_path / "castar.c"
+    source.write_text(SOURCE)
+    output = tmp_path / f"app-dwarf{dwarf}.symbols"
+    subprocess.run([CC, "-shared", "-fPIC", "-O0", f"-gdwarf-{dwarf}", f"-Wl,--build-id=0x{BUILD_ID}",
+                    "-o", str(output), str(source)], check=True, cwd=tmp_path)
+    return output
+
+def function_addresses(path):
+    """{name: (address, size)} from nm, independent of the parser under test"""
+    result = subprocess.run([NM, "--defined-only", "-S", str(path)], capture_output=True, text=True, check=True)
+    addresses = {}
+    for line in result.stdout.splitlines():
+        parts = line.split()
+        if len(parts) == 4 and parts[3].startswith("castar_"):
+            addresses[parts[3]] = (int(parts[0], 16), int(parts[1], 16))
+    return addresses
+
+def reference_lines(path, addresses):
+    """addr2line's (file name, line) for each address"""
+    result = subprocess.run([ADDR2LINE, "-e", str(path), *(f"{address:#x}" for address in addresses)],
+                            capture_output=True, text=True, check=True)
+    located = []
+    for line in result.stdout.splitlines():
+        location = line.split(" (discriminator")[0]
+        file_name, _, number = location.rpartition(":")
+        located.append((Path(file_name).name, int(number)))
+    return located
+
+@pytest.fixture(params=[4, 5])
+def symbols(tmp_path, request):
+    path = compile_symbols(tmp_path, request.param)
+    return path, {name: start for name, (start, _) in function_addresses(path).items()}
+
+def test_address_to_function_and_line(symbols):
+    path, addresses = symbols
+    index = symbolize.build_index(path)
+    assert index.build_id == BUILD_ID
+    for name, line in (("castar_helper", HELPER_LINE), ("castar_start", START_LINE)):
+        address = addresses[name]
+        assert index.function_at(address) == name
+        assert index.function_at(address + 4) == name
+        file_name, line_number = index.line_at(address)
+        assert file_name.endswith("castar.c") and line_number == line
+    assert index.function_at(0) is None
+
+@pytest.mark.skipif(not ADDR2LINE, reason="needs addr2line")
+@pytest.mark.parametrize("dwarf", [2, 4, 5])
+def test_every_address_matches_addr2line(tmp_path, dwarf):
+    path = compile_symbols(tmp_path, dwarf)
+    index = symbolize.build_index(path)
+    for name, (start, size) in function_addresses(path).items():
+        addresses = list(range(start, start + size))
+        located = [index.line_at(address) for address in addresses]
+        assert [(Path(file_name).name, line) for file_name, line in located] == \
+            reference_lines(path, addresses), name
+        assert {index.function_at(address) for address in addresses} == {name}
+
+def test_frames_are_rewritten_in_place(symbols):
+    path, addresses = symbols
+    symbolizer = symbolize.Symbolizer([path], cache_dir=path.parent / "cache")
+    base = 0x10FA20000
+    # Any address in castar_start after the prologue: the body of the call
+    call_site = addresses["castar_start"] + 8
+    lines = [
+        "flutter: Unhandled exception\n",
+        "*** *** *** *** *** *** *** *** *** *** *** *** *** *** *** ***\n",
+        f"build_id: '{BUILD_ID}'\n",
+        f"isolate_dso_base: {base:x}, vm_dso_base: {base:x}\n",
+        f"    #00 abs {base + addresses['castar_helper']:016x} _kDartIsolateSnapshotInstructions+0x10\n",
+        f"    #01 abs {base + call_site + 1:016x} virt {call_site + 1:016x} "
+        "_kDartIsolateSnapshotInstructions+0x20\n",
+        "    #02 abs 0000000000000010 _kDartIsolateSnapshotInstructions+0x30",
+    ]
+    out = list(symbolizer.symbolize_lines(lines))
+    assert out[:4] == lines[:4]
+    assert out[4].startswith(f"    #00 {addresses['castar_helper']:#x} castar_helper (")
+    assert out[4].endswith(f"castar.c:{HELPER_LINE})\n")
+    # Return addresses are looked up one byte back, at the call
+    file_name, line = symbolizer.indexes[0].line_at(call_site)
+    assert out[5] == f"    #01 {call_site + 1:#x} castar_start ({file_name}:{line})\n"
+    # Unknown addresses stay as they were, without a newline added
+    assert out[6] == lines[6]
+
+def test_index_cache_is_reused_and_keyed_by_build_id(tmp_path, monkeypatch):
+    path = compile_symbols(tmp_path, 5)
+    cache_dir = tmp_path / "cache"
+    first = symbolize.load_index(path, cache_dir)
+    assert [entry.name for entry in cache_dir.iterdir()] == [f"{BUILD_ID}.v{symbolize.INDEX_VERSION}.index"]
+
+    def no_rebuild(_):
+        raise AssertionError("index was rebuilt")
+    monkeypatch.setattr(symbolize, "build_index", no_rebuild)
+    cached = symbolize.load_index(path, cache_dir)
+    assert cached.build_id == first.build_id and cached.names == first.names
+    assert cached.starts == first.starts and cached.line_addrs == first.line_addrs
+    assert cached.files == first.files
+
+class Exploit:
+    def __init__(self, marker):
+        self.marker = marker
+
+    def __reduce__(self):
+        return Path.touch, (Path(self.marker),)
+
+@pytest.mark.parametrize("damage", ["truncated", "garbage", "pickle", "wrong build id", "bad ids"])
+def test_damaged_or_foreign_cache_is_rebuilt(tmp_path, capsys, damage):
+    path = compile_symbols(tmp_path, 5)
+    cache_dir = tmp_path / "cache"
+    expected = symbolize.load_index(path, cache_dir)
+    cache_file = next(cache_dir.iterdir())
+    data = cache_file.read_bytes()
+    header, _, body = data.partition(b"\n")
+    marker = tmp_path / "pwned"
+    if damage == "truncated":
+        cache_file.write_bytes(data[:len(data) - 5])
+    elif damage == "garbage":
+        cache_file.write_bytes(b"\x80\x04garbage" * 10)
+    elif damage == "pickle":
+        cache_file.write_bytes(pickle.dumps(Exploit(marker)))
+    elif damage == "wrong build id":
+        cache_file.write_bytes(header.replace(BUILD_ID.encode(), b"deadbeef") + b"\n" + body)
+    else:
+        cache_file.write_bytes(header.replace(b'"names": [', b'"names": [], "x": [') + b"\n" + body)
+    index = symbolize.load_index(path, cache_dir)
+    assert not marker.exists()
+    assert index.names == expected.names and index.starts == expected.starts
+    assert "Ignoring unreadable symbol index" in capsys.readouterr().err
+    # The rebuilt index replaced the damaged file
+    assert cache_file.read_bytes() == data